@@ -0,0 +1,759 @@
+import pandas as pd
+import numpy as np
+import time
+import tracemalloc
+import contextlib
+import io
+import os
+import tempfile
+import re
+import json
+import sys
+import platform
+import argparse
+import subprocess
+from manipulator import *
+from preprocessor import preprocessor
+import describe
+from sketch import hyperloglog
+from cache import step_cache
+"""
+Benchmarks for the describe, manipulator and preprocessor modules. Run with:
+    python benchmark.py
+The benchmark suite (run_suite) times describe and every manipulation on seeded synthetic frames of growing size and
+can save its results and compare them to a baseline:
+    python benchmark.py --suite --sizes 10000 100000 --output results.json --baseline baseline.json
+"""
+
+def make_frame(num_rows, num_columns=10, nan_rate=0.1, seed=0):
+    """Build a synthetic numeric dataframe with missing values
+
+    Arguments:
+        num_rows {int} -- the number of rows
+
+    Keyword Arguments:
+        num_columns {int} -- the number of columns (default: {10})
+        nan_rate {float} -- the fraction of values that are missing (default: {0.1})
+        seed {int} -- the random seed (default: {0})
+
+    Returns:
+        pandas dataframe -- the synthetic dataframe
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.random((num_rows, num_columns))
+    values[rng.random((num_rows, num_columns)) < nan_rate] = np.nan
+    return pd.DataFrame(values, columns=["col_{}".format(i) for i in range(num_columns)])
+
+def timed(function, *args, **kwargs):
+    """Run a function and record its wall time
+
+    Arguments:
+        function {python function} -- the function to be timed
+
+    Returns:
+        float -- seconds
+    """
+    start_time = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start_time
+
+def measure(function, *args, **kwargs):
+    """Run a function and record its wall time and peak traced memory. The function is run twice, once for the time
+    and once under tracemalloc for the memory, since tracing slows down code that allocates many python objects
+
+    Arguments:
+        function {python function} -- the function to be measured
+
+    Returns:
+        tuple -- (seconds, peak bytes)
+    """
+    seconds = timed(function, *args, **kwargs)
+
+    tracemalloc.start()
+    function(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+def bench_pipeline_memory(num_rows=200000, num_columns=10, pipeline_lengths=(1, 2, 4, 8, 16)):
+    """Compare the peak memory of preprocessor.preprocess in each execution mode as the pipeline grows. The peak of
+    copy_free and inplace stays flat: the one copy (copy_free only) and the nan mask of a column
+    """
+    df = make_frame(num_rows, num_columns)
+    frame_bytes = df.memory_usage(deep=True).sum()
+    print("Pipeline peak memory ({} rows, frame = {:.1f} MB):".format(num_rows, frame_bytes/1e6))
+    print("\t{}{}{}{}".format("steps".ljust(8), "default".ljust(20), "copy_free".ljust(20), "inplace"))
+    for length in pipeline_lengths:
+        results = []
+        for mode in ({}, {"copy_free": True}, {"inplace": True}):
+            def make_proc():
+                # the preprocessor stores its own copy, so inplace runs do not consume df
+                proc = preprocessor(df)
+                for i in range(length):
+                    proc.append_manipulation(manipulator(fill_NaN_column, df.columns[i % num_columns], 0.0))
+                return proc
+            # not measure, which runs the function twice on the same preprocessor: a second inplace run finds no nans
+            seconds = timed(make_proc().preprocess, **mode)
+            proc = make_proc()
+            tracemalloc.start()
+            proc.preprocess(**mode)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append("{:.2f}x ({:.3f}s)".format(peak/frame_bytes, seconds))
+        print("\t{}{}{}{}".format(str(length).ljust(8), results[0].ljust(20), results[1].ljust(20), results[2]))
+
+def _legacy_row_nan_count_dict(df):
+    # the row loop describe.describe used before get_row_missing_buckets, kept as the benchmark reference
+    row_nan_count_dict = {}
+    for index, row in df.iterrows():
+        nan_count = row.isnull().sum()
+        row_nan_count_dict.setdefault(nan_count, []).append(index)
+    return row_nan_count_dict
+
+def bench_row_missingness(row_counts=(10000, 50000), num_columns=10):
+    """Compare describe.get_row_missing_buckets against the legacy iterrows loop
+    """
+    print("Row missingness profiling:")
+    print("\t{}{}{}".format("rows".ljust(12), "iterrows".ljust(20), "vectorized"))
+    for num_rows in row_counts:
+        df = make_frame(num_rows, num_columns, nan_rate=0.3)
+        legacy_seconds = timed(_legacy_row_nan_count_dict, df)
+        seconds = timed(describe.get_row_missing_buckets, df)
+        print("\t{}{}{}".format(str(num_rows).ljust(12), "{:.3f}s".format(legacy_seconds).ljust(20), "{:.4f}s".format(seconds)))
+
+def _legacy_column_stats(df):
+    # the per column passes describe.describe made before describe.profile, kept as the benchmark reference
+    for column_name in df.columns.values:
+        unique_values = set(df[column_name].unique())
+        describe.get_pred_column_type(unique_values, df.shape[0])
+        df[column_name].isna().sum()
+        describe.is_column_clean(df[column_name])
+
+def bench_profile(num_rows=10000, column_counts=(100, 1000)):
+    """Compare describe.profile on wide frames against the legacy per column passes
+    """
+    print("Column profiling ({} rows):".format(num_rows))
+    print("\t{}{}{}".format("columns".ljust(12), "legacy".ljust(20), "profile"))
+    for num_columns in column_counts:
+        df = make_frame(num_rows, num_columns)
+        legacy_seconds = timed(_legacy_column_stats, df)
+        seconds = timed(describe.profile, df)
+        print("\t{}{}{}".format(str(num_columns).ljust(12), "{:.3f}s".format(legacy_seconds).ljust(20), "{:.3f}s".format(seconds)))
+
+def bench_approx_unique(num_rows=2000000, cardinalities=(10, 10000, 1000000), precision=14):
+    """Compare the HyperLogLog estimate against the exact unique count of string id columns
+    """
+    print("Approximate unique counts ({} rows, precision {}):".format(num_rows, precision))
+    print("\t{}{}{}{}{}".format("true".ljust(12), "estimate".ljust(14), "error".ljust(12), "exact".ljust(20), "approx"))
+    rng = np.random.default_rng(0)
+    for cardinality in cardinalities:
+        ids = np.array(["id_{:08d}".format(i) for i in range(cardinality)], dtype=object)
+        column = pd.Series(ids[rng.integers(0, cardinality, num_rows)])
+        true_count = len(pd.unique(column))
+        exact_seconds, exact_peak = measure(lambda: len(set(column.unique())))
+        sketch = hyperloglog(precision)
+        approx_seconds, approx_peak = measure(sketch.update, column)
+        estimate = sketch.count()
+        print("\t{}{}{}{}{}".format(str(true_count).ljust(12), str(round(estimate)).ljust(14),
+            "{:+.3%}".format(estimate/true_count - 1).ljust(12),
+            "{:.2f}s {:.0f}MB".format(exact_seconds, exact_peak/1e6).ljust(20),
+            "{:.2f}s {:.0f}MB".format(approx_seconds, approx_peak/1e6)))
+
+def bench_describe_csv(num_rows=500000, num_columns=10, chunksizes=(10000, 50000, 250000)):
+    """Record the peak memory of describe.describe_csv for different chunk sizes
+    """
+    print("Streaming describe_csv ({} rows):".format(num_rows))
+    print("\t{}{}".format("chunksize".ljust(12), "time / peak memory"))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "frame.csv")
+        make_frame(num_rows, num_columns).to_csv(path)
+        for chunksize in chunksizes:
+            with contextlib.redirect_stdout(io.StringIO()):
+                seconds, peak = measure(describe.describe_csv, path, chunksize=chunksize, index_col=0)
+            print("\t{}{:.2f}s {:.0f}MB".format(str(chunksize).ljust(12), seconds, peak/1e6))
+
+def bench_parallel_profile(num_rows=200000, num_columns=256, job_counts=(1, 2, 4, 8, 16, 32)):
+    """Record the speedup of describe.profile with more workers on a wide frame
+    """
+    df = make_frame(num_rows, num_columns)
+    job_counts = [n_jobs for n_jobs in job_counts if n_jobs <= os.cpu_count()]
+    print("Parallel profile ({} rows x {} columns, {} cpus):".format(num_rows, num_columns, os.cpu_count()))
+    print("\t{}{}{}".format("n_jobs".ljust(8), "thread".ljust(20), "process"))
+    serial_seconds = timed(describe.profile, df)
+    for n_jobs in job_counts:
+        results = []
+        for backend in ("thread", "process"):
+            seconds = timed(describe.profile, df, n_jobs=n_jobs, backend=backend)
+            results.append("{:.2f}s ({:.1f}x)".format(seconds, serial_seconds/seconds))
+        print("\t{}{}{}".format(str(n_jobs).ljust(8), results[0].ljust(20), results[1]))
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Sample_Data", "excited_tracks_truncated.csv")
+
+def make_sample_pipeline():
+    """Build a preprocessor over the sample data that uses every compilable manipulation
+
+    Returns:
+        tuple -- (the sample dataframe, the preprocessor)
+    """
+    df = pd.read_csv(SAMPLE_PATH, index_col=0)
+    df.loc[[3, 7], "popularity"] = np.nan
+    proc = preprocessor(df)
+    for manipulation in [
+        manipulator(drop_columns, ["artists", "track_id"]),
+        manipulator(encode_class_label, "track_label"),
+        manipulator(encode_nominal, "explicit", True),
+        manipulator(impute_NaN_column, "popularity", "median"),
+        manipulator(encode_regex, "track_name", {"^S": 1, "o": 2}),
+        manipulator(encode_ordinal, "track_number"),
+        manipulator(encode_nominal, "album_id", False),
+        manipulator(handle_date, "release_date"),
+        manipulator(fill_NaN_column, "release_date_day_of_week", -1),
+    ]:
+        proc.append_manipulation(manipulation)
+    return df, proc
+
+def assert_same_values(expected, records):
+    """Check that records hold the same columns and values as a dataframe (nan equal to nan)
+
+    Arguments:
+        expected {pandas dataframe} -- the output of the dataframe path
+        records {list} -- the output of the record path
+    """
+    got = pd.DataFrame(records, index=expected.index)
+    assert list(got.columns) == list(expected.columns), "Columns differ"
+    for column_name in expected.columns:
+        for a, b in zip(expected[column_name].to_numpy(dtype=object), got[column_name].to_numpy(dtype=object)):
+            assert (pd.isna(a) and pd.isna(b)) or (not pd.isna(a) and not pd.isna(b) and a == b), "Values of column {} differ: {} != {}".format(column_name, a, b)
+
+def bench_online_latency(batch_sizes=(1, 10), iterations=2000):
+    """Compare the p50/p99 latency of the compiled record path against preprocessor.transform for small batches
+    """
+    df, proc = make_sample_pipeline()
+    proc.fit()
+    fast = proc.compile()
+    records = df.to_dict("records")
+    print("Online transform latency (sample pipeline, {} iterations):".format(iterations))
+    print("\t{}{}{}".format("batch".ljust(8), "dataframe p50/p99".ljust(24), "compiled p50/p99"))
+    for batch_size in batch_sizes:
+        batch = records[:batch_size]
+        assert_same_values(proc.transform(df.iloc[:batch_size]), fast.transform_records(batch))
+        results = []
+        for transform in (lambda: proc.transform(pd.DataFrame.from_records(batch)), lambda: fast.transform_records(batch)):
+            latencies = [timed(transform) for _ in range(iterations)]
+            results.append("{:.1f}us/{:.1f}us".format(np.percentile(latencies, 50)*1e6, np.percentile(latencies, 99)*1e6))
+        print("\t{}{}{}".format(str(batch_size).ljust(8), results[0].ljust(24), results[1]))
+
+def make_date_strings(num_rows, num_unique_days=20000, seed=0):
+    """Build year-month-day date strings with a few year-month and year only dates mixed in
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.date_range("1990-01-01", periods=num_unique_days, freq="D").strftime("%Y-%m-%d").to_numpy(dtype=object)
+    dates = days[rng.integers(0, num_unique_days, num_rows)]
+    partial = rng.random(num_rows)
+    dates[partial < 0.05] = [date_str[:7] for date_str in dates[partial < 0.05]]
+    dates[partial < 0.01] = [date_str[:4] for date_str in dates[partial < 0.01]]
+    return pd.Series(dates)
+
+def bench_handle_date(row_counts=(100000, 1000000, 5000000), loop_rows=100000):
+    """Record the throughput of handle_date against parsing every row in a python loop
+    """
+    loop_df = pd.DataFrame({"date": make_date_strings(loop_rows)})
+    loop_seconds = timed(lambda: [convert_date_to_date_list(date_str) for date_str in loop_df["date"]])
+    print("handle_date throughput (python loop: {:.0f} rows/s):".format(loop_rows/loop_seconds))
+    print("\t{}{}".format("rows".ljust(12), "vectorized"))
+    for num_rows in row_counts:
+        df = pd.DataFrame({"date": make_date_strings(num_rows)})
+        seconds = timed(handle_date, df, "date", inplace=True)
+        print("\t{}{:.2f}s ({:.0f} rows/s)".format(str(num_rows).ljust(12), seconds, num_rows/seconds))
+
+def _legacy_encode_regex(column, regex_mapping):
+    # the per row loop encode_regex used before regex_encoder, kept as the benchmark reference
+    regex_mapping_comp = {re.compile(k) : v for k, v in regex_mapping.items()}
+    def map_regex(item):
+        item = str(item)
+        item_mapped = None
+        for pattern, v in regex_mapping_comp.items():
+            if pattern.search(item):
+                item_mapped = v
+        return item_mapped
+    return list(map(map_regex, column))
+
+def bench_encode_regex(row_counts=(100000, 1000000), num_patterns=40, num_unique=5000):
+    """Compare encode_regex against the per row loop over every pattern
+    """
+    rng = np.random.default_rng(0)
+    words = np.array(["track_{}_{}".format(chr(97 + i % 26), i) for i in range(num_unique)], dtype=object)
+    regex_mapping = {"_{}_{}$".format(chr(97 + i % 26), i): i for i in range(num_patterns)}
+    print("encode_regex ({} patterns, {} distinct values):".format(num_patterns, num_unique))
+    print("\t{}{}{}{}".format("rows".ljust(12), "per row loop".ljust(16), "first call".ljust(16), "cached call"))
+    for num_rows in row_counts:
+        df = pd.DataFrame({"name": words[rng.integers(0, num_unique, num_rows)]})
+        legacy_seconds = timed(_legacy_encode_regex, df["name"], regex_mapping)
+        get_regex_encoder.cache_clear()
+        seconds = timed(encode_regex, df, "name", regex_mapping)
+        cached_seconds = timed(encode_regex, df, "name", regex_mapping)
+        print("\t{}{}{}{}".format(str(num_rows).ljust(12), "{:.2f}s".format(legacy_seconds).ljust(16), "{:.3f}s".format(seconds).ljust(16), "{:.3f}s".format(cached_seconds)))
+
+def bench_encode_nominal(num_rows=200000, cardinalities=(100, 5000), top_k=50):
+    """Compare the memory of the encode_nominal output modes on high cardinality columns
+    """
+    rng = np.random.default_rng(0)
+    print("encode_nominal ({} rows, peak memory):".format(num_rows))
+    print("\t{}{}{}{}{}{}".format("categories".ljust(12), "dense".ljust(12), "uint8".ljust(12), "sparse".ljust(12), "csr".ljust(12), "top {}".format(top_k)))
+    for cardinality in cardinalities:
+        df = pd.DataFrame({"category": rng.integers(0, cardinality, num_rows).astype(str).astype(object)})
+        peaks = [measure(encode_nominal, df, "category", False, output)[1] for output in NOMINAL_OUTPUTS]
+        peaks.append(measure(nominal_to_csr, df, "category")[1])
+        peaks.append(measure(encode_nominal, df, "category", False, "uint8", top_k)[1])
+        print("\t{}{}".format(str(cardinality).ljust(12), "".join("{:.1f}MB".format(peak/1e6).ljust(12) for peak in peaks)))
+
+def bench_label_outputs(num_rows=1000000, num_classes=50000):
+    """Compare the time and peak memory of the encode_class_label and encode_ordinal outputs on a high cardinality label
+    """
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"label": np.array(["label_{}".format(i) for i in range(num_classes)], dtype=object)[rng.integers(0, num_classes, num_rows)]})
+    print("label encoding ({} rows, {} classes):".format(num_rows, num_classes))
+    print("\t{}{}{}".format("".ljust(24), "".join(output.ljust(20) for output in LABEL_OUTPUTS), "result bytes (legacy/codes/category)"))
+    for function, extra_args in ((encode_class_label, ()), (encode_ordinal, (None,))):
+        results, sizes = [], []
+        for output in LABEL_OUTPUTS:
+            args = (df, "label") + extra_args + (output,)
+            seconds, peak = measure(function, *args)
+            results.append("{:.2f}s {:.0f}MB".format(seconds, peak/1e6).ljust(20))
+            sizes.append(function(*args)["label"].memory_usage(index=False, deep=True))
+        print("\t{}{}{}".format(function.__name__.ljust(24), "".join(results), " / ".join("{:.1f}MB".format(size/1e6) for size in sizes)))
+
+def bench_step_cache(num_rows=1000000, num_dates=500000):
+    """Time rerunning preprocess after changing only the last manipulation, with and without a step cache
+    """
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"date": make_date_strings(num_rows, num_dates), "label": rng.integers(0, 1000, num_rows).astype(str),
+                       "value": rng.random(num_rows)})
+    df.loc[rng.random(num_rows) < 0.1, "value"] = np.nan
+    print("Rerun after changing the last manipulation ({} rows):".format(num_rows))
+    print("\t{}{}{}".format("".ljust(16), "first run".ljust(16), "rerun"))
+    for cache in (None, step_cache()):
+        proc = preprocessor(df, cache=cache)
+        for manipulation in [manipulator(handle_date, "date"), manipulator(encode_class_label, "label"),
+                             manipulator(impute_NaN_column, "value", "mean")]:
+            proc.append_manipulation(manipulation)
+        first_seconds = timed(proc.preprocess, copy_free=True)
+        proc.manipulations[-1] = manipulator(impute_NaN_column, "value", "median")
+        rerun_seconds = timed(proc.preprocess, copy_free=True)
+        name = "no cache" if cache is None else "step_cache"
+        print("\t{}{}{}".format(name.ljust(16), "{:.2f}s".format(first_seconds).ljust(16), "{:.2f}s".format(rerun_seconds)))
+        if cache is not None:
+            print("\t\t{}".format(cache.get_stats()))
+
+def bench_optimizer(num_rows=1000000, num_columns=10):
+    """Time a pipeline that drops rows and columns at its end, and fills columns one at a time, with and without the planner
+    """
+    rng = np.random.default_rng(0)
+    df = make_frame(num_rows, num_columns)
+    df["date"] = make_date_strings(num_rows, num_rows//2)
+    df["text"] = rng.integers(0, 1000, num_rows).astype(str)
+    proc = preprocessor(df)
+    for i in range(num_columns):
+        proc.append_manipulation(manipulator(fill_NaN_column, "col_{}".format(i), 0.0))
+    proc.append_manipulation(manipulator(handle_date, "date"))
+    proc.append_manipulation(manipulator(encode_regex, "text", {"^1": 1, "7$": 2}))
+    proc.append_manipulation(manipulator(drop_rows, list(df.index[num_rows//10:])))
+    proc.append_manipulation(manipulator(drop_columns, ["text"]))
+    print("Planner ({} rows, {} manipulations):".format(num_rows, len(proc.get_manipulations())))
+    print(proc.explain())
+    for optimize in (False, True):
+        seconds, peak = measure(proc.preprocess, copy_free=True, optimize=optimize)
+        print("\t{}{:.2f}s, peak {:.0f}MB".format(("optimized" if optimize else "in order").ljust(16), seconds, peak/1e6))
+
+def bench_parallel_pipeline(num_rows=1000000, job_counts=(1, 2, 4, 8)):
+    """Time a pipeline of manipulations on disjoint columns run one after another and concurrently by the scheduler
+    """
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"date_{}".format(i): make_date_strings(num_rows, num_rows//2, seed=i) for i in range(2)})
+    df["text"] = rng.integers(0, num_rows//10, num_rows).astype(str)
+    df["label"] = rng.integers(0, 1000, num_rows).astype(str)
+    df["value"] = rng.random(num_rows)
+    df.loc[rng.random(num_rows) < 0.1, "value"] = np.nan
+    proc = preprocessor(df)
+    for manipulation in [manipulator(handle_date, "date_0"), manipulator(handle_date, "date_1"),
+                         manipulator(encode_regex, "text", {"^1": 1, "7$": 2}), manipulator(encode_class_label, "label"),
+                         manipulator(impute_NaN_column, "value", "median")]:
+        proc.append_manipulation(manipulation)
+    expected = proc.preprocess()
+    print("Concurrent manipulations ({} rows, {} cpus):".format(num_rows, os.cpu_count()))
+    print("\t{}{}{}".format("n_jobs".ljust(8), "thread".ljust(16), "process"))
+    for n_jobs in job_counts:
+        results = []
+        for backend in ("thread", "process"):
+            assert proc.preprocess(n_jobs=n_jobs, backend=backend).equals(expected)
+            results.append("{:.2f}s".format(timed(proc.preprocess, n_jobs=n_jobs, backend=backend)))
+        print("\t{}{}{}".format(str(n_jobs).ljust(8), results[0].ljust(16), results[1]))
+
+def bench_preprocess_stream(num_rows=500000, num_columns=10, chunksizes=(10000, 100000)):
+    """Compare the peak memory of preprocess_stream against reading the whole csv, fit and transform
+    """
+    def make_proc():
+        proc = preprocessor()
+        for i in range(num_columns):
+            proc.append_manipulation(manipulator(impute_NaN_column, "col_{}".format(i), "median"))
+        proc.append_manipulation(manipulator(encode_class_label, "label"))
+        return proc
+
+    def in_memory(path, sink):
+        df = pd.read_csv(path, index_col=0)
+        make_proc().fit(df).transform(df).to_csv(sink)
+
+    print("Streaming preprocess ({} rows):".format(num_rows))
+    print("\t{}{}".format("chunksize".ljust(12), "time / peak memory"))
+    with tempfile.TemporaryDirectory() as directory:
+        path, sink = os.path.join(directory, "frame.csv"), os.path.join(directory, "out.csv")
+        df = make_frame(num_rows, num_columns)
+        df["label"] = np.random.default_rng(0).integers(0, 1000, num_rows).astype(str)
+        df.to_csv(path)
+        del df
+        seconds, peak = measure(in_memory, path, sink)
+        print("\t{}{:.2f}s {:.0f}MB".format("in memory".ljust(12), seconds, peak/1e6))
+        for chunksize in chunksizes:
+            seconds, peak = measure(lambda: make_proc().preprocess_stream(path, sink, chunksize=chunksize, index_col=0))
+            print("\t{}{:.2f}s {:.0f}MB".format(str(chunksize).ljust(12), seconds, peak/1e6))
+        check_sample_stream(os.path.join(directory, "sample.parquet"))
+
+def check_sample_stream(sink, chunksizes=(1, 7, 20, 1000)):
+    """Check that preprocess_stream over the sample csv writes the same dataframe as fit and transform on the whole
+    file, for chunks smaller than, around and larger than the file
+
+    Arguments:
+        sink {string} -- the parquet file to be written
+    """
+    df = pd.read_csv(SAMPLE_PATH, index_col=0)
+    _, proc = make_sample_pipeline()
+    expected = proc.fit(df).transform(df)
+    for chunksize in chunksizes:
+        proc.preprocess_stream(SAMPLE_PATH, sink, chunksize=chunksize, index_col=0)
+        pd.testing.assert_frame_equal(pd.read_parquet(sink), expected, obj="preprocess_stream with chunksize {}".format(chunksize))
+
+def bench_impute_columns(num_rows=100000, num_columns=300, num_object_columns=20):
+    """Compare imputing many columns with one impute_NaN_column manipulation each against one impute_NaN_columns
+    """
+    rng = np.random.default_rng(0)
+    df = make_frame(num_rows, num_columns)
+    words = np.array(["value_{}".format(i) for i in range(1000)], dtype=object)
+    for i in range(num_object_columns):
+        column = words[rng.integers(0, len(words), num_rows)]
+        column[rng.random(num_rows) < 0.1] = None
+        df["object_{}".format(i)] = column
+    strategies = {column_name: ("mean", "median")[i % 2] for i, column_name in enumerate(df.columns[:num_columns])}
+    strategies.update({column_name: "most_frequent" for column_name in df.columns[num_columns:]})
+
+    per_column = preprocessor(df)
+    for column_name, strategy in strategies.items():
+        per_column.append_manipulation(manipulator(impute_NaN_column, column_name, strategy))
+    print("Impute {} columns ({} rows):".format(len(strategies), num_rows))
+    for name, run in (("impute_NaN_column", per_column.preprocess), ("impute_NaN_columns", lambda: impute_NaN_columns(df, strategies))):
+        seconds, peak = measure(run)
+        print("\t{}{:.2f}s, peak {:.0f}MB".format(name.ljust(24), seconds, peak/1e6))
+    column = df["object_0"]
+    print("\tmost_frequent of one object column: Series.mode {:.3f}s, get_mode {:.3f}s".format(
+        timed(lambda: column.mode(dropna=True).iloc[0]), timed(get_mode, column)))
+
+
+def make_mixed_frame(num_rows, num_numeric=4, num_categorical=2, num_binary=1, num_dates=1, num_text=1, nan_rate=0.1, cardinality=100, seed=0):
+    """Build a synthetic dataframe mixing numeric, categorical, binary, date string and free text columns with missing values
+
+    Arguments:
+        num_rows {int} -- the number of rows
+
+    Keyword Arguments:
+        num_numeric {int} -- the number of float columns, named num_0, num_1, ... (default: {4})
+        num_categorical {int} -- the number of string label columns, named cat_0, ... (default: {2})
+        num_binary {int} -- the number of yes/no columns, named bin_0, ... (default: {1})
+        num_dates {int} -- the number of year-month-day date string columns, named date_0, ... (default: {1})
+        num_text {int} -- the number of free text columns, almost all values distinct, named text_0, ... (default: {1})
+        nan_rate {float} -- the fraction of values that are missing in every column but the binary ones (default: {0.1})
+        cardinality {int} -- the number of distinct values of each categorical and date column (default: {100})
+        seed {int} -- the random seed (default: {0})
+
+    Returns:
+        pandas dataframe -- the synthetic dataframe
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for i in range(num_numeric):
+        columns["num_{}".format(i)] = rng.normal(size=num_rows)
+    labels = np.array(["label_{}".format(i) for i in range(cardinality)], dtype=object)
+    for i in range(num_categorical):
+        columns["cat_{}".format(i)] = labels[rng.integers(0, cardinality, num_rows)]
+    for i in range(num_binary):
+        columns["bin_{}".format(i)] = np.array(["no", "yes"], dtype=object)[rng.integers(0, 2, num_rows)]
+    days = pd.date_range("2000-01-01", periods=cardinality, freq="D").strftime("%Y-%m-%d").to_numpy(dtype=object)
+    for i in range(num_dates):
+        columns["date_{}".format(i)] = days[rng.integers(0, cardinality, num_rows)]
+    # distinct sentences are drawn from a pool, so building 10M rows does not format 10M strings
+    words = np.array(["data", "frame", "value", "model", "train", "clean", "sample", "noise", "label", "feature"], dtype=object)
+    pool_size = min(num_rows, 100000)
+    pool = words[rng.integers(0, len(words), pool_size)] + " " + words[rng.integers(0, len(words), pool_size)] + " " + np.array(
+        [str(i) for i in range(pool_size)], dtype=object)
+    for i in range(num_text):
+        columns["text_{}".format(i)] = pool[rng.integers(0, pool_size, num_rows)]
+
+    df = pd.DataFrame(columns)
+    # encode_nominal counts a missing value as a third value, so the binary columns are kept complete
+    for column_name in [column_name for column_name in df.columns if not column_name.startswith("bin_")]:
+        is_missing = rng.random(num_rows) < nan_rate
+        df[column_name] = df[column_name].where(~is_missing)
+    return df
+
+def make_suite_manipulations(df):
+    """Build one manipulation of every function of manipulator.py over a make_mixed_frame dataframe
+
+    Arguments:
+        df {pandas dataframe} -- the dataframe, with the default columns
+
+    Returns:
+        dict -- benchmark name --> manipulator
+    """
+    return {
+        "drop_columns": manipulator(drop_columns, ["num_0"]),
+        "drop_rows": manipulator(drop_rows, list(df.index[::10])),
+        "encode_ordinal": manipulator(encode_ordinal, "cat_0"),
+        "encode_nominal": manipulator(encode_nominal, "cat_0", False),
+        "encode_nominal_binary": manipulator(encode_nominal, "bin_0", True),
+        "encode_regex": manipulator(encode_regex, "text_0", {"^data": 1, "model": 2, "[0-9]5$": 3}),
+        "encode_class_label": manipulator(encode_class_label, "cat_1"),
+        "fill_NaN_column": manipulator(fill_NaN_column, "num_1", 0.0),
+        "impute_NaN_column_median": manipulator(impute_NaN_column, "num_1", "median"),
+        "impute_NaN_column_most_frequent": manipulator(impute_NaN_column, "cat_0", "most_frequent"),
+        "fill_NaN_columns": manipulator(fill_NaN_columns, {"num_1": 0.0}, {"num_2": "mean"}),
+        "impute_NaN_columns": manipulator(impute_NaN_columns, {"num_1": "mean", "num_2": "median", "cat_0": "most_frequent"}),
+        "impute_NaN_columns_grouped": manipulator(impute_NaN_columns, {"num_1": "mean", "cat_0": "most_frequent"}, "cat_1"),
+        "handle_date": manipulator(handle_date, "date_0"),
+        "reduce_memory": manipulator(reduce_memory),
+    }
+
+def make_suite_pipeline(df):
+    """Build a preprocessing pipeline over a make_mixed_frame dataframe that touches every kind of column
+
+    Arguments:
+        df {pandas dataframe} -- the dataframe
+
+    Returns:
+        list -- the manipulator objects, in order
+    """
+    return [
+        manipulator(impute_NaN_columns, {"num_1": "mean", "num_2": "median", "cat_0": "most_frequent"}),
+        manipulator(encode_nominal, "cat_0", False),
+        manipulator(encode_class_label, "cat_1"),
+        manipulator(encode_nominal, "bin_0", True),
+        manipulator(encode_regex, "text_0", {"^data": 1, "model": 2}),
+        manipulator(handle_date, "date_0"),
+        manipulator(fill_NaN_column, "num_3", 0.0),
+        manipulator(drop_columns, ["num_0"]),
+        manipulator(drop_rows, list(df.index[::10])),
+    ]
+
+SUITE_SIZES = (10000, 100000, 1000000, 10000000)
+
+def run_suite(sizes=SUITE_SIZES, output=None, baseline=None, tolerance=0.25, memory=True, **frame_kwargs):
+    """Time describe.describe, every manipulation of make_suite_manipulations and full preprocessor.preprocess
+    pipelines on make_mixed_frame dataframes of each size, and optionally save the results and compare them to a
+    baseline
+
+    Keyword Arguments:
+        sizes {tuple} -- the numbers of rows (default: {SUITE_SIZES})
+        output {string} -- json file to save the results to (default: {None})
+        baseline {string} -- json file of earlier results to compare against, see compare_results (default: {None})
+        tolerance {float} -- the fraction a time or peak memory may grow over the baseline before it is a regression (default: {0.25})
+        memory {bool} -- also record the peak memory, which runs every benchmark a second time (default: {True})
+        frame_kwargs -- passed on to make_mixed_frame
+
+    Returns:
+        tuple -- (the results, the regressions found by compare_results, empty without a baseline)
+    """
+    results = {"meta": {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+                        "cpus": os.cpu_count(), "frame": frame_kwargs},
+               "benchmarks": {}}
+    print("Benchmark suite:")
+    for num_rows in sizes:
+        df = make_mixed_frame(num_rows, **frame_kwargs)
+        suite = {"describe": lambda: describe.describe(df)}
+        for name, manipulation in make_suite_manipulations(df).items():
+            suite[name] = lambda manipulation=manipulation: manipulation.do(df)
+        pipeline = make_suite_pipeline(df)
+        suite["preprocess"] = lambda: _make_suite_preprocessor(df, pipeline).preprocess()
+        suite["preprocess_copy_free"] = lambda: _make_suite_preprocessor(df, pipeline).preprocess(copy_free=True)
+
+        for name, function in suite.items():
+            with contextlib.redirect_stdout(io.StringIO()):
+                if memory:
+                    seconds, peak = measure(function)
+                else:
+                    seconds, peak = timed(function), None
+            key = "{}/{}".format(name, num_rows)
+            results["benchmarks"][key] = {"seconds": seconds, "peak_bytes": peak}
+            print("\t{}{:.3f}s{}".format(key.ljust(48), seconds, "" if peak is None else " {:.1f}MB".format(peak/1e6)))
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+    regressions = []
+    if baseline is not None:
+        with open(baseline) as f:
+            regressions = compare_results(results, json.load(f), tolerance)
+        print("{} regressions against {}:".format(len(regressions), baseline))
+        for key, metric, before, after in regressions:
+            print("\t{} {}: {:.4g} --> {:.4g} ({:+.0%})".format(key, metric, before, after, after/before - 1))
+    return results, regressions
+
+def _make_suite_preprocessor(df, manipulations):
+    proc = preprocessor(df, copy=False)
+    for manipulation in manipulations:
+        proc.append_manipulation(manipulation)
+    return proc
+
+def compare_results(results, baseline, tolerance=0.25, min_seconds=0.01):
+    """Find the benchmarks that got slower or use more memory than in a baseline
+
+    Arguments:
+        results {dict} -- the results of run_suite
+        baseline {dict} -- earlier results of run_suite
+
+    Keyword Arguments:
+        tolerance {float} -- the fraction a metric may grow before it is a regression (default: {0.25})
+        min_seconds {float} -- times below this in the baseline are too noisy to compare (default: {0.01})
+
+    Returns:
+        list -- (benchmark, metric, baseline value, new value) of each regression
+    """
+    regressions = []
+    for key, metrics in results["benchmarks"].items():
+        before = baseline["benchmarks"].get(key)
+        if before is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if metrics.get(metric) is None or before.get(metric) is None:
+                continue
+            if metric == "seconds" and before[metric] < min_seconds:
+                continue
+            if metrics[metric] > before[metric]*(1 + tolerance):
+                regressions.append((key, metric, before[metric], metrics[metric]))
+    return regressions
+
+
+def bench_reduce_memory(num_rows=1000000):
+    """Compare preprocessor.preprocess of the suite pipeline with and without reduce_memory first
+    """
+    df = make_mixed_frame(num_rows)
+    df["count"] = np.arange(num_rows) % 1000
+    print("Reduce memory ({} rows):".format(num_rows))
+    for reduce in (False, True):
+        start_time = time.perf_counter()
+        proc = preprocessor(df, reduce_memory=reduce)
+        reduce_seconds = time.perf_counter() - start_time
+        for manipulation in make_suite_pipeline(df):
+            proc.append_manipulation(manipulation)
+        seconds, peak = measure(proc.preprocess, copy_free=True)
+        print("\t{}frame {:.1f}MB, reduce {:.2f}s, preprocess {:.2f}s {:.0f}MB".format(
+            ("reduced" if reduce else "as read").ljust(12), proc.df.memory_usage(deep=True).sum()/1e6, reduce_seconds, seconds, peak/1e6))
+
+
+def bench_pipeline_spec(num_rows=100000):
+    """Compare saving and loading a fitted pipeline as a pickle and as a JSON or YAML spec, and the time a fresh
+    python process takes to import the preprocessor and load the pipeline
+    """
+    df = make_mixed_frame(num_rows)
+    proc = preprocessor(df)
+    for manipulation in make_suite_pipeline(df)[:-1]:
+        proc.append_manipulation(manipulation)
+    proc.fit()
+    print("Pipeline spec ({} manipulations):".format(len(proc.manipulations)))
+    print("\t{}{}{}{}".format("format".ljust(10), "save".ljust(12), "load".ljust(12), "new process"))
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format, save, load in (("pickle", proc.save, "load"), ("json", proc.save_spec, "load_spec"),
+                                        ("yaml", proc.save_spec, "load_spec")):
+            path = os.path.join(directory, "pipeline." + file_format)
+            save_seconds = timed(save, path)
+            load_seconds = timed(getattr(preprocessor, load), path)
+            script = "from preprocessor import preprocessor; preprocessor.{}({!r})".format(load, path)
+            start_time = time.perf_counter()
+            subprocess.run([sys.executable, "-c", script], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            process_seconds = time.perf_counter() - start_time
+            print("\t{}{}{}{:.0f}ms".format(file_format.ljust(10), "{:.1f}ms".format(save_seconds*1e3).ljust(12),
+                                          "{:.1f}ms".format(load_seconds*1e3).ljust(12), process_seconds*1e3))
+
+
+def bench_incremental_describe(num_days=10, rows_per_day=100000):
+    """Compare profiling a table that grows every day from scratch against updating a saved profile_state with the
+    new day of rows only
+    """
+    days = [make_mixed_frame(rows_per_day, seed=day) for day in range(num_days)]
+    print("Incremental describe ({} rows per day):".format(rows_per_day))
+    print("\t{}{}{}{}".format("day".ljust(8), "full profile".ljust(16), "full approx".ljust(16), "update saved state"))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.pkl")
+        for day in range(num_days):
+            history = pd.concat(days[:day + 1], ignore_index=True)
+            full_seconds = timed(describe.profile, history)
+            approx_seconds = timed(describe.profile, history, approx=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                update_seconds = timed(describe.describe_update, path, days[day])
+            print("\t{}{}{}{:.2f}s".format(str(day + 1).ljust(8), "{:.2f}s".format(full_seconds).ljust(16),
+                                          "{:.2f}s".format(approx_seconds).ljust(16), update_seconds))
+
+def bench_polars_engine(row_counts=(100000, 1000000, 5000000)):
+    """Time the suite pipeline on the pandas engine and on the polars engine, from a pandas dataframe and from a
+    pyarrow table. The polars engine runs on a thread per cpu (POLARS_MAX_THREADS), so its speedup grows with the cpus
+    """
+    import polars as pl
+    import pyarrow as pa
+    print("Polars engine ({} cpus, {} polars threads):".format(os.cpu_count(), pl.thread_pool_size()))
+    print("\t{}{}{}{}".format("rows".ljust(12), "pandas".ljust(16), "polars".ljust(16), "polars from arrow"))
+    for num_rows in row_counts:
+        df = make_mixed_frame(num_rows)
+        proc = preprocessor(df, copy=False)
+        for manipulation in make_suite_pipeline(df):
+            proc.append_manipulation(manipulation)
+        proc.fit()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        expected = proc.transform(df)
+        pd.testing.assert_frame_equal(proc.transform(df, engine="polars"), expected)
+        print("\t{}{}{}{:.2f}s".format(str(num_rows).ljust(12), "{:.2f}s".format(timed(proc.transform, df)).ljust(16),
+                                      "{:.2f}s".format(timed(proc.transform, df, engine="polars")).ljust(16),
+                                      timed(proc.transform, table, engine="polars")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmarks, or the benchmark suite with --suite")
+    parser.add_argument("--suite", action="store_true", help="run run_suite instead of the individual benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SUITE_SIZES), help="the numbers of rows of the suite")
+    parser.add_argument("--output", help="json file to save the suite results to")
+    parser.add_argument("--baseline", help="json file of earlier suite results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth over the baseline")
+    parser.add_argument("--no-memory", action="store_true", help="do not record the peak memory of the suite")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    if arguments.suite:
+        _, regressions = run_suite(arguments.sizes, arguments.output, arguments.baseline, arguments.tolerance,
+                                   not arguments.no_memory, seed=arguments.seed)
+        sys.exit(1 if regressions else 0)
+
+    bench_pipeline_memory()
+    bench_row_missingness()
+    bench_profile()
+    bench_approx_unique()
+    bench_describe_csv()
+    bench_parallel_profile()
+    bench_online_latency()
+    bench_handle_date()
+    bench_encode_regex()
+    bench_encode_nominal()
+    bench_label_outputs()
+    bench_step_cache()
+    bench_optimizer()
+    bench_parallel_pipeline()
+    bench_preprocess_stream()
+    bench_impute_columns()
+    bench_reduce_memory()
+    bench_pipeline_spec()
+    bench_incremental_describe()
+    bench_polars_engine()
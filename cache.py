@@ -0,0 +1,239 @@
+import pandas as pd
+import hashlib
+import pickle
+import os
+from collections import OrderedDict
+"""
+step_cache:
+    caches the dataframe after each manipulation of a preprocessor, so that rerunning a pipeline after changing its
+    last manipulations resumes from the longest cached prefix instead of recomputing every step.
+    Each step is keyed by the key of the step before it plus the function, arguments and fitted state of its
+    manipulation. The first key is a fingerprint of the contents of the input dataframe.
+"""
+
+def fingerprint_frame(df):
+    """Hash the contents of a dataframe: values, index, column names and dtypes
+
+    Arguments:
+        df {pandas dataframe} -- the dataframe to be hashed
+
+    Returns:
+        string -- hex digest
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(pickle.dumps((list(df.columns), [str(dtype) for dtype in df.dtypes], df.shape)))
+    # categorize would factorize each column first, which only pays off for low cardinality columns
+    digest.update(pd.util.hash_pandas_object(df.index, categorize=False).to_numpy().tobytes())
+    for i in range(df.shape[1]):
+        digest.update(pd.util.hash_pandas_object(df.iloc[:, i], index=False, categorize=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def get_step_key(previous_key, manipulation, fitted=None):
+    """Key of the dataframe after a manipulation, given the key of the dataframe before it
+
+    Arguments:
+        previous_key {string} -- the key of the input of the manipulation (fingerprint_frame for the first one)
+        manipulation {manipulator} -- the manipulation
+
+    Keyword Arguments:
+        fitted {dict} -- the fitted state the manipulation is run with. None if it learns from its input (default: {None})
+
+    Returns:
+        string -- hex digest
+    """
+    function = manipulation.get_function()
+    digest = hashlib.blake2b(previous_key.encode(), digest_size=20)
+    digest.update("{}.{}".format(function.__module__, function.__qualname__).encode())
+    digest.update(_to_bytes(manipulation.get_args()))
+    digest.update(_to_bytes(fitted))
+    return digest.hexdigest()
+
+def _to_bytes(value):
+    try:
+        return pickle.dumps(value, protocol=4)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        # ex. lambdas in the arguments. repr is stable within a session, which is what the memory cache needs
+        return repr(value).encode()
+
+
+# file format --> (file extension, writer, reader). parquet and feather need pyarrow
+CACHE_FILE_FORMATS = {
+    "pickle": (".pkl", lambda df, path: df.to_pickle(path), pd.read_pickle),
+    "parquet": (".parquet", lambda df, path: df.to_parquet(path), pd.read_parquet),
+    "feather": (".feather", lambda df, path: _write_feather(df, path), lambda path: _read_feather(path)),
+}
+
+def _write_feather(df, path):
+    # pandas' to_feather refuses a non default index, which drop_rows leaves behind. The arrow table keeps it in
+    # its pandas metadata instead
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=True), path)
+
+def _read_feather(path):
+    import pyarrow.feather as feather
+    return feather.read_table(path).to_pandas()
+
+
+class step_cache:
+    """Size bounded LRU cache of the dataframes produced by the manipulations of a preprocessor. Kept in memory and
+    optionally spilled to a directory on disk. Hits and misses are counted in manipulations
+    """
+    def __init__(self, max_bytes=1 << 30, directory=None, file_format="pickle", max_disk_bytes=None):
+        """Intialize an empty cache
+
+        Keyword Arguments:
+            max_bytes {int} -- the max memory used by the cached dataframes (default: {1 << 30})
+            directory {string} -- directory to also keep the cached dataframes in, kept across sessions. Memory only if None (default: {None})
+            file_format {string} -- "pickle", "parquet" or "feather" (default: {"pickle"})
+            max_disk_bytes {int} -- the max size of the files in directory. Not bounded if None (default: {None})
+
+        Raises:
+            ValueError: raises error if the file format is not one of CACHE_FILE_FORMATS
+        """
+        if file_format not in CACHE_FILE_FORMATS:
+            raise ValueError("file_format needs to be one of {}".format(list(CACHE_FILE_FORMATS)))
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.file_format = file_format
+        self.max_disk_bytes = max_disk_bytes
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        # key --> (dataframe, bytes, seconds it took to compute from the input of the pipeline), least recent first
+        self.entries = OrderedDict()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+    def __contains__(self, key):
+        return key in self.entries or (self.directory is not None and os.path.exists(self._get_path(key)))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Return a copy of the cached dataframe, or None. Does not count as a hit or miss
+
+        Arguments:
+            key {string} -- the key of the dataframe
+
+        Returns:
+            pandas dataframe -- a copy of the cached dataframe
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key][0].copy()
+        if self.directory is None or not os.path.exists(self._get_path(key)):
+            return None
+
+        path = self._get_path(key)
+        df, seconds = CACHE_FILE_FORMATS[self.file_format][2](path), self._read_seconds(key)
+        # the modification time orders the files for eviction
+        os.utime(path)
+        self._put_in_memory(key, df, seconds)
+        return df.copy()
+
+    def put(self, key, df, seconds=0.0):
+        """Cache a copy of a dataframe
+
+        Arguments:
+            key {string} -- the key of the dataframe
+            df {pandas dataframe} -- the dataframe to be cached
+
+        Keyword Arguments:
+            seconds {float} -- the time it took to compute the dataframe, reported by seconds_saved on hits (default: {0.0})
+        """
+        df = df.copy()
+        self._put_in_memory(key, df, seconds)
+        if self.directory is not None:
+            CACHE_FILE_FORMATS[self.file_format][1](df, self._get_path(key))
+            with open(self._get_path(key) + ".seconds", "w") as f:
+                f.write(str(seconds))
+            self._evict_files()
+
+    def get_longest_prefix(self, keys):
+        """Find the last step of a pipeline whose output is cached, and count the steps it saves as hits and the rest
+        as misses
+
+        Arguments:
+            keys {list} -- the key of each step of the pipeline, in order
+
+        Returns:
+            tuple -- (number of cached steps, copy of the output of the last cached step or None if no step is cached,
+                      seconds it took to compute that output)
+        """
+        for num_cached in range(len(keys), 0, -1):
+            if keys[num_cached - 1] in self:
+                df = self.get(keys[num_cached - 1])
+                seconds = self._get_seconds(keys[num_cached - 1])
+                self.hits += num_cached
+                self.misses += len(keys) - num_cached
+                self.seconds_saved += seconds
+                return num_cached, df, seconds
+        self.misses += len(keys)
+        return 0, None, 0.0
+
+    def get_stats(self):
+        """Return the hit and miss counters and the size of the cache
+
+        Returns:
+            dict -- "hits", "misses" (in manipulations), "seconds_saved", "entries" and "bytes" in memory
+        """
+        return {"hits": self.hits, "misses": self.misses, "seconds_saved": self.seconds_saved,
+                "entries": len(self.entries), "bytes": self.num_bytes}
+
+    def clear(self):
+        """Remove every cached dataframe, from memory and from disk
+        """
+        self.entries.clear()
+        self.num_bytes = 0
+        for path in self._get_files():
+            os.remove(path)
+            if os.path.exists(path + ".seconds"):
+                os.remove(path + ".seconds")
+
+    def _put_in_memory(self, key, df, seconds):
+        if key in self.entries:
+            self.num_bytes -= self.entries.pop(key)[1]
+        num_bytes = int(df.memory_usage(index=True, deep=True).sum())
+        if num_bytes > self.max_bytes:
+            return
+        self.entries[key] = (df, num_bytes, seconds)
+        self.num_bytes += num_bytes
+        while self.num_bytes > self.max_bytes:
+            _, (_, evicted_bytes, _) = self.entries.popitem(last=False)
+            self.num_bytes -= evicted_bytes
+
+    def _get_seconds(self, key):
+        return self.entries[key][2] if key in self.entries else self._read_seconds(key)
+
+    def _read_seconds(self, key):
+        try:
+            with open(self._get_path(key) + ".seconds") as f:
+                return float(f.read())
+        except (OSError, ValueError):
+            return 0.0
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + CACHE_FILE_FORMATS[self.file_format][0])
+
+    def _get_files(self):
+        if self.directory is None:
+            return []
+        extension = CACHE_FILE_FORMATS[self.file_format][0]
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(extension)]
+
+    def _evict_files(self):
+        if self.max_disk_bytes is None:
+            return
+        files = sorted(self._get_files(), key=os.path.getmtime)
+        total_bytes = sum(os.path.getsize(path) for path in files)
+        for path in files[:-1]:
+            if total_bytes <= self.max_disk_bytes:
+                break
+            total_bytes -= os.path.getsize(path)
+            os.remove(path)
+            if os.path.exists(path + ".seconds"):
+                os.remove(path + ".seconds")
@@ -0,0 +1,216 @@
+import numpy as np
+from manipulator import *
+"""
+compiled_preprocessor:
+    a fitted preprocessor turned into plain python functions over records (dicts of column name --> value), for scoring
+    single records or small batches without building a dataframe. Gives the same values as preprocessor.transform.
+"""
+
+class compiled_preprocessor:
+    """The manipulations of a fitted preprocessor as plain python functions over records
+    """
+    def __init__(self, manipulations):
+        """Compile the manipulations. Use preprocessor.compile
+
+        Arguments:
+            manipulations {list} -- fitted manipulator objects
+
+        Raises:
+            ValueError: raises error if a manipulation is not fitted or can not be compiled
+        """
+        self.steps = [compile_manipulation(manipulation) for manipulation in manipulations]
+
+    def transform_record(self, record):
+        """Apply the manipulations to one record
+
+        Arguments:
+            record {dict} -- column name --> value, in dataframe column order
+
+        Returns:
+            dict -- the manipulated copy of the record
+        """
+        record = dict(record)
+        for step in self.steps:
+            step(record)
+        return record
+
+    def transform_records(self, records):
+        """Apply the manipulations to a small batch of records
+
+        Arguments:
+            records {list} -- the records to be manipulated
+
+        Returns:
+            list -- the manipulated copies of the records
+        """
+        return [self.transform_record(record) for record in records]
+
+
+def compile_manipulation(manipulation):
+    """Turn a fitted manipulation into a function that manipulates a record in place
+
+    Arguments:
+        manipulation {manipulator} -- the fitted manipulation
+
+    Raises:
+        ValueError: raises error if the manipulation is not fitted or can not be compiled
+
+    Returns:
+        function -- record --> None
+    """
+    compiler = COMPILERS.get(manipulation.get_function())
+    if compiler is None:
+        raise ValueError("Manipulation \'" + manipulation.get_operation_name() + "\' can not be compiled to work on records")
+    if not manipulation.is_fitted():
+        raise ValueError("Manipulation \'" + manipulation.get_operation_name() + "\' needs to be fit before it is compiled")
+    return compiler(manipulation.fitted, *manipulation.get_args())
+
+def is_missing(value):
+    """Fast check of a single value for None/nan/NaT/NA
+    """
+    return value is None or value is pd.NA or value != value
+
+def _compile_drop_columns(fitted, column_names):
+    def step(record):
+        for column_name in column_names:
+            del record[column_name]
+    return step
+
+def _compile_lookup(column_name, values, dtype):
+    # missing values and values that were not seen in fit become nan, like the dataframe path
+    lookup = {value: dtype(i) for i, value in enumerate(values) if not is_missing(value)}
+    missing_code = next((dtype(i) for i, value in enumerate(values) if is_missing(value)), np.nan)
+    def step(record):
+        value = record[column_name]
+        record[column_name] = missing_code if is_missing(value) else lookup.get(value, np.nan)
+    return step
+
+def _compile_label_output(column_name, categories, output, on_unknown):
+    # "codes" gives the int code (-1 if missing), "category" keeps the value itself, like an element of a Categorical
+    lookup = {category: (i if output == "codes" else category) for i, category in enumerate(categories) if not is_missing(category)}
+    missing_value = -1 if output == "codes" else np.nan
+    def step(record):
+        value = record[column_name]
+        if is_missing(value):
+            record[column_name] = missing_value
+        elif value in lookup:
+            record[column_name] = lookup[value]
+        else:
+            record[column_name] = on_unknown(value)
+    return step
+
+def _compile_encode_ordinal(fitted, column_name, category_order=None, output="legacy"):
+    def on_unknown(value):
+        raise ValueError("Found unknown categories {} in column {}".format([value], column_name))
+    if output != "legacy":
+        return _compile_label_output(column_name, fitted["categories"], output, on_unknown)
+    lookup = {category: float(i) for i, category in enumerate(fitted["categories"])}
+    def step(record):
+        value = record[column_name]
+        if is_missing(value):
+            record[column_name] = np.nan
+        elif value in lookup:
+            record[column_name] = lookup[value]
+        else:
+            on_unknown(value)
+    return step
+
+def _compile_encode_nominal(fitted, column_name, binary, output="dense", top_k=None, other_label="other"):
+    if binary:
+        return _compile_lookup(column_name, fitted["values"], int)
+    categories = fitted["categories"]
+    dummy_names = ["{}_{}".format(column_name, category) for category in categories]
+    other = fitted.get("other")
+    lookup = {category: i for i, category in enumerate(categories[:other])}
+    # records are always dense, a sparse column gives uint8 values like its dense equivalent
+    hot_type = bool if output == "dense" else np.uint8
+    def step(record):
+        value = record.pop(column_name)
+        hot = None if is_missing(value) else lookup.get(value, other)
+        # the dummy columns go at the end, like encode_nominal
+        for i, dummy_name in enumerate(dummy_names):
+            record[dummy_name] = hot_type(i == hot)
+    return step
+
+def _compile_encode_class_label(fitted, column_name, output="legacy"):
+    if output != "legacy":
+        missing_value = -1 if output == "codes" else np.nan
+        return _compile_label_output(column_name, fitted["classes"], output, lambda value: missing_value)
+    return _compile_lookup(column_name, fitted["classes"], int)
+
+def _compile_encode_regex(fitted, column_name, regex_mapping, precedence="first"):
+    encoder = get_regex_encoder(tuple(regex_mapping.keys()), precedence)
+    encoded_values = list(regex_mapping.values()) + [None]
+    def step(record):
+        # missing values match none of the regular exp., like encode_regex
+        value = record[column_name]
+        record[column_name] = None if is_missing(value) else encoded_values[encoder.match_one(str(value))]
+    return step
+
+def _compile_fill(column_name, fill_value):
+    def step(record):
+        if is_missing(record[column_name]):
+            record[column_name] = fill_value
+    return step
+
+def _compile_fill_NaN_column(fitted, column_name, fill_value):
+    return _compile_fill(column_name, fill_value)
+
+def _compile_impute_NaN_column(fitted, column_name, strategy):
+    return _compile_fill(column_name, fitted["fill_value"])
+
+def _compile_fill_NaN_columns(fitted, fill_values, strategies=None):
+    fills = list(fitted["fill_values"].items())
+    def step(record):
+        for column_name, fill_value in fills:
+            if is_missing(record[column_name]):
+                record[column_name] = fill_value
+    return step
+
+def _compile_impute_NaN_columns(fitted, strategies, group_by=None):
+    if fitted["group_by"] is None:
+        return _compile_fill_NaN_columns(fitted, {})
+    group_positions = {group_key: i for i, group_key in enumerate(fitted["group_keys"])}
+    # the last value of each column is the statistic of the whole column, for rows of a group not seen in fit
+    fills = [(column_name, group_values + [fitted["fill_values"][column_name]])
+             for column_name, group_values in fitted["group_fill_values"].items()]
+    def step(record):
+        if isinstance(group_by, list):
+            group_key = tuple(record[column_name] for column_name in group_by)
+        else:
+            group_key = record[group_by]
+        position = group_positions.get(group_key, -1)
+        for column_name, fill_values in fills:
+            if is_missing(record[column_name]):
+                record[column_name] = fill_values[position]
+    return step
+
+def _compile_reduce_memory(fitted, *args):
+    # the dtypes hold the same values, so records are left as they are
+    def step(record):
+        pass
+    return step
+
+def _compile_handle_date(fitted, column_name, date_format=None, tz=None):
+    new_col_names = [column_name + x for x in DATE_COLUMN_SUFFIXES]
+    def step(record):
+        date_list = convert_date_to_date_list(record[column_name], date_format, tz)
+        for new_col, val in zip(new_col_names, date_list):
+            record[new_col] = val
+        del record[column_name]
+    return step
+
+# manipulation function --> function compiling it for records. drop_rows has no meaning for records and is left out
+COMPILERS = {
+    drop_columns: _compile_drop_columns,
+    encode_ordinal: _compile_encode_ordinal,
+    encode_nominal: _compile_encode_nominal,
+    encode_class_label: _compile_encode_class_label,
+    encode_regex: _compile_encode_regex,
+    fill_NaN_column: _compile_fill_NaN_column,
+    impute_NaN_column: _compile_impute_NaN_column,
+    fill_NaN_columns: _compile_fill_NaN_columns,
+    impute_NaN_columns: _compile_impute_NaN_columns,
+    reduce_memory: _compile_reduce_memory,
+    handle_date: _compile_handle_date,
+}
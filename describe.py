@@ -1,137 +1,568 @@
 import pandas as pd 
 import numpy as np 
 import time
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
 from constants import *
+from sketch import hyperloglog, unique_reservoir
 """
 describe(df):
     prints out a description of the df. Goes column by column displaying the object type, unique values, and the recommended encoding method.
 """
 
-def describe(df):
+def describe(df, approx=False, n_jobs=1, backend="thread"):
     """
     TODO: Check duplicate indices
+
+    approx: estimate the number of unique values with a HyperLogLog sketch instead of hashing every value, see profile
+    n_jobs, backend: profile the columns concurrently, see profile
     """
-    # Describe Dataframe shape **************************************************************************************************************************************************
-    num_rows = df.shape[0]
-    num_columns = df.shape[1]
-    print("{}Dataframe Shape:{}".format(bcolors.UNDERLINE, bcolors.ENDC))
-    print("\t{}{} rows{} and {}{} columns{}.".format(bcolors.YELLOW, num_rows, bcolors.ENDC, bcolors.YELLOW, num_columns, bcolors.ENDC))
+    row_missing = get_row_missing_buckets(df)
+    row_missing_counts = {bucket: len(row_indices) for bucket, row_indices in row_missing.items()}
+    column_profile = profile(df, approx=approx, n_jobs=n_jobs, backend=backend)
+    print_description(df.shape[0], df.shape[1], row_missing_counts, column_profile, approx)
 
-    # Describe Dataframe Rows *************************************************************************************************************************************************
-    print("{}Dataframe Rows:{}".format(bcolors.UNDERLINE, bcolors.ENDC))
-    print("\t{}{}{}".format(bcolors.PURPLE, "Missing Values:", bcolors.ENDC))
-    # now do rows
-    # nan count --> [] of row indices
-    row_nan_count_dict = {}
-    for index, row in df.iterrows():
-        nan_count = row.isnull().sum()
-        index_list = row_nan_count_dict.get(nan_count, None)
-        if index_list:
-            # if value already exists append the index to the list
-            row_nan_count_dict[nan_count] = index_list.append(index)
-        else:
-            # if value does not exist create a new list
-            new_index_list = [index]
-            row_nan_count_dict[nan_count] = new_index_list
+def describe_csv(path, chunksize=100000, approx=True, **read_csv_kwargs):
+    """Describe a csv file that may not fit in memory. The file is read chunksize rows at a time and the statistics of
+    describe are merged across chunks, so peak memory is bounded by the chunk size. Exact unique counts (approx=False)
+    hold every distinct value of every column and are only bounded by the cardinality of the data.
+
+    Arguments:
+        path {string} -- the path of the csv file, or anything else pd.read_csv accepts
 
-    # 50% + rows:
-    fifty_plus_count = 0
-    fifty_perc_rows = int(num_rows*thresholds.FIFTY_MISSING)
-    hund_perc_rows = int(num_rows*thresholds.ALL_MISSING)
-    for i in range(fifty_perc_rows, hund_perc_rows):
-        fifty_plus_count += len(row_nan_count_dict.get(i, []))
+    Keyword Arguments:
+        chunksize {int} -- the number of rows read at a time (default: {100000})
+        approx {bool} -- estimate the number of unique values, see profile (default: {True})
+        read_csv_kwargs -- passed on to pd.read_csv (ex. index_col=0)
 
-    # 25%-50% rows:
-    twenty_five_count = 0
-    twenty_five_perc_rows = int(num_rows*thresholds.TWENTY_FIVE_MISSING)
-    for i in range(twenty_five_perc_rows, fifty_perc_rows):
-        twenty_five_count += len(row_nan_count_dict.get(i, []))
+    Returns:
+        profile_state -- the merged statistics of the file
+    """
+    state = profile_state(approx=approx)
+    for chunk in pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs):
+        state.update(chunk)
+    state.describe()
+    return state
+
+def describe_update(state_path, df, approx=True, precision=14):
+    """Describe a growing table from the new rows only: add them to the statistics saved at state_path (started if the
+    file does not exist), save the statistics back and print the description of every row seen so far
 
-    # 10%-25% rows:
-    ten_count = 0
-    ten_perc_rows = int(num_rows*thresholds.TEN_MISSING)
-    for i in range(ten_perc_rows, twenty_five_perc_rows):
-        ten_count += len(row_nan_count_dict.get(i, []))
+    Arguments:
+        state_path {string} -- the file holding the profile_state of the rows seen before
+        df {pandas dataframe} -- the new rows
 
-    header = "Num of rows w/ 50%+ values missing:".ljust(print_pref.PADDING_COLUMN, ' ')
-    print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, fifty_plus_count, bcolors.ENDC))
+    Keyword Arguments:
+        approx {bool} -- estimate the number of unique values, only used when the statistics are started. Exact counts
+                         hold every distinct value seen, so their cost grows with the table (default: {True})
+        precision {int} -- HyperLogLog precision, only used when the statistics are started (default: {14})
 
-    header = "Num of rows w/ 25%-50% values missing:".ljust(print_pref.PADDING_COLUMN, ' ')
-    print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, twenty_five_count, bcolors.ENDC))
+    Returns:
+        profile_state -- the statistics of every row seen so far
+    """
+    state = profile_state.load(state_path) if os.path.exists(state_path) else profile_state(approx, precision)
+    state.update(df)
+    state.save(state_path)
+    state.describe()
+    return state
 
-    header = "Num of rows w/ 10%-25% values missing:".ljust(print_pref.PADDING_COLUMN, ' ')
-    print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, ten_count, bcolors.ENDC))
+def print_description(num_rows, num_columns, row_missing_counts, column_profile, approx=False):
+    """Print the description of a dataframe from its statistics
+
+    Arguments:
+        num_rows {int} -- the number of rows
+        num_columns {int} -- the number of columns
+        row_missing_counts {dict} -- bucket name from ROW_MISSING_BUCKETS --> number of rows in the bucket
+        column_profile {pandas dataframe} -- the column statistics, see profile
+
+    Keyword Arguments:
+        approx {bool} -- the unique counts in column_profile are estimates (default: {False})
+    """
+    # Describe Dataframe shape **************************************************************************************************************************************************
+    print("{}Dataframe Shape:{}".format(bcolors.UNDERLINE, bcolors.ENDC))
+    print("\t{}{} rows{} and {}{} columns{}.".format(bcolors.YELLOW, num_rows, bcolors.ENDC, bcolors.YELLOW, num_columns, bcolors.ENDC))
+
+    # Describe Dataframe Rows *************************************************************************************************************************************************
+    print("{}Dataframe Rows:{}".format(bcolors.UNDERLINE, bcolors.ENDC))
+    print("\t{}{}{}".format(bcolors.PURPLE, "Missing Values:", bcolors.ENDC))
+    bucket_headers = [
+        ("all", "Num of rows w/ all values missing:"),
+        ("fifty", "Num of rows w/ 50%+ values missing:"),
+        ("twenty_five", "Num of rows w/ 25%-50% values missing:"),
+        ("ten", "Num of rows w/ 10%-25% values missing:"),
+    ]
+    for bucket, header in bucket_headers:
+        header = header.ljust(print_pref.PADDING_COLUMN, ' ')
+        print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, row_missing_counts[bucket], bcolors.ENDC))
 
 
     # Describe the Dataframes columns *******************************************************************************************************************************************
     print("{}Dataframe Columns:{}".format(bcolors.UNDERLINE, bcolors.ENDC))
-    for column_name in df.columns.values:
+    for column_name, column_stats in column_profile.iterrows():
         print("\t{}{}:{}".format(bcolors.BLUE, column_name, bcolors.ENDC))
 
         # Print column value type
         header = "Value type:".ljust(print_pref.PADDING_COLUMN, ' ')
-        dtype = df[column_name].dtype
-        print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, dtype, bcolors.ENDC))
+        print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, column_stats["dtype"], bcolors.ENDC))
 
         # Print number of unique values in df
         header = "Number of unique values: ".ljust(print_pref.PADDING_COLUMN, ' ')
-        unique_values = set(df[column_name].unique())
-        num_uniques = len(unique_values)
+        num_uniques = "~{}".format(column_stats["num_unique"]) if approx else column_stats["num_unique"]
         print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, num_uniques, bcolors.ENDC))
 
         # Print predicted column type
         header = "Predicted column type:".ljust(print_pref.PADDING_COLUMN, ' ')
-        pred_column_type = get_pred_column_type(unique_values, num_rows)
-        print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, pred_column_type, bcolors.ENDC))
+        print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, column_stats["pred_column_type"], bcolors.ENDC))
 
         # Print a "sneak peek" into unqiue values
         header = "Preview unique values:".ljust(print_pref.PADDING_COLUMN, ' ')
-        # get first 3 unique values --> preview. Max number of uniques shown is set by MAX_NUMBER_UNIQUE_PREVIEW_SHOWN. However, if a variable's string size is greater than 
-        # MAX_LENGTH_UNIQUE_PREVIEW, then stop printing values
-        unique_preview = set()
-        i = 1
-        for elem in unique_values:
-            unique_preview.add(elem)
-            if i >= print_pref.MAX_NUMBER_UNIQUE_PREVIEW_SHOWN:
-                break
-            elif len(str(elem)) >= print_pref.MAX_LENGTH_UNIQUE_PREVIEW:
-                break
-            i+= 1
-        print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, unique_preview, bcolors.ENDC))
+        print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, set(column_stats["preview"]), bcolors.ENDC))
 
         # Print number of missing values
-        nan_count = df[column_name].isna().sum()
-        nan_percent = (float(nan_count)/num_rows)*100
         header = "Number of nan values:".ljust(print_pref.PADDING_COLUMN, ' ')
-        print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, nan_count, bcolors.ENDC))
+        print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, column_stats["nan_count"], bcolors.ENDC))
 
         # Print percent of rows are missing values in this column
         header = "% of rows with nan values:".ljust(print_pref.PADDING_COLUMN, ' ')
-        print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, round(nan_percent,4), bcolors.ENDC))
+        print("\t\t{}{}{}{}".format(header, bcolors.YELLOW, round(column_stats["nan_percent"],4), bcolors.ENDC))
 
         # Print whether a column is clean or not
         header = "Is column clean?:".ljust(print_pref.PADDING_COLUMN, ' ')
-        is_clean = is_column_clean(df[column_name])
-        if is_clean:
+        if column_stats["is_clean"]:
             print("\t\t{}{}{}{}{}".format(bcolors.UNDERLINE, header, bcolors.GREEN, "YES {}".format(print_pref.CHECKMARK), bcolors.ENDC))
         else:
             print("\t\t{}{}{}{}{}".format(bcolors.UNDERLINE, header, bcolors.RED, "NO {}".format(print_pref.CROSSMARK), bcolors.ENDC))
 
 
+# Columns of the table returned by profile, one row per dataframe column
+PROFILE_COLUMNS = ["dtype", "num_unique", "pred_column_type", "preview", "nan_count", "nan_percent", "is_clean"]
+
+def profile(df, approx=False, precision=14, n_jobs=1, backend="thread"):
+    """Compute the per column statistics shown by describe. Missing values are counted for every column in one pass and
+    each column is hashed once for its unique values, which give both the cardinality and the preview.
+
+    With approx the unique values are never materialized: the cardinality is estimated with a HyperLogLog sketch and the
+    preview comes from a small reservoir. The estimate has a relative standard error of 1.04/sqrt(2^precision), 0.81% at
+    the default precision, and small counts are practically exact since they are estimated by linear counting (see
+    sketch.hyperloglog.standard_error). The 90% and 50% UNIQUE thresholds are compared against the estimate, so columns
+    within a few standard errors of a threshold may land on either side of it. PURE UNIQUE can not be decided by
+    equality and is given to columns whose estimate is within 3 standard errors of the number of rows.
+
+    Columns are independent, so with n_jobs they are profiled concurrently. The thread backend shares the dataframe with
+    the workers directly. The process backend sidesteps the GIL: numeric columns are copied once into a shared memory
+    block that the workers read without pickling, other columns are pickled to the workers.
+
+    Arguments:
+        df {pandas dataframe} -- the dataframe to be described
+
+    Keyword Arguments:
+        approx {bool} -- estimate the number of unique values instead of counting them (default: {False})
+        precision {int} -- HyperLogLog precision used when approx, see sketch.hyperloglog (default: {14})
+        n_jobs {int} -- the number of workers, -1 for one per cpu (default: {1})
+        backend {string} -- "thread" or "process" (default: {"thread"})
+
+    Returns:
+        pandas dataframe -- one row per column of df (indexed by column name) with the columns in PROFILE_COLUMNS
+    """
+    num_rows = df.shape[0]
+    nan_counts = df.isna().sum().to_numpy()
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+
+    if n_jobs == 1 or df.shape[1] <= 1:
+        records = [profile_column(df.iloc[:, i], num_rows, int(nan_counts[i]), approx, precision) for i in range(df.shape[1])]
+    elif backend == "thread":
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            # map returns the records in column order
+            records = list(executor.map(
+                lambda i: profile_column(df.iloc[:, i], num_rows, int(nan_counts[i]), approx, precision), range(df.shape[1])))
+    elif backend == "process":
+        records = _profile_columns_in_processes(df, nan_counts, approx, precision, n_jobs)
+    else:
+        raise ValueError("Backend \'" + backend + "\' is not a valid backend.")
+    return pd.DataFrame.from_records(records, index=df.columns, columns=PROFILE_COLUMNS)
+
+def profile_column(column, num_rows, nan_count, approx=False, precision=14):
+    """Compute the statistics of one column, see profile
+
+    Arguments:
+        column {pandas series} -- the column to be described
+        num_rows {int} -- the number of rows of the dataframe
+        nan_count {int} -- the number of missing values in the column
+
+    Keyword Arguments:
+        approx {bool} -- estimate the number of unique values instead of counting them (default: {False})
+        precision {int} -- HyperLogLog precision used when approx (default: {14})
+
+    Returns:
+        tuple -- the values of PROFILE_COLUMNS for the column
+    """
+    if approx:
+        sketch = hyperloglog(precision)
+        sketch.update(column)
+        reservoir = unique_reservoir()
+        reservoir.update(column)
+        num_uniques = get_approx_unique_count(sketch, num_rows)
+        pred_column_type = get_pred_column_type_from_count(num_uniques, num_rows, 3*sketch.standard_error())
+        unique_values = reservoir.values
+    else:
+        # pd.unique keeps a single nan, so the count matches set(column.unique())
+        unique_values = pd.unique(column)
+        num_uniques = len(unique_values)
+        pred_column_type = get_pred_column_type_from_count(num_uniques, num_rows)
+    return (
+        column.dtype,
+        num_uniques,
+        pred_column_type,
+        get_unique_preview(unique_values),
+        nan_count,
+        (float(nan_count)/num_rows)*100 if num_rows else 0.0,
+        is_numeric_dtype(column.dtype) and nan_count == 0,
+    )
+
+def _profile_columns_in_processes(df, nan_counts, approx, precision, n_jobs):
+    """Profile the columns of df across a process pool, see profile
+
+    Returns:
+        list -- the record of each column, in column order
+    """
+    num_rows = df.shape[0]
+    # lay the numpy backed numeric columns out back to back in one shared memory block
+    offsets = {}
+    total_bytes = 0
+    for i in range(df.shape[1]):
+        dtype = df.dtypes.iloc[i]
+        if isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+            offsets[i] = total_bytes
+            total_bytes += dtype.itemsize*num_rows
+    shared_block = shared_memory.SharedMemory(create=True, size=max(total_bytes, 1))
+    try:
+        tasks = []
+        for i in range(df.shape[1]):
+            column = df.iloc[:, i]
+            if i in offsets:
+                shared_values = np.ndarray(num_rows, dtype=column.dtype, buffer=shared_block.buf, offset=offsets[i])
+                shared_values[:] = column.to_numpy()
+                tasks.append((shared_block.name, offsets[i], column.dtype.str, column.name, None, num_rows, int(nan_counts[i]), approx, precision))
+            else:
+                tasks.append((None, None, None, column.name, column, num_rows, int(nan_counts[i]), approx, precision))
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            records = list(executor.map(_profile_column_task, tasks, chunksize=max(1, len(tasks)//(4*n_jobs))))
+    finally:
+        shared_block.close()
+        shared_block.unlink()
+    return records
+
+# shared memory blocks attached by this (worker) process, by name
+_attached_blocks = {}
+
+def _profile_column_task(task):
+    block_name, offset, dtype_str, column_name, column, num_rows, nan_count, approx, precision = task
+    if column is None:
+        shared_block = _attached_blocks.get(block_name)
+        if shared_block is None:
+            # the block belongs to the parent process, which unlinks it
+            shared_block = shared_memory.SharedMemory(name=block_name)
+            _attached_blocks[block_name] = shared_block
+        values = np.ndarray(num_rows, dtype=np.dtype(dtype_str), buffer=shared_block.buf, offset=offset)
+        column = pd.Series(values, name=column_name, copy=False)
+    return profile_column(column, num_rows, nan_count, approx, precision)
+
+def get_approx_unique_count(sketch, num_rows):
+    """Round a cardinality estimate to a possible number of unique values
+
+    Arguments:
+        sketch {hyperloglog} -- the sketch of the column
+        num_rows {int} -- the number of values added to the sketch
 
+    Returns:
+        int -- the estimated number of unique values, between 1 and num_rows
+    """
+    if num_rows == 0:
+        return 0
+    return int(min(max(round(sketch.count()), 1), num_rows))
+
+def get_unique_preview(unique_values):
+    """Get a "sneak peek" into the unique values of a column. Max number of uniques shown is set by MAX_NUMBER_UNIQUE_PREVIEW_SHOWN.
+    However, if a variable's string size is greater than MAX_LENGTH_UNIQUE_PREVIEW, then stop after that value
+
+    Arguments:
+        unique_values {iterable} -- the unique values of the column
+
+    Returns:
+        tuple -- the preview values
+    """
+    unique_preview = []
+    for elem in unique_values:
+        unique_preview.append(elem)
+        if len(unique_preview) >= print_pref.MAX_NUMBER_UNIQUE_PREVIEW_SHOWN:
+            break
+        elif len(str(elem)) >= print_pref.MAX_LENGTH_UNIQUE_PREVIEW:
+            break
+    return tuple(unique_preview)
+
+# Row missingness buckets, ordered from most to least missing: (name, lower bound on the fraction of missing values).
+# Each bucket runs up to the lower bound of the bucket before it, "fifty" excludes rows with all values missing.
+ROW_MISSING_BUCKETS = [
+    ("all", thresholds.ALL_MISSING),
+    ("fifty", thresholds.FIFTY_MISSING),
+    ("twenty_five", thresholds.TWENTY_FIVE_MISSING),
+    ("ten", thresholds.TEN_MISSING),
+]
+
+def get_row_missing_bucket_ids(row_nan_counts, num_columns):
+    """Assign each row to a missingness bucket from the number of missing values in it
+
+    Arguments:
+        row_nan_counts {numpy array} -- the number of missing values per row
+        num_columns {int} -- the number of columns in the dataframe
+
+    Returns:
+        numpy array -- index into ROW_MISSING_BUCKETS per row, len(ROW_MISSING_BUCKETS) for rows missing less than 10%
+    """
+    # lowest nan count that falls into each bucket, least missing first
+    cutoffs = np.ceil(np.array([lower for _, lower in reversed(ROW_MISSING_BUCKETS)]) * num_columns).astype(np.int64)
+    # a row with no columns is never missing anything
+    cutoffs = np.maximum(cutoffs, 1)
+    # bucket the (at most num_columns + 1) distinct nan counts once, then look every row up in that table
+    count_bucket = len(ROW_MISSING_BUCKETS) - np.searchsorted(cutoffs, np.arange(num_columns + 1), side="right")
+    return count_bucket[row_nan_counts]
+
+def get_row_missing_buckets(df):
+    """Group the rows of a dataframe by the fraction of their values that are missing, using the thresholds in constants
+
+    Arguments:
+        df {pandas dataframe} -- the dataframe to be described
+
+    Returns:
+        dict -- bucket name from ROW_MISSING_BUCKETS --> pandas index of the rows in that bucket
+    """
+    row_nan_counts = df.isna().sum(axis=1).to_numpy(dtype=np.int64)
+    bucket_ids = get_row_missing_bucket_ids(row_nan_counts, df.shape[1])
+    return {name: df.index[bucket_ids == i] for i, (name, _) in enumerate(ROW_MISSING_BUCKETS)}
+
+class profile_state:
+    """Running statistics of a dataframe that is seen a chunk of rows at a time, and that can be merged with the
+    statistics of other rows (ex. computed elsewhere) and saved to disk, so a growing table is described by updating
+    its stored state with the new rows only. Holds what describe reports: the histogram of the number of missing
+    values per row (bucketed against constants.thresholds when reported), and per column the reconciled dtype, nan
+    count, unique values (or a HyperLogLog sketch of them when approx) and a preview reservoir. The verdicts of describe
+    (predicted column type, is the column clean) are derived from these when reported.
+
+    Chunks may add or leave out columns: the rows without a column count as missing it.
+    """
+    def __init__(self, approx=False, precision=14):
+        """Intialize empty statistics
+
+        Keyword Arguments:
+            approx {bool} -- estimate the number of unique values, see profile (default: {False})
+            precision {int} -- HyperLogLog precision used when approx (default: {14})
+        """
+        self.approx = approx
+        self.precision = precision
+        self.num_rows = 0
+        self.columns = []
+        self.dtypes = {}
+        self.nan_counts = {}
+        # approx: column name --> hyperloglog, otherwise column name --> set of the non null values
+        self.uniques = {}
+        self.reservoirs = {}
+        # number of rows by their number of missing values, 0..len(columns)
+        self.row_nan_count_hist = np.zeros(1, dtype=np.int64)
+
+    def update(self, df):
+        """Add a chunk of rows to the statistics
+
+        Arguments:
+            df {pandas dataframe} -- the rows to be added
+        """
+        self._add_columns([column_name for column_name in df.columns if column_name not in self.nan_counts])
+        num_absent = len(self.columns) - df.shape[1]
+
+        isna = df.isna()
+        row_nan_counts = isna.sum(axis=1).to_numpy(dtype=np.int64) + num_absent
+        self.row_nan_count_hist += np.bincount(row_nan_counts, minlength=len(self.columns) + 1)
+
+        column_nan_counts = isna.sum().to_numpy()
+        for i, column_name in enumerate(df.columns):
+            column = df.iloc[:, i]
+            nan_count = int(column_nan_counts[i])
+            self.nan_counts[column_name] += nan_count
+            # a column that is all nan in this chunk says nothing about its dtype
+            if nan_count < len(column):
+                self.dtypes[column_name] = reconcile_dtypes(self.dtypes[column_name], column.dtype)
+            if self.approx:
+                self.uniques[column_name].update(column)
+            else:
+                self.uniques[column_name].update(column.dropna().unique())
+            self.reservoirs[column_name].update(column)
+        if num_absent:
+            for column_name in set(self.columns) - set(df.columns):
+                self.nan_counts[column_name] += df.shape[0]
+        self.num_rows += df.shape[0]
+
+    def merge(self, other):
+        """Merge the statistics of other rows into this one. The result describes the rows of both
+
+        Arguments:
+            other {profile_state} -- statistics with the same approx and precision
+
+        Raises:
+            ValueError: raises error if the statistics count unique values differently
+        """
+        if other.approx != self.approx or (self.approx and other.precision != self.precision):
+            raise ValueError("Cannot merge profile states with different approx or precision")
+        self._add_columns([column_name for column_name in other.columns if column_name not in self.nan_counts])
 
+        for column_name in other.columns:
+            self.nan_counts[column_name] += other.nan_counts[column_name]
+            if other.dtypes[column_name] is not None:
+                self.dtypes[column_name] = reconcile_dtypes(self.dtypes[column_name], other.dtypes[column_name])
+            if self.approx:
+                self.uniques[column_name].merge(other.uniques[column_name])
+            else:
+                self.uniques[column_name] |= other.uniques[column_name]
+            self.reservoirs[column_name].merge(other.reservoirs[column_name])
+        num_absent = len(self.columns) - len(other.columns)
+        for column_name in set(self.columns) - set(other.columns):
+            self.nan_counts[column_name] += other.num_rows
+        self.row_nan_count_hist[num_absent:] += other.row_nan_count_hist
+        self.num_rows += other.num_rows
+
+    def _add_columns(self, column_names):
+        """Start the statistics of new columns, which the rows seen so far are missing
+        """
+        if not column_names:
+            return
+        for column_name in column_names:
+            self.columns.append(column_name)
+            self.dtypes[column_name] = None
+            self.nan_counts[column_name] = self.num_rows
+            self.uniques[column_name] = hyperloglog(self.precision) if self.approx else set()
+            if self.approx and self.num_rows:
+                # the sketch counts nan as a value, like describe
+                self.uniques[column_name].update(pd.Series([np.nan]))
+            self.reservoirs[column_name] = unique_reservoir()
+        # every row seen so far misses one more value per new column
+        row_nan_count_hist = np.zeros(len(self.columns) + 1, dtype=np.int64)
+        row_nan_count_hist[len(column_names):] = self.row_nan_count_hist
+        self.row_nan_count_hist = row_nan_count_hist
+
+    def get_num_uniques(self, column_name):
+        """Get the number of unique values of a column, counting nan as one value like describe
+
+        Arguments:
+            column_name {string} -- the name of the column
+
+        Returns:
+            int -- the (estimated when approx) number of unique values
+        """
+        if self.approx:
+            return get_approx_unique_count(self.uniques[column_name], self.num_rows)
+        return len(self.uniques[column_name]) + (self.nan_counts[column_name] > 0)
+
+    def get_row_missing_counts(self):
+        """Get the number of rows in each row missingness bucket
+
+        Returns:
+            dict -- bucket name from ROW_MISSING_BUCKETS --> number of rows in the bucket
+        """
+        bucket_ids = get_row_missing_bucket_ids(np.arange(len(self.columns) + 1), len(self.columns))
+        bucket_counts = np.bincount(bucket_ids, weights=self.row_nan_count_hist, minlength=len(ROW_MISSING_BUCKETS) + 1)
+        return {name: int(bucket_counts[i]) for i, (name, _) in enumerate(ROW_MISSING_BUCKETS)}
+
+    def get_profile(self):
+        """Get the column statistics in the same table as profile
+
+        Returns:
+            pandas dataframe -- one row per column (indexed by column name) with the columns in PROFILE_COLUMNS
+        """
+        records = []
+        for column_name in self.columns:
+            dtype = self.dtypes[column_name]
+            if dtype is None:
+                # every value was nan, which pd.read_csv reads as float64
+                dtype = np.dtype(np.float64)
+            num_uniques = self.get_num_uniques(column_name)
+            tolerance = 3*self.uniques[column_name].standard_error() if self.approx else 0.0
+            nan_count = self.nan_counts[column_name]
+            records.append((
+                dtype,
+                num_uniques,
+                get_pred_column_type_from_count(num_uniques, self.num_rows, tolerance),
+                get_unique_preview(self.reservoirs[column_name].values),
+                nan_count,
+                (float(nan_count)/self.num_rows)*100 if self.num_rows else 0.0,
+                is_numeric_dtype(dtype) and nan_count == 0,
+            ))
+        return pd.DataFrame.from_records(records, index=pd.Index(self.columns), columns=PROFILE_COLUMNS)
+
+    def describe(self):
+        """Print the description of the rows seen so far, like describe
+        """
+        print_description(self.num_rows, len(self.columns), self.get_row_missing_counts(), self.get_profile(), self.approx)
+
+    def save(self, path):
+        """Save the statistics to disk, to be updated with new rows later
+
+        Arguments:
+            path {string} -- the file to be written
+        """
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path):
+        """Load statistics saved with save
+
+        Arguments:
+            path {string} -- the file to be read
+
+        Returns:
+            profile_state -- the statistics
+        """
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def reconcile_dtypes(dtype_a, dtype_b):
+    """Find the dtype that holds the values of two chunks of a column, the way pd.read_csv would over the whole file
+
+    Arguments:
+        dtype_a {dtype} -- the dtype of the first chunk, or None if unknown
+        dtype_b {dtype} -- the dtype of the second chunk
+
+    Returns:
+        dtype -- the reconciled dtype
+    """
+    if dtype_a is None or dtype_a == dtype_b:
+        return dtype_b
+    if is_numeric_dtype(dtype_a) and is_numeric_dtype(dtype_b):
+        try:
+            return np.result_type(dtype_a, dtype_b)
+        except TypeError:
+            pass
+    return np.dtype(object)
 
-        
 def get_pred_column_type(unique_values_set, number_rows):
-    if len(unique_values_set) == thresholds.UNARY:
+    return get_pred_column_type_from_count(len(unique_values_set), number_rows)
+
+def get_pred_column_type_from_count(num_uniques, number_rows, tolerance=0.0):
+    """
+    tolerance: error allowed on an estimated num_uniques. A column counts as PURE UNIQUE when its unique count is
+    within tolerance values of the number of rows
+    """
+    if num_uniques == thresholds.UNARY:
         return "UNARY"
-    elif len(unique_values_set) == thresholds.BINARY:
+    elif num_uniques == thresholds.BINARY:
         return "BINARY"
-    elif len(unique_values_set) == thresholds.PURE_UNIQUE*number_rows:
+    elif num_uniques >= thresholds.PURE_UNIQUE*number_rows - tolerance:
         return "PURE UNIQUE"
-    elif len(unique_values_set) >= thresholds.NINETY_UNIQUE*number_rows:
+    elif num_uniques >= thresholds.NINETY_UNIQUE*number_rows:
         return "90% UNIQUE"
-    elif len(unique_values_set) >= thresholds.FIFTY_UNIQUE*number_rows:
+    elif num_uniques >= thresholds.FIFTY_UNIQUE*number_rows:
         return "50% UNIQUE"
     else:
         return "NONE"
@@ -142,12 +573,19 @@ def is_column_clean(column):
     Output: 0 = Not clean, 1 = Clean
     """
     # check that column is numeric
-    is_numeric = np.issubdtype(column.dtype, np.number)
+    is_numeric = is_numeric_dtype(column.dtype)
     # check that column has no NAN
     contains_nulls = column.isnull().values.any()
 
     return is_numeric and not contains_nulls
 
-# start_time = time.time()
+def is_numeric_dtype(dtype):
+    """Check that a dtype holds numbers. Booleans do not count as numeric
+
+    Arguments:
+        dtype {dtype} -- a numpy or pandas dtype
 
-# print("--- %s seconds ---" % (time.time() - start_time))
+    Returns:
+        bool -- true if the dtype is numeric
+    """
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
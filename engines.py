@@ -0,0 +1,269 @@
+from manipulator import *
+from optimizer import get_footprint
+import pandas as pd
+"""
+Execution engines: other libraries the manipulations of a preprocessor can run on instead of pandas. The polars engine
+turns the dataframe (or a pyarrow table) into a polars lazy frame once, runs every manipulation as polars expressions
+over all cores, and turns the result back into a pandas dataframe only at the end, with the dtypes the pandas run gives.
+The manipulations keep their pandas semantics:
+    - drop_columns, drop_rows and the fills are polars expressions, with fill values learned by the pandas fitters
+    - the encoders and handle_date map each value of their column to its output, so they run the pandas function on
+      the distinct values only and join the outputs back
+    - the manipulations with no polars translation (POLARS_STEPS) or footprint run on pandas in the middle of the run
+Needs polars, which is imported when the engine first runs.
+"""
+
+# the column holding the index of the dataframe in the lazy frame, so drop_rows can find the rows by label
+INDEX_COLUMN = "__index__"
+# prefix of the output columns of a value mapping while they are joined to the lazy frame
+MAPPED_PREFIX = "__mapped__"
+
+
+class polars_frame:
+    """A polars lazy frame and the pandas dtypes and index its columns turn back into
+    """
+    def __init__(self, lazy, dtypes, index_name=None, index_dtype=None, none_columns=()):
+        """Intialize the polars_frame object
+
+        Arguments:
+            lazy {polars LazyFrame} -- the columns, and INDEX_COLUMN
+            dtypes {dict} -- column name --> the pandas dtype of the column, in column order
+
+        Keyword Arguments:
+            index_name {obj} -- the name of the pandas index (default: {None})
+            index_dtype {dtype} -- the dtype of the pandas index. A range index (int64 once rows are dropped) if None (default: {None})
+            none_columns {set} -- the object columns whose missing values are None rather than nan, polars has one null for both (default: {()})
+        """
+        self.lazy = lazy
+        self.dtypes = dtypes
+        self.index_name = index_name
+        self.index_dtype = index_dtype
+        self.none_columns = set(none_columns)
+
+    @staticmethod
+    def from_data(data):
+        """Make a polars_frame from a pandas dataframe, a pyarrow table or a polars frame
+
+        Arguments:
+            data {pandas dataframe, pyarrow Table, polars DataFrame or LazyFrame} -- the data
+
+        Raises:
+            ValueError: raises error if the dataframe has a multi index, a column named INDEX_COLUMN or column names that are not strings
+
+        Returns:
+            polars_frame -- the lazy frame of the data
+        """
+        import polars as pl
+        if isinstance(data, pd.DataFrame):
+            if isinstance(data.index, pd.MultiIndex):
+                raise ValueError("The polars engine needs a dataframe with a single level index")
+            _check_column_names(data.columns)
+            lazy = pl.from_pandas(data.reset_index(names=INDEX_COLUMN)).lazy()
+            index_dtype = None if isinstance(data.index, pd.RangeIndex) else data.index.dtype
+            return polars_frame(lazy, data.dtypes.to_dict(), data.index.name, index_dtype, _get_none_columns(data))
+
+        if isinstance(data, pl.DataFrame):
+            lazy = data.lazy()
+        elif isinstance(data, pl.LazyFrame):
+            lazy = data
+        else:
+            lazy = pl.from_arrow(data).lazy()
+        _check_column_names(lazy.collect_schema().names())
+        # the columns turn back into the dtypes pandas gives them
+        dtypes = lazy.head(0).collect().to_pandas().dtypes.to_dict()
+        return polars_frame(lazy.with_row_index(INDEX_COLUMN), dtypes)
+
+    def to_pandas(self, column_names=None, index=True):
+        """Collect the lazy frame into a pandas dataframe with the tracked dtypes
+
+        Keyword Arguments:
+            column_names {list} -- the columns to be collected. Every column if None (default: {None})
+            index {bool} -- restore the index, a range index otherwise (default: {True})
+
+        Returns:
+            pandas dataframe -- the collected columns
+        """
+        column_names = list(self.dtypes) if column_names is None else list(column_names)
+        if index:
+            column_names.append(INDEX_COLUMN)
+        df = _restore_dtypes(self.lazy.select(column_names).collect().to_pandas(), self.dtypes, self.none_columns)
+        if not index:
+            return df
+        df = df.set_index(INDEX_COLUMN)
+        if self.index_dtype is None:
+            # a range index stays one while no rows are dropped
+            df.index = df.index.astype("int64")
+            if df.index.equals(pd.RangeIndex(len(df))):
+                df.index = pd.RangeIndex(len(df))
+        elif df.index.dtype != self.index_dtype:
+            df.index = df.index.astype(self.index_dtype)
+        df.index.name = self.index_name
+        return df
+
+    def get_distinct(self, column_names):
+        """Collect the distinct rows of some columns, into pandas (with the tracked dtypes) and polars
+        """
+        distinct = self.lazy.select(column_names).unique().collect()
+        return _restore_dtypes(distinct.to_pandas(), self.dtypes, self.none_columns), distinct
+
+
+def _check_column_names(column_names):
+    if INDEX_COLUMN in column_names:
+        raise ValueError("The polars engine needs the column name \'" + INDEX_COLUMN + "\' for the index")
+    if not all(isinstance(column_name, str) for column_name in column_names):
+        raise ValueError("The polars engine needs string column names")
+
+def _restore_dtypes(df, dtypes, none_columns=()):
+    for column_name in df.columns:
+        dtype = dtypes.get(column_name)
+        column = df[column_name]
+        if isinstance(dtype, pd.CategoricalDtype) and isinstance(column.dtype, pd.CategoricalDtype):
+            # unordered categorical dtypes are equal whatever the order of their categories, polars keeps its own order
+            if not column.cat.categories.equals(dtype.categories):
+                df[column_name] = column.cat.set_categories(dtype.categories, ordered=dtype.ordered)
+        elif dtype is not None and column.dtype != dtype:
+            column = column.astype(dtype)
+            # nulls come back as nan (ex. the None column of an encode_regex that matches nothing)
+            df[column_name] = column.where(column.notna(), None) if column_name in none_columns else column
+    return df
+
+def _get_none_columns(df):
+    """The object columns of a dataframe whose missing values are None"""
+    return {column_name for column_name in df.columns if df[column_name].dtype == object and
+            any(value is None for value in df[column_name][df[column_name].isna()])}
+
+def run_manipulations(data, manipulations, transform=False):
+    """Run manipulations on the polars engine
+
+    Arguments:
+        data {pandas dataframe, pyarrow Table, polars DataFrame or LazyFrame} -- the data to be manipulated. It is not changed
+        manipulations {list} -- the manipulator objects, in order
+
+    Keyword Arguments:
+        transform {bool} -- run the manipulations with their fitted state (manipulator.transform) instead of manipulator.do (default: {False})
+
+    Raises:
+        ValueError: raises error if transform and a manipulation is not fitted, or encode_nominal has sparse output
+
+    Returns:
+        pandas dataframe -- the manipulated dataframe, the same as the pandas run gives
+    """
+    frame = polars_frame.from_data(data)
+    for manipulation in manipulations:
+        if transform and not manipulation.is_fitted():
+            raise ValueError("Manipulation \'" + manipulation.get_operation_name() + "\' needs to be fit before transform")
+        run = POLARS_STEPS.get(manipulation.get_function(), _run_on_pandas)
+        frame = run(frame, manipulation, transform)
+    return frame.to_pandas()
+
+def _get_fitted(frame, manipulation, transform):
+    """Return the manipulation, fitted on the columns it reads unless it runs with its fitted state"""
+    if transform or manipulation.get_function() not in FITTERS:
+        return manipulation
+    reads = [column_name for column_name in frame.dtypes if column_name in get_footprint(manipulation).reads]
+    return manipulator(manipulation.get_function(), *manipulation.get_args()).fit(frame.to_pandas(reads, index=False))
+
+def _run_on_pandas(frame, manipulation, transform):
+    import polars as pl
+    df = frame.to_pandas()
+    df = manipulation.transform(df, inplace=True) if transform else manipulation.do(df, inplace=True)
+    return polars_frame(pl.from_pandas(df.reset_index(names=INDEX_COLUMN)).lazy(), df.dtypes.to_dict(),
+                        frame.index_name, frame.index_dtype, _get_none_columns(df))
+
+def _run_drop_columns(frame, manipulation, transform):
+    column_names = manipulation.get_args()[0]
+    missing = [column_name for column_name in column_names if column_name not in frame.dtypes]
+    if missing:
+        raise KeyError("{} not found in axis".format(missing))
+    dtypes = {column_name: dtype for column_name, dtype in frame.dtypes.items() if column_name not in column_names}
+    return polars_frame(frame.lazy.drop(column_names), dtypes, frame.index_name, frame.index_dtype,
+                        frame.none_columns - set(column_names))
+
+def _run_drop_rows(frame, manipulation, transform):
+    import polars as pl
+    row_indices = manipulation.get_args()[0]
+    if type(row_indices)!=list:
+        raise TypeError("Row indices object needs to be a list of strings")
+    found = frame.lazy.select(pl.col(INDEX_COLUMN).filter(pl.col(INDEX_COLUMN).is_in(row_indices)).unique()).collect()
+    missing = set(row_indices) - set(found[INDEX_COLUMN].to_list())
+    if missing:
+        raise KeyError("{} not found in axis".format(sorted(missing, key=str)))
+    return polars_frame(frame.lazy.filter(~pl.col(INDEX_COLUMN).is_in(row_indices)), frame.dtypes,
+                        frame.index_name, frame.index_dtype, frame.none_columns)
+
+def _run_fill(frame, manipulation, transform):
+    import polars as pl
+    manipulation = _get_fitted(frame, manipulation, transform)
+    args = manipulation.get_args()
+    function = manipulation.get_function()
+    if function is fill_NaN_column:
+        fill_values = {args[0]: args[1]}
+    elif function is impute_NaN_column:
+        fill_values = {args[0]: manipulation.fitted["fill_value"]}
+    elif function is impute_NaN_columns and manipulation.fitted["group_by"] is not None:
+        return _run_on_pandas(frame, manipulation, True)
+    else:
+        fill_values = manipulation.fitted["fill_values"]
+
+    dtypes = dict(frame.dtypes)
+    fills = []
+    for column_name, fill_value in fill_values.items():
+        if column_name not in dtypes or pd.isna(fill_value):
+            continue
+        dtype = dtypes[column_name]
+        if isinstance(dtype, pd.CategoricalDtype) and fill_value not in dtype.categories:
+            # see manipulator._add_fill_categories
+            dtypes[column_name] = pd.CategoricalDtype(list(dtype.categories) + [fill_value], dtype.ordered)
+        if hasattr(fill_value, "item"):
+            fill_value = fill_value.item()
+        fills.append(pl.col(column_name).fill_null(fill_value))
+    return polars_frame(frame.lazy.with_columns(fills), dtypes, frame.index_name, frame.index_dtype, frame.none_columns)
+
+def _run_value_mapping(frame, manipulation, transform):
+    """Run a manipulation whose output for a row only depends on the values of the row in the columns it reads: the
+    pandas function runs on the distinct values and its output is joined back on them. The columns the manipulation
+    removes are dropped, the columns it changes are replaced where they are and the new columns are appended, like
+    scheduler._merge_columns
+    """
+    import polars as pl
+    if manipulation.get_function() is encode_nominal and len(manipulation.get_args()) > 2 and manipulation.get_args()[2] == "sparse":
+        raise ValueError("The polars engine has no sparse columns, use output \'dense\'")
+    manipulation = _get_fitted(frame, manipulation, transform)
+    reads = [column_name for column_name in frame.dtypes if column_name in get_footprint(manipulation).reads]
+    distinct_df, distinct = frame.get_distinct(reads)
+    mapped_df = manipulation.transform(distinct_df, inplace=True)
+
+    mapped = pl.from_pandas(mapped_df.add_prefix(MAPPED_PREFIX).reset_index(drop=True))
+    mapping = pl.concat([distinct, mapped], how="horizontal").lazy()
+    lazy = frame.lazy.join(mapping, on=reads, how="left", nulls_equal=True, maintain_order="left")
+
+    removed = [column_name for column_name in reads if column_name not in mapped_df.columns]
+    dtypes = {column_name: dtype for column_name, dtype in frame.dtypes.items() if column_name not in removed}
+    for column_name in mapped_df.columns:
+        dtypes[column_name] = mapped_df[column_name].dtype
+    lazy = lazy.select([pl.col(INDEX_COLUMN)] + [pl.col(MAPPED_PREFIX + column_name).alias(column_name) if column_name in mapped_df.columns
+                                                 else pl.col(column_name) for column_name in dtypes])
+    none_columns = (frame.none_columns - set(reads)) | _get_none_columns(mapped_df)
+    return polars_frame(lazy, dtypes, frame.index_name, frame.index_dtype, none_columns)
+
+
+# manipulation function --> function running it on a polars_frame, for the manipulations with a polars translation.
+# Takes the polars_frame, the manipulation and whether to use its fitted state, and returns the manipulated polars_frame
+POLARS_STEPS = {
+    drop_columns: _run_drop_columns,
+    drop_rows: _run_drop_rows,
+    fill_NaN_column: _run_fill,
+    impute_NaN_column: _run_fill,
+    fill_NaN_columns: _run_fill,
+    impute_NaN_columns: _run_fill,
+    encode_ordinal: _run_value_mapping,
+    encode_nominal: _run_value_mapping,
+    encode_class_label: _run_value_mapping,
+    encode_regex: _run_value_mapping,
+    handle_date: _run_value_mapping,
+}
+
+# engine name --> function running manipulations on it, see run_manipulations. pandas runs in the preprocessor itself
+ENGINES = {
+    "polars": run_manipulations,
+}
@@ -0,0 +1,196 @@
+import pandas as pd
+import numpy as np
+import time
+import tracemalloc
+import json
+from contextlib import contextmanager
+"""
+instrumenter:
+    records what each manipulation of a preprocessor run costs: wall time, cpu time, peak and retained memory, the
+    shape of its input and output and the bytes of the output columns that are new copies rather than views of the
+    input columns. The records are kept for a report dataframe and handed to callbacks (ex. to send them to a metrics
+    system). Pass one to the preprocessor to turn it on. Without one, nothing is recorded and nothing is measured.
+"""
+
+# the fields of a step record, in report column order
+STEP_FIELDS = ["run", "mode", "step", "operation", "wall_seconds", "cpu_seconds", "peak_bytes", "delta_bytes",
+               "rows_in", "columns_in", "rows_out", "columns_out", "bytes_copied"]
+
+class instrumenter:
+    """Records the cost of each manipulation of the preprocessor runs it is passed to
+    """
+    def __init__(self, memory=True, callbacks=None):
+        """Intialize the instrumenter
+
+        Keyword Arguments:
+            memory {bool} -- trace the peak and retained memory of each manipulation with tracemalloc. Tracing slows down code that allocates many python objects (default: {True})
+            callbacks {list} -- functions called with the record (dict of STEP_FIELDS) of each manipulation as soon as it finishes (default: {None})
+        """
+        self.memory = memory
+        self.callbacks = list(callbacks or [])
+        self.records = []
+        self.num_runs = 0
+        # the records of the last run, or of the run in progress
+        self.last_run = []
+        self._mode = None
+
+    def add_callback(self, callback):
+        """Call a function with the record of each manipulation from now on
+
+        Arguments:
+            callback {python function} -- takes the record, a dict of STEP_FIELDS
+        """
+        self.callbacks.append(callback)
+
+    @contextmanager
+    def recording(self, mode):
+        """Group the manipulations run inside the with block into one run
+
+        Arguments:
+            mode {string} -- what the run is (ex. "preprocess" or "transform"), kept in the records
+        """
+        self.num_runs += 1
+        self.last_run = []
+        self._mode = mode
+        started_tracing = self.memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            self._mode = None
+
+    def run(self, step, manipulation, df, function, **kwargs):
+        """Run one manipulation and record what it cost
+
+        Arguments:
+            step {int} -- the position (from 1) of the manipulation in the run
+            manipulation {manipulator} -- the manipulation
+            df {pandas dataframe} -- the input of the manipulation
+            function {python function} -- runs the manipulation (ex. manipulation.do), called with df and kwargs
+
+        Returns:
+            pandas dataframe -- the output of function
+        """
+        rows_in, columns_in = df.shape
+        # only the buffers are kept, a reference to the input columns would make copy on write copy them
+        buffers_in = {column_name: _get_buffer(df.iloc[:, i]) for i, column_name in enumerate(df.columns)}
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            bytes_before = tracemalloc.get_traced_memory()[0]
+        start_cpu = time.process_time()
+        start_time = time.perf_counter()
+
+        df_out = function(df, **kwargs)
+
+        wall_seconds = time.perf_counter() - start_time
+        cpu_seconds = time.process_time() - start_cpu
+        if tracing:
+            bytes_after, peak = tracemalloc.get_traced_memory()
+        record = {
+            "run": self.num_runs,
+            "mode": self._mode,
+            "step": step,
+            "operation": manipulation.get_operation_name(),
+            "wall_seconds": wall_seconds,
+            "cpu_seconds": cpu_seconds,
+            "peak_bytes": peak - bytes_before if tracing else None,
+            "delta_bytes": bytes_after - bytes_before if tracing else None,
+            "rows_in": rows_in,
+            "columns_in": columns_in,
+            "rows_out": df_out.shape[0],
+            "columns_out": df_out.shape[1],
+            "bytes_copied": get_bytes_copied(buffers_in, df_out),
+        }
+        self.records.append(record)
+        self.last_run.append(record)
+        for callback in self.callbacks:
+            callback(record)
+        return df_out
+
+    def get_report(self, last_run=False):
+        """Return the records as a dataframe, one row per manipulation run
+
+        Keyword Arguments:
+            last_run {bool} -- only the records of the last run (default: {False})
+
+        Returns:
+            pandas dataframe -- the STEP_FIELDS columns
+        """
+        return pd.DataFrame(self.last_run if last_run else self.records, columns=STEP_FIELDS)
+
+    def clear(self):
+        """Forget every record
+        """
+        self.records = []
+        self.last_run = []
+        self.num_runs = 0
+
+
+def _get_buffer(column):
+    values = column.array
+    # numpy backed, datetime and categorical arrays keep their values in _ndarray, masked arrays (Int64, boolean) in _data
+    for name in ("_ndarray", "_data"):
+        buffer = getattr(values, name, None)
+        if isinstance(buffer, np.ndarray):
+            return buffer
+    return values
+
+def get_bytes_copied(buffers_in, df_out):
+    """Count the bytes of the output columns that do not reuse the memory of the input column of the same name. New
+    columns count in full
+
+    Arguments:
+        buffers_in {dict} -- column name --> the buffer of the input column (see _get_buffer)
+        df_out {pandas dataframe} -- the output of the manipulation
+
+    Returns:
+        int -- bytes
+    """
+    bytes_copied = 0
+    for i, column_name in enumerate(df_out.columns):
+        column = df_out.iloc[:, i]
+        buffer_in = buffers_in.get(column_name)
+        buffer_out = _get_buffer(column)
+        if buffer_in is None:
+            is_shared = False
+        elif isinstance(buffer_in, np.ndarray) and isinstance(buffer_out, np.ndarray):
+            # the bounds check is enough for column buffers and does not scan them like np.shares_memory
+            is_shared = np.may_share_memory(buffer_in, buffer_out)
+        else:
+            is_shared = buffer_in is buffer_out
+        if not is_shared:
+            bytes_copied += column.array.nbytes
+    return bytes_copied
+
+def format_record(record):
+    """Short description of the cost of a manipulation, for preprocessor.__str__
+
+    Arguments:
+        record {dict} -- a step record
+
+    Returns:
+        string -- ex. "0.012s wall, 0.011s cpu, peak 1.2 MB, copied 0.8 MB"
+    """
+    out = "{:.3f}s wall, {:.3f}s cpu".format(record["wall_seconds"], record["cpu_seconds"])
+    if record["peak_bytes"] is not None:
+        out += ", peak {:.1f} MB".format(record["peak_bytes"]/1e6)
+    return out + ", copied {:.1f} MB".format(record["bytes_copied"]/1e6)
+
+def jsonl_callback(path):
+    """Make a callback appending each record to a json lines file, for a local exporter (ex. an OpenTelemetry
+    collector filelog receiver) to pick up
+
+    Arguments:
+        path {string} -- the file to be appended to
+
+    Returns:
+        python function -- the callback
+    """
+    def callback(record):
+        with open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    return callback
@@ -1,11 +1,15 @@
 import pandas as pd 
 import numpy as np 
-from sklearn.preprocessing import OrdinalEncoder
-from sklearn.preprocessing import OneHotEncoder
 import re
+import inspect
+import threading
+from functools import lru_cache
+from itertools import islice
 import time
-from datetime import date
+from datetime import datetime, timezone, tzinfo
+from zoneinfo import ZoneInfo
 from constants import *
+import describe
 
 class manipulator:
     """A object for specifying and doing manipulation operations on the dataframe.
@@ -18,18 +22,74 @@ class manipulator:
         """
         self.function = function
         self.args = args
+        # state learned by fit, None until then or for manipulations that learn nothing
+        self.fitted = None
     
-    def do(self, df):
+    def do(self, df, inplace=False):
         """Run the manipulator function on the dataframe
         
         Arguments:
             df {pandas dataframe} -- the pandas dataframe to be manipulated
         
+        Keyword Arguments:
+            inplace {bool} -- hand ownership of df to the manipulation instead of copying it first. The passed in dataframe may be modified (default: {False})
+
         Returns:
-            pandas dataframe -- a manipulated copy of the dataframe
+            pandas dataframe -- a manipulated copy of the dataframe, or the manipulated dataframe if inplace
         """
+        return self._run(df, inplace)
+
+    def fit(self, df):
+        """Learn the state of the manipulation (ex. the categories of an encoder or the fill value of an imputer) from
+        the dataframe, so that transform applies it without recomputing it
+        
+        Arguments:
+            df {pandas dataframe} -- the dataframe to learn from
+        
+        Returns:
+            manipulator -- the fitted manipulator
+        """
+        fitter = FITTERS.get(self.function)
+        self.fitted = fitter(df, *self.args) if fitter else None
+        return self
+
+    def transform(self, df, inplace=False):
+        """Run the manipulator function on the dataframe with the state learned by fit
+        
+        Arguments:
+            df {pandas dataframe} -- the pandas dataframe to be manipulated
+        
+        Keyword Arguments:
+            inplace {bool} -- hand ownership of df to the manipulation instead of copying it first (default: {False})
+        
+        Raises:
+            ValueError: raises error if the manipulation learns state and has not been fit
+        
+        Returns:
+            pandas dataframe -- a manipulated copy of the dataframe, or the manipulated dataframe if inplace
+        """
+        if self.function not in FITTERS:
+            return self._run(df, inplace)
+        if self.fitted is None:
+            raise ValueError("Manipulation \'" + self.get_operation_name() + "\' needs to be fit before transform")
+        return self._run(df, inplace, fitted=self.fitted)
+
+    def is_fitted(self):
+        """Return whether transform can be run
+        
+        Returns:
+            bool -- true if the manipulation learns no state or has been fit
+        """
+        return self.function not in FITTERS or self.fitted is not None
+
+    def _run(self, df, inplace, **kwargs):
+        if inplace:
+            if _accepts_inplace(self.function):
+                return self.function(df, *self.args, inplace=True, **kwargs)
+            return self.function(df, *self.args, **kwargs)
+
         df_copy = df.copy()
-        df_manipulated = self.function(df_copy, *self.args)
+        df_manipulated = self.function(df_copy, *self.args, **kwargs)
         return df_manipulated
 
     def get_function(self):
@@ -54,7 +114,7 @@ class manipulator:
         Returns:
             string -- the string representation of the manipulator object
         """
-        out = "{}{}{}".format(bcolors.BOLD, self.function.__name__, bcolors.ENDC)
+        out = "{}{}{}".format(bcolors.BOLD, self.get_operation_name(), bcolors.ENDC)
         out += "\n\tArguments:"
         out+= "\n\t\tdf -- (specified at runtime)"
         for i, arg in enumerate(self.args):
@@ -62,48 +122,72 @@ class manipulator:
         return out
     
     def get_operation_name(self):
-        return self.function.__name__
+        """Return the name of the manipulation shown to users
+        
+        Returns:
+            string -- the name in DISPLAY_NAMES, or the name of the function
+        """
+        return DISPLAY_NAMES.get(self.function, self.function.__name__)
+
+
+def _accepts_inplace(function):
+    """Check whether a manipulation function takes the inplace keyword argument
+    
+    Arguments:
+        function {python function} -- the manipulation function
+    
+    Returns:
+        bool -- true if the function can manipulate the passed in dataframe directly
+    """
+    try:
+        return "inplace" in inspect.signature(function).parameters
+    except (TypeError, ValueError):
+        return False
 
 
-def drop_columns(df, column_names):
+def drop_columns(df, column_names, inplace=False):
     """Drop columns from dataframe
     
     Arguments:
         df {pandas dataframe} -- the dataframe to be manipulated
         column_names {list of strings} -- a list of the names of the columns to be dropped
     
+    Keyword Arguments:
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+    
     Returns:
         pandas dataframe -- a manipulated copy of the pandas dataframe
     """
-    drop_columns.__name__ = "Drop Columns"
-
     if type(column_names)!=list:
         raise TypeError("Column names object needs to be a list of strings")
 
-    df_copy = df.copy()
+    df_copy = df if inplace else df.copy()
     df_copy.drop(column_names, axis=1, inplace=True)
     return df_copy
 
-def drop_rows(df, row_indices):
+def drop_rows(df, row_indices, inplace=False):
     """Drop rows from dataframe
     
     Arguments:
         df {pandas dataframe} -- the dataframe to be manipulated
         row_indices {list} -- a list of the indices of the rows to be dropped
     
+    Keyword Arguments:
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+    
     Returns:
         pandas dataframe -- a manipulated copy of the pandas dataframe
     """
-    drop_rows.__name__ = "Drop Rows"
-
     if type(row_indices)!=list:
         raise TypeError("Row indices object needs to be a list of strings")
 
-    df_copy = df.copy()
+    df_copy = df if inplace else df.copy()
     df_copy.drop(row_indices, axis=0, inplace=True)
     return df_copy
 
-def encode_ordinal(df, column_name, category_order=None):
+LABEL_OUTPUTS = ["legacy", "codes", "category"]
+
+def encode_ordinal(df, column_name, category_order=None, output="legacy", inplace=False, fitted=None):
     """Encodes ordinal features (implied order, ex. t-shirt size). Pass a list to category_order in order to specify the order of the encoding. Not in place.
     
     Arguments:
@@ -111,25 +195,113 @@ def encode_ordinal(df, column_name, category_order=None):
         column_name {string} -- the name of the column to be manipulated
     
     Keyword Arguments:
-        category_order {list} -- the list containing a pre-defined ordering of the column values (ex. [small, medium, large]) (default: {None})
+        category_order {list} -- the list containing a pre-defined ordering of the column values (ex. [small, medium, large]). The sklearn form, a list holding that list (ex. [[small, medium, large]]), also works (default: {None})
+        output {string} -- "legacy" (float64 codes, nan if missing), "codes" (smallest int codes, -1 if missing) or "category" (ordered pandas Categorical). Unlike the sklearn OrdinalEncoder legacy replaces, None in an object column is missing (nan) rather than a category coded after the others (default: {"legacy"})
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+        fitted {dict} -- the state learned by fit_encode_ordinal. Learned from df if None (default: {None})
+
+    Raises:
+        ValueError: raises error if the column contains values that are not in the categories or the output is not one of LABEL_OUTPUTS
 
     Returns:
         a copy of the manipulated dataframe
     """
-    encode_ordinal.__name__ = "Encode Ordinal Values"
+    _check_label_output(output)
 
-    if category_order:
-        encoder = OrdinalEncoder(categories=category_order)
+    column = df[column_name]
+    if fitted is None and not category_order:
+        # the codes of the sorted uniques are the encoding, no second lookup needed
+        codes, categories = pd.factorize(column, sort=True)
+        categories = list(categories)
     else:
-        encoder = OrdinalEncoder()
+        if fitted is None:
+            fitted = fit_encode_ordinal(df, column_name, category_order)
+        categories = fitted["categories"]
+        codes = pd.Index(categories).get_indexer(column)
+        is_unknown = (codes == -1) & column.notna().to_numpy()
+        if is_unknown.any():
+            raise ValueError("Found unknown categories {} in column {}".format(list(pd.unique(column[is_unknown])), column_name))
 
-    transformed_column = encoder.fit_transform(df[column_name].values.reshape(-1, 1))
+    if output == "legacy":
+        # missing values stay missing, like nan in sklearn's OrdinalEncoder (which makes None a category)
+        transformed_column = np.where(codes == -1, np.nan, codes)
+    else:
+        transformed_column = _codes_to_label_output(codes, categories, output, True)
 
-    df_copy = df.copy()
+    df_copy = df if inplace else df.copy()
     df_copy[column_name] = transformed_column
     return df_copy
 
-def encode_nominal(df, column_name, binary):
+def fit_encode_ordinal(df, column_name, category_order=None, output="legacy"):
+    """Learn the categories of encode_ordinal
+    
+    Arguments:
+        df {pandas DataFrame} -- the dataframe to learn from
+        column_name {string} -- the name of the column to be encoded
+    
+    Keyword Arguments:
+        category_order {list} -- see encode_ordinal (default: {None})
+        output {string} -- see encode_ordinal (default: {"legacy"})
+    
+    Raises:
+        ValueError: raises error if the column contains values that are not in category_order
+    
+    Returns:
+        dict -- "categories": the categories in encoding order
+    """
+    column = df[column_name]
+    if not category_order:
+        return {"categories": list(pd.factorize(column, sort=True)[1])}
+
+    categories = _get_category_order(category_order)
+    is_unknown = ~column.isin(categories).to_numpy() & column.notna().to_numpy()
+    if is_unknown.any():
+        raise ValueError("Found unknown categories {} in column {} during fit".format(list(pd.unique(column[is_unknown])), column_name))
+    return {"categories": [category for category in categories if not pd.isna(category)]}
+
+def _get_category_order(category_order):
+    # a flat list of the categories, or the sklearn form of one list per column
+    if isinstance(category_order[0], (list, tuple, np.ndarray)):
+        return list(category_order[0])
+    return list(category_order)
+
+def _check_label_output(output):
+    if output not in LABEL_OUTPUTS:
+        raise ValueError("output needs to be one of {}".format(LABEL_OUTPUTS))
+
+def _codes_to_label_output(codes, categories, output, ordered):
+    """Turn factorize style codes (-1 for missing) into the "codes" or "category" output of encode_ordinal and encode_class_label
+    
+    Arguments:
+        codes {numpy array} -- position of each value in categories, -1 if missing
+        categories {list} -- the distinct non missing values in encoding order
+        output {string} -- "codes" or "category"
+        ordered {bool} -- whether the categorical is ordered
+    
+    Returns:
+        numpy array or pandas Categorical -- the encoded column
+    """
+    if output == "codes":
+        return codes.astype(get_smallest_int_dtype(len(categories)))
+    return pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories, ordered=ordered))
+
+def get_smallest_int_dtype(num_codes):
+    """Smallest signed integer dtype holding the codes 0..num_codes - 1 and -1
+    
+    Arguments:
+        num_codes {int} -- the number of distinct codes
+    
+    Returns:
+        numpy dtype -- int8, int16, int32 or int64
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_codes <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+NOMINAL_OUTPUTS = ["dense", "uint8", "sparse"]
+
+def encode_nominal(df, column_name, binary, output="dense", top_k=None, other_label="other", inplace=False, fitted=None):
     """Encodes nominal features (no implied order, ex. colors) through one-hot encoding. If binary = True (only 2 unique values) do encoding in one column.
     
     Arguments:
@@ -138,79 +310,355 @@ def encode_nominal(df, column_name, binary):
     
     Keyword Arguments:
         binary {bool} -- true = the column is binary, false = the column is not binary
+        output {string} -- dtype of the one-hot columns: "dense" (bool), "uint8" or "sparse" (pandas SparseDtype of uint8) (default: {"dense"})
+        top_k {int} -- only keep a column for the top_k most frequent values, the rest go to one other_label column. All values are kept if None (default: {None})
+        other_label {obj} -- the category of the values outside the top_k (default: {"other"})
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+        fitted {dict} -- the state learned by fit_encode_nominal. Learned from df if None (default: {None})
+    
+    Raises:
+        ValueError: raises error if the output is not one of NOMINAL_OUTPUTS
     
     Returns:
         a copy of the manipulated dataframe
     """
-    encode_nominal.__name__ = "Encode Nominal Values"
-
     if binary:
-        mapping = {}
-        unique = set(df[column_name].unique())
-        if len(unique) != 2:
-            raise ValueError("The column specified is not a binary column.")
-
-        for i, e in enumerate(unique):
-            mapping[e] = i
-
-        encoded_column = df[column_name].map(mapping)
+        if fitted is None:
+            # the categorical codes of the sorted values are the encoding, no second lookup needed
+            codes, values = pd.factorize(df[column_name], sort=True, use_na_sentinel=False)
+            _check_binary(values)
+            encoded_column = codes.astype(np.int64)
+        else:
+            encoded_column = _lookup_codes(df[column_name], fitted["values"])
 
-        df_copy = df.copy()
+        df_copy = df if inplace else df.copy()
         df_copy[column_name] = encoded_column
         return df_copy
     else:
-        column_index = df.columns.get_loc(column_name)
-        #pd.get_dummies does not manipulate the original df object
-        df_new = pd.get_dummies(data=df, columns=[column_name])
+        if output not in NOMINAL_OUTPUTS:
+            raise ValueError("output needs to be one of {}".format(NOMINAL_OUTPUTS))
+        if fitted is None:
+            fitted = fit_encode_nominal(df, column_name, binary, output, top_k, other_label)
+
+        codes = get_nominal_codes(df[column_name], fitted)
+        dummy_names = ["{}_{}".format(column_name, category) for category in fitted["categories"]]
+        if output == "sparse":
+            from scipy import sparse
+            dummies = pd.DataFrame.sparse.from_spmatrix(_codes_to_spmatrix(codes, len(dummy_names), sparse.csc_matrix),
+                                                        index=df.index, columns=dummy_names)
+        else:
+            hot = np.zeros((len(codes), len(dummy_names)), dtype=bool if output == "dense" else np.uint8)
+            is_known = codes >= 0
+            hot[np.flatnonzero(is_known), codes[is_known]] = 1
+            dummies = pd.DataFrame(hot, index=df.index, columns=dummy_names)
+        #dropping the column does not manipulate the original df object
+        df_new = pd.concat([df.drop(columns=[column_name]), dummies], axis=1)
         return df_new
 
-def encode_regex(df, column_name, regex_mapping):
-    """Encodes features with regular expression.
+def fit_encode_nominal(df, column_name, binary, output="dense", top_k=None, other_label="other"):
+    """Learn the values of encode_nominal
+    
+    Arguments:
+        df {pandas dataframe} -- the dataframe to learn from
+        column_name {string} -- the name of the column to be encoded
+        binary {bool} -- see encode_nominal
+    
+    Keyword Arguments:
+        output {string} -- see encode_nominal (default: {"dense"})
+        top_k {int} -- see encode_nominal (default: {None})
+        other_label {obj} -- see encode_nominal (default: {"other"})
+    
+    Raises:
+        ValueError: raises error if binary and the column does not have 2 unique values, or if other_label is one of the top_k values
+    
+    Returns:
+        dict -- "values": the 2 values in encoding order if binary, otherwise "categories": the one-hot categories and
+                "other": the position of other_label in the categories (None without top_k)
+    """
+    if binary:
+        values = pd.factorize(df[column_name], sort=True, use_na_sentinel=False)[1]
+        _check_binary(values)
+        return {"values": list(values)}
+
+    if top_k is None:
+        return {"categories": list(pd.Categorical(df[column_name]).categories), "other": None}
+    return get_top_k_categories(df[column_name].value_counts(dropna=True), top_k, other_label, column_name)
+
+def get_top_k_categories(counts, top_k, other_label, column_name):
+    """The fitted state of encode_nominal with top_k, from the counts of the values of the column
+    
+    Arguments:
+        counts {pandas series} -- value --> count, without missing values
+        top_k {int} -- see encode_nominal
+        other_label {obj} -- see encode_nominal
+        column_name {string} -- the name of the column, for the error message
+    
+    Raises:
+        ValueError: raises error if other_label is one of the top_k values
+    
+    Returns:
+        dict -- see fit_encode_nominal
+    """
+    # stable sort, so ties are broken by category order and the kept categories do not depend on hashing order
+    kept = counts.sort_index().sort_values(ascending=False, kind="stable").index[:top_k].sort_values()
+    if other_label in kept:
+        raise ValueError("other_label {} is one of the top {} values of column {}".format(other_label, top_k, column_name))
+    return {"categories": list(kept) + [other_label], "other": len(kept)}
+
+def get_nominal_codes(column, fitted):
+    """Position of each value of a column in the one-hot categories learned by fit_encode_nominal. Missing values and
+    values that were not seen in fit get -1 (no hot column), or the other_label column when fit with top_k
+    
+    Arguments:
+        column {pandas series} -- the column to be encoded
+        fitted {dict} -- the state learned by fit_encode_nominal
+    
+    Returns:
+        numpy array -- intp codes
+    """
+    categories = fitted["categories"]
+    if fitted.get("other") is not None:
+        codes = pd.Index(categories[:fitted["other"]]).get_indexer(column)
+        codes[(codes == -1) & column.notna().to_numpy()] = fitted["other"]
+        return codes
+    return pd.Index(categories).get_indexer(column)
+
+def nominal_to_csr(df, column_name, top_k=None, other_label="other", fitted=None):
+    """One-hot encode a column straight into a scipy CSR matrix, for models that take sparse input. Nothing dense the
+    size of the one-hot block is built
+    
+    Arguments:
+        df {pandas dataframe} -- the dataframe holding the column
+        column_name {string} -- the name of the column to be encoded
+    
+    Keyword Arguments:
+        top_k {int} -- see encode_nominal (default: {None})
+        other_label {obj} -- see encode_nominal (default: {"other"})
+        fitted {dict} -- the state learned by fit_encode_nominal with binary = False. Learned from df if None (default: {None})
+    
+    Returns:
+        tuple -- (scipy csr matrix of uint8, list of the column names in encode_nominal)
+    """
+    from scipy import sparse
+    if fitted is None:
+        fitted = fit_encode_nominal(df, column_name, False, "sparse", top_k, other_label)
+    codes = get_nominal_codes(df[column_name], fitted)
+    dummy_names = ["{}_{}".format(column_name, category) for category in fitted["categories"]]
+    return _codes_to_spmatrix(codes, len(dummy_names), sparse.csr_matrix), dummy_names
+
+def _codes_to_spmatrix(codes, num_columns, matrix_type):
+    rows = np.flatnonzero(codes >= 0)
+    data = np.ones(len(rows), dtype=np.uint8)
+    return matrix_type((data, (rows, codes[rows])), shape=(len(codes), num_columns))
+
+def _check_binary(values):
+    if len(values) != 2:
+        raise ValueError("The column specified is not a binary column.")
+
+def encode_regex(df, column_name, regex_mapping, precedence="first", inplace=False):
+    """Encodes features with regular expression. The regular expressions are run once per distinct value of the column.
     
     Arguments:
         df {pandas dataframe} -- the dataframe to be manipulated
         column_name {string} -- the name of the column to be manipulated 
-        regex_mapping {dict} -- a dictionary w/ key = the regular expression, value = value to be encoded. Regular exp. should not overlap.
+        regex_mapping {dict} -- a dictionary w/ key = the regular expression, value = value to be encoded. Values matching none of the regular exp. are encoded as None.
+    
+    Keyword Arguments:
+        precedence {string} -- which regular exp. wins when several match a value: "first" or "last" in regex_mapping order, or "error" to raise (default: {"first"})
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+    
+    Raises:
+        ValueError: raises error if precedence is "error" and several regular exp. match a value
     
     Returns:
         a copy of the manipulated dataframe
     """
-    encode_regex.__name__ = "Encode with Regular Expression"
+    encoder = get_regex_encoder(tuple(regex_mapping.keys()), precedence)
+    # run the regular exp. on each distinct value only. Missing values (code -1) match none, they take the last value
+    codes, unique_values = pd.factorize(df[column_name])
+    match_indices = np.append(encoder.match([str(item) for item in unique_values]), len(regex_mapping))
+    encoded_values = np.array(list(regex_mapping.values()) + [None], dtype=object)[match_indices]
+    # infer the dtype from the encoded values, like building the column from a list
+    encoded_uniques = pd.Series(encoded_values.tolist())
 
-    # compiled the regex to increase speed
-    regex_mapping_comp = {re.compile(k) : v for k, v in regex_mapping.items()}
-    def map_regex(item):
-        # convert item type to string to apply regex
-        item = str(item)
-        item_mapped = None
-        for pattern, v in regex_mapping_comp.items():
-            if pattern.search(item):
-                item_mapped = v
+    df_copy = df if inplace else df.copy()
+    df_copy[column_name] = encoded_uniques.take(codes).to_numpy()
+    return df_copy
 
-        return item_mapped
+# precedence options of encode_regex
+REGEX_PRECEDENCES = ["first", "last", "error"]
 
-    df_copy = df.copy()
-    df_copy[column_name] = list(map(map_regex, df_copy[column_name]))
-    return df_copy
+class regex_encoder:
+    """Finds which of a list of regular expressions matches each string. Remembers the result for recently seen
+    strings, so repeated calls (ex. chunk after chunk) only run the regular expressions on new strings.
+    """
+    def __init__(self, patterns, precedence="first", memo_size=100000):
+        """Intialize the encoder
+        
+        Arguments:
+            patterns {list} -- the regular expressions, in precedence order
+        
+        Keyword Arguments:
+            precedence {string} -- see encode_regex (default: {"first"})
+            memo_size {int} -- the max number of strings remembered (default: {100000})
+        """
+        if precedence not in REGEX_PRECEDENCES:
+            raise ValueError("Precedence \'" + str(precedence) + "\' is not a valid precedence.")
+        # compiled the regex to increase speed
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+        self.precedence = precedence
+        self.memo_size = memo_size
+        self.memo = {}
+        self._lock = threading.Lock()
+
+    def match(self, strings):
+        """Find the regular expression matching each string. Safe to call from several threads at once
+        
+        Arguments:
+            strings {list} -- the strings to be matched
+        
+        Returns:
+            numpy array -- index of the winning regular expression per string, len(patterns) if none match
+        """
+        distinct_strings = dict.fromkeys(strings)
+        # the memo is shared by every caller of get_regex_encoder, so it is only read and changed under the lock
+        with self._lock:
+            known = {string: self.memo[string] for string in distinct_strings if string in self.memo}
+        new_strings = [string for string in distinct_strings if string not in known]
+        if new_strings:
+            known.update(zip(new_strings, self._match_new(new_strings)))
+            with self._lock:
+                self._remember(new_strings[:self.memo_size], known)
+        return np.array([known[string] for string in strings], dtype=np.intp)
+
+    def _remember(self, strings, match_indices):
+        """Add strings to the memo, forgetting the oldest strings to keep at most memo_size. Needs the lock"""
+        strings = [string for string in strings if string not in self.memo]
+        num_evicted = len(self.memo) + len(strings) - self.memo_size
+        if num_evicted > 0:
+            # dicts keep insertion order, so the first keys are the oldest
+            for string in list(islice(self.memo, num_evicted)):
+                del self.memo[string]
+        self.memo.update((string, match_indices[string]) for string in strings)
+
+    def match_one(self, string):
+        """Find the regular expression matching one string, see match
+        """
+        with self._lock:
+            match_index = self.memo.get(string)
+        if match_index is not None:
+            return match_index
+        return self.match([string])[0]
+
+    def _match_new(self, strings):
+        num_patterns = len(self.patterns)
+        match_indices = np.full(len(strings), num_patterns, dtype=np.intp)
+        candidates = pd.Series(strings, dtype=object)
+        pattern_order = range(num_patterns - 1, -1, -1) if self.precedence == "last" else range(num_patterns)
+        for i in pattern_order:
+            if self.precedence == "error":
+                is_match = candidates.str.contains(self.patterns[i], regex=True).to_numpy(dtype=bool)
+                overlap = is_match & (match_indices != num_patterns)
+                if overlap.any():
+                    raise ValueError("Value \'" + candidates[overlap].iloc[0] + "\' matches several regular expressions")
+                match_indices[is_match] = i
+            else:
+                # the winner is the first match in pattern_order, so only unmatched strings are searched
+                unmatched = np.flatnonzero(match_indices == num_patterns)
+                if len(unmatched) == 0:
+                    break
+                is_match = candidates.iloc[unmatched].str.contains(self.patterns[i], regex=True).to_numpy(dtype=bool)
+                match_indices[unmatched[is_match]] = i
+        return match_indices
+
+@lru_cache(maxsize=128)
+def get_regex_encoder(patterns, precedence="first"):
+    """Get the (cached) encoder of a tuple of regular expressions, so repeated calls reuse the compiled regular expressions
+    and the strings they already matched
+    
+    Arguments:
+        patterns {tuple} -- the regular expressions, in precedence order
+    
+    Keyword Arguments:
+        precedence {string} -- see encode_regex (default: {"first"})
+    
+    Returns:
+        regex_encoder -- the encoder
+    """
+    return regex_encoder(patterns, precedence)
 
-def encode_class_label(df, column_name):
+def encode_class_label(df, column_name, output="legacy", inplace=False, fitted=None):
     """Encode class labels (order does not matter)
     
     Arguments:
         df {pandas dataframe} -- the dataframe to be manipulated
         column_name {string} -- the name of the column (class label) to be manipulated
     
+    Keyword Arguments:
+        output {string} -- "legacy" (int64 codes, float64 with nan for unseen labels), "codes" (smallest int codes, -1 if missing or unseen) or "category" (pandas Categorical) (default: {"legacy"})
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+        fitted {dict} -- the state learned by fit_encode_class_label. Learned from df if None (default: {None})
+    
+    Raises:
+        ValueError: raises error if the output is not one of LABEL_OUTPUTS
+    
     Returns:
         [pandas dataframe] -- a manipulated copy of the passed in dataframe
     """
-    encode_class_label.__name__ = "Encode Class Label"
+    _check_label_output(output)
+
+    column = df[column_name]
+    if output == "legacy":
+        if fitted is None:
+            # a missing label is a class of its own in the legacy output
+            encoded_column = pd.factorize(column, sort=True, use_na_sentinel=False)[0].astype(np.int64)
+        else:
+            encoded_column = _lookup_codes(column, fitted["classes"])
+    else:
+        if fitted is None:
+            codes, classes = pd.factorize(column, sort=True)
+            classes = list(classes)
+        else:
+            classes = [label for label in fitted["classes"] if not pd.isna(label)]
+            codes = pd.Index(classes).get_indexer(column)
+        encoded_column = _codes_to_label_output(codes, classes, output, False)
 
-    df_copy = df.copy()
-    class_mapping = {label: idx for idx,label in enumerate(np.unique(df_copy[column_name]))}
-    df_copy[column_name] = df_copy[column_name].map(class_mapping)
+    df_copy = df if inplace else df.copy()
+    df_copy[column_name] = encoded_column
     return df_copy
 
-def fill_NaN_column(df, column_name, fill_value):
+def fit_encode_class_label(df, column_name, output="legacy"):
+    """Learn the classes of encode_class_label
+    
+    Arguments:
+        df {pandas dataframe} -- the dataframe to learn from
+        column_name {string} -- the name of the column (class label) to be encoded
+    
+    Keyword Arguments:
+        output {string} -- see encode_class_label (default: {"legacy"})
+    
+    Returns:
+        dict -- "classes": the sorted class labels, missing last
+    """
+    # sorting the uniques instead of the whole column, like np.unique did
+    return {"classes": list(pd.factorize(df[column_name], sort=True, use_na_sentinel=False)[1])}
+
+def _lookup_codes(column, values):
+    """Replace each value of a column with its position in values. Values that are not found become nan, like Series.map with a dict
+    
+    Arguments:
+        column {pandas series} -- the column to be encoded
+        values {list} -- the distinct values in encoding order
+    
+    Returns:
+        numpy array -- int64 codes, or float64 codes if any value was not found
+    """
+    codes = pd.Index(values).get_indexer(column)
+    if (codes == -1).any():
+        return np.where(codes == -1, np.nan, codes)
+    return codes.astype(np.int64)
+
+def fill_NaN_column(df, column_name, fill_value, inplace=False):
     """Fills any nan values in the specified column with the passed fill_value
     
     Arguments:
@@ -218,16 +666,22 @@ def fill_NaN_column(df, column_name, fill_value):
         column_name {string} -- the name of the column to be manipulated
         fill_value {obj} -- the fill value for any nan in the column
     
+    Keyword Arguments:
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+    
     Returns:
         pandas dataframe -- a manipulated copy of the dataframe
     """
-    fill_NaN_column.__name__ = "Fill NaNs of Column"
-
-    df_copy = df.copy() 
-    df_copy[column_name] = df_copy[column_name].fillna(fill_value, inplace=False)
+    df_copy = df if inplace else df.copy()
+    _add_fill_categories(df_copy, {column_name: fill_value})
+    # filled in place in the frame: assigning a filled copy of the column would split it out of its block, and the block
+    # would keep the memory of the old column until every column of the block is replaced. A column without nans is left
+    # alone, a fillna of it would still split it
+    if df_copy[column_name].hasnans:
+        df_copy.fillna({column_name: fill_value}, inplace=True)
     return df_copy
 
-def impute_NaN_column(df, column_name, strategy):
+def impute_NaN_column(df, column_name, strategy, inplace=False, fitted=None):
     """ Impute the nans of a specified column using various strategies
 
     Arguments:
@@ -235,6 +689,10 @@ def impute_NaN_column(df, column_name, strategy):
         column_name {string} -- the name of the column to be manipulated
         strategy {string} -- the name of the specified column
     
+    Keyword Arguments:
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+        fitted {dict} -- the state learned by fit_impute_NaN_column. Learned from df if None (default: {None})
+    
     Raises:
         ValueError: error for trying to get the mean of a non-numeric column
         ValueError: error for trying to get the median of a non-numeric column
@@ -243,79 +701,585 @@ def impute_NaN_column(df, column_name, strategy):
     Returns:
         [type] -- [description]
     """
-    impute_NaN_column.__name__ = "Impute NaN Column"
+    if fitted is None:
+        fitted = fit_impute_NaN_column(df, column_name, strategy)
+
+    df_copy = df if inplace else df.copy()
+    _add_fill_categories(df_copy, {column_name: fitted["fill_value"]})
+    # in place in the frame, see fill_NaN_column
+    if df_copy[column_name].hasnans:
+        df_copy.fillna({column_name: fitted["fill_value"]}, inplace=True)
+    return df_copy
 
-    df_copy = df.copy()
+def fit_impute_NaN_column(df, column_name, strategy):
+    """Learn the fill value of impute_NaN_column
+    
+    Arguments:
+        df {pandas dataframe} -- the dataframe to learn from
+        column_name {string} -- the name of the column to be imputed
+        strategy {string} -- see impute_NaN_column
+    
+    Returns:
+        dict -- "fill_value": the value the nans are replaced with
+    """
     # Impute one column
     if strategy == "mean":
         # if column is non numeric raise error. Cannot get mean of a numeric column
-        if not np.issubdtype(df[column_name].dtype, np.number):
+        if not pd.api.types.is_numeric_dtype(df[column_name].dtype):
             raise ValueError("Cannot compute mean of a non-numeric column")
-        df_copy[column_name].fillna(df_copy[column_name].mean(), inplace=True)
+        fill_value = df[column_name].mean()
     elif strategy == "most_frequent":
         # dropna=True means to not consider NaN values in computing the mode
-        df_copy[column_name].fillna(df_copy[column_name].mode(dropna=True).iloc[0], inplace=True)
+        fill_value = df[column_name].mode(dropna=True).iloc[0]
     elif strategy == "median":
         # if column is non numeric raise error. Cannot get median of a numeric column
-        if not np.issubdtype(df[column_name].dtype, np.number):
+        if not pd.api.types.is_numeric_dtype(df[column_name].dtype):
             raise ValueError("Cannot compute median of a non-numeric column")
-        df_copy[column_name].fillna(df_copy[column_name].median(), inplace=True)
+        fill_value = df[column_name].median()
     else:
         raise ValueError("Strategy \'" + strategy + "\' is not a valid strategy.")
     
+    return {"fill_value": fill_value}
+
+def fill_NaN_columns(df, fill_values, strategies=None, inplace=False, fitted=None):
+    """Fill the nans of several columns in one pass. Each column is filled with its value in fill_values, or imputed
+    with its strategy in strategies (see impute_NaN_column)
+    
+    Arguments:
+        df {pandas dataframe} -- the dataframe to be manipulated
+        fill_values {dict} -- column name --> fill value
+    
+    Keyword Arguments:
+        strategies {dict} -- column name --> impute_NaN_column strategy (default: {None})
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+        fitted {dict} -- the state learned by fit_fill_NaN_columns. Learned from df if None (default: {None})
+    
+    Raises:
+        KeyError: raises error if a column is not in df, like fill_NaN_column (a fillna of the frame would skip it)
+        IndexError: raises error for the most_frequent strategy on a column without values, like impute_NaN_column
+    
+    Returns:
+        pandas dataframe -- a manipulated copy of the dataframe
+    """
+    # the optimizer fuses fill_NaN_column and impute_NaN_column into this, which must fail where they fail
+    for column_name in list(fill_values) + list(strategies or {}):
+        if column_name not in df.columns:
+            raise KeyError(column_name)
+    if fitted is None:
+        fitted = fit_fill_NaN_columns(df, fill_values, strategies)
+
+    df_copy = df if inplace else df.copy()
+    _add_fill_categories(df_copy, fitted["fill_values"])
+    df_copy.fillna(fitted["fill_values"], inplace=True)
     return df_copy
 
-def handle_date(df, column_name):
-    """Handle date values. Works for dates in format year-month-day, but needs at least the year. TODO generalize 
+def fit_fill_NaN_columns(df, fill_values, strategies=None):
+    """Learn the fill values of fill_NaN_columns
+    
+    Arguments:
+        df {pandas dataframe} -- the dataframe to learn from
+        fill_values {dict} -- see fill_NaN_columns
+    
+    Keyword Arguments:
+        strategies {dict} -- see fill_NaN_columns (default: {None})
+    
+    Raises:
+        IndexError: raises error for the most_frequent strategy on a column without values, like impute_NaN_column
+    
+    Returns:
+        dict -- "fill_values": column name --> the value its nans are replaced with
+    """
+    for column_name, strategy in (strategies or {}).items():
+        if strategy == "most_frequent" and column_name in df.columns and not df[column_name].notna().any():
+            raise IndexError("Column \'{}\' has no values to take the most frequent of".format(column_name))
+    fitted_values = dict(fill_values)
+    fitted_values.update(get_impute_values(df, strategies or {}))
+    return {"fill_values": fitted_values}
+
+def impute_NaN_columns(df, strategies, group_by=None, inplace=False, fitted=None):
+    """Impute the nans of many columns at once. The statistics of all the columns are computed together (one
+    aggregation per strategy for mean and median) and all the columns are filled in one pass. With group_by
+    each nan is filled with the statistic of its group, or the statistic of the whole column if its group has none
+    
+    Arguments:
+        df {pandas dataframe} -- the dataframe to be manipulated
+        strategies {dict} -- column name --> "mean", "median" or "most_frequent" (see impute_NaN_column)
+    
+    Keyword Arguments:
+        group_by {string or list} -- the column(s) holding the group key (default: {None})
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+        fitted {dict} -- the state learned by fit_impute_NaN_columns. Learned from df if None (default: {None})
+    
+    Raises:
+        ValueError: error for the mean or median of a non-numeric column, or an incorrect strategy
+    
+    Returns:
+        pandas dataframe -- a manipulated copy of the dataframe
+    """
+    if fitted is None:
+        fitted = fit_impute_NaN_columns(df, strategies, group_by)
+
+    df_copy = df if inplace else df.copy()
+    _add_fill_categories(df_copy, fitted["fill_values"])
+    if fitted["group_by"] is None:
+        df_copy.fillna(fitted["fill_values"], inplace=True)
+        return df_copy
+
+    # position of the group of each row in the fitted groups, the last position being the whole column statistic
+    group_positions = _get_group_index(fitted["group_keys"], fitted["group_by"]).get_indexer(_get_row_keys(df_copy, fitted["group_by"]))
+    group_positions[group_positions == -1] = len(fitted["group_keys"])
+    # only the imputed columns are filled, a fillna of the whole frame would also cast the other columns with nans
+    for column_name, group_values in fitted["group_fill_values"].items():
+        if df_copy[column_name].hasnans:
+            values = pd.Series(group_values + [fitted["fill_values"][column_name]])
+            df_copy[column_name] = df_copy[column_name].fillna(pd.Series(values.take(group_positions).to_numpy(), index=df_copy.index))
+    return df_copy
+
+def fit_impute_NaN_columns(df, strategies, group_by=None):
+    """Learn the fill values of impute_NaN_columns
+    
+    Arguments:
+        df {pandas dataframe} -- the dataframe to learn from
+        strategies {dict} -- see impute_NaN_columns
+    
+    Keyword Arguments:
+        group_by {string or list} -- see impute_NaN_columns (default: {None})
+    
+    Returns:
+        dict -- "fill_values": column name --> the statistic of the whole column, "group_by", and with group_by
+                "group_keys": the group keys and "group_fill_values": column name --> the statistic of each group
+    """
+    fill_values = get_impute_values(df, strategies)
+    if group_by is None:
+        return {"fill_values": fill_values, "group_by": None}
+
+    grouped = df.groupby(group_by, sort=True, dropna=True)
+    group_keys = grouped.size().index
+    group_ids = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    group_fill_values = {}
+    for strategy in ("mean", "median"):
+        column_names = [column_name for column_name, column_strategy in strategies.items() if column_strategy == strategy]
+        if column_names:
+            statistics = getattr(grouped[column_names], strategy)()
+            group_fill_values.update({column_name: statistics[column_name] for column_name in column_names})
+    for column_name, strategy in strategies.items():
+        if strategy == "most_frequent":
+            group_fill_values[column_name] = pd.Series(_get_group_modes(df[column_name], group_ids, len(group_keys)), index=group_keys)
+    # a group without values in a column falls back to the statistic of the whole column
+    group_fill_values = {column_name: list(group_fill_values[column_name].reindex(group_keys).astype(object)
+                                           .where(group_fill_values[column_name].notna(), fill_values[column_name]))
+                         for column_name in strategies}
+    return {"fill_values": fill_values, "group_by": group_by, "group_keys": list(group_keys),
+            "group_fill_values": group_fill_values}
+
+def get_impute_values(df, strategies):
+    """Compute the impute_NaN_column statistic of many columns together: one aggregation per strategy for mean and
+    median
+    
+    Arguments:
+        df {pandas dataframe} -- the dataframe to learn from
+        strategies {dict} -- column name --> "mean", "median" or "most_frequent"
+    
+    Raises:
+        ValueError: error for the mean or median of a non-numeric column, or an incorrect strategy
+    
+    Returns:
+        dict -- column name --> the fill value
+    """
+    fill_values = {}
+    for strategy in ("mean", "median"):
+        column_names = [column_name for column_name, column_strategy in strategies.items() if column_strategy == strategy]
+        for column_name in column_names:
+            if not pd.api.types.is_numeric_dtype(df[column_name].dtype):
+                raise ValueError("Cannot compute {} of a non-numeric column".format(strategy))
+        if column_names:
+            fill_values.update(getattr(df[column_names], strategy)().to_dict())
+    for column_name, strategy in strategies.items():
+        if strategy == "most_frequent":
+            fill_values[column_name] = get_mode(df[column_name])
+        elif strategy not in ("mean", "median"):
+            raise ValueError("Strategy \'" + strategy + "\' is not a valid strategy.")
+    # keep the key order of strategies
+    return {column_name: fill_values[column_name] for column_name in strategies}
+
+def get_mode(column):
+    """Most frequent non missing value of a column, the smallest one if tied
+    
+    Arguments:
+        column {pandas series} -- the column
+    
+    Returns:
+        obj -- the most frequent value, nan if the column is all missing
+    """
+    modes = column.mode(dropna=True)
+    return modes.iloc[0] if len(modes) else np.nan
+
+def _get_group_modes(column, group_ids, num_groups):
+    """Most frequent non missing value of column per group (ids 0..num_groups - 1, -1 for no group), nan for groups
+    without values. Ties go to the smallest value
+    """
+    try:
+        # sorting only the distinct values makes the smallest code the smallest value
+        codes, uniques = pd.factorize(column, sort=True)
+    except TypeError:
+        codes, uniques = pd.factorize(column)
+    modes = np.full(num_groups, np.nan, dtype=object)
+    if len(uniques) == 0:
+        return modes
+    is_valid = (codes != -1) & (group_ids != -1)
+    keys = group_ids[is_valid]*len(uniques) + codes[is_valid]
+    if num_groups*len(uniques) <= 4*len(column) + 1024:
+        # dense counts per (group, value). argmax takes the first, smallest, value among ties
+        counts = np.bincount(keys, minlength=num_groups*len(uniques)).reshape(num_groups, len(uniques))
+        groups_found = np.flatnonzero(counts.any(axis=1))
+        mode_codes = counts[groups_found].argmax(axis=1)
+    else:
+        keys, counts = np.unique(keys, return_counts=True)
+        key_groups, key_codes = np.divmod(keys, len(uniques))
+        # by group, then the highest count, then the smallest code
+        order = np.lexsort((key_codes, -counts, key_groups))
+        groups_found, first = np.unique(key_groups[order], return_index=True)
+        mode_codes = key_codes[order][first]
+    modes[groups_found] = np.asarray(uniques.take(mode_codes), dtype=object)
+    return modes
+
+def _get_group_index(group_keys, group_by):
+    if isinstance(group_by, list):
+        return pd.MultiIndex.from_tuples(group_keys, names=group_by) if group_keys else pd.MultiIndex.from_arrays([[]]*len(group_by))
+    return pd.Index(group_keys)
+
+def _get_row_keys(df, group_by):
+    if isinstance(group_by, list):
+        return pd.MultiIndex.from_frame(df[group_by])
+    return df[group_by]
+
+def handle_date(df, column_name, date_format=None, tz=None, inplace=False):
+    """Handle date values. Splits the date column into year, quarter, month, day of week, day of month and day of year
+    columns (nullable Int16/Int8). Dates that are only a year (2019) or a year-month (2019-08) get just those parts,
+    other dates are parsed with pd.to_datetime as ISO 8601 or with date_format. Each distinct date is parsed once.
     
     Arguments:
         df {pandas dataframe} -- the dataframe to manipulated
         column_name {string} -- the name of the date column to be manipulated
     
+    Keyword Arguments:
+        date_format {string} -- strftime format of the full dates, or "mixed" to infer it per date. ISO 8601 if None (default: {None})
+        tz {string} -- time zone the dates are converted to before they are split. Dates without a time zone are taken as UTC. Kept as written if None (default: {None})
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+    
     Raises:
         ValueError: raises error if date values are not in correct format
     
     Returns:
         pandas dataframe -- a manipulated copy of the passed in dataframe
     """
-    handle_date.__name__ = "Handle Date Column"
+    # parse every distinct date once, then broadcast the parts back to the rows. Missing dates get code -1
+    codes, unique_dates = pd.factorize(df[column_name])
+    date_parts = get_date_parts(pd.Series(unique_dates), date_format, tz)
 
-    def convert_date_to_date_list(date_str):
-        if len(date_str) == 10:
-            # contains year-month-day
-            date_obj = date(year=int(date_str[0:4]), month=int(date_str[5:7]), day=int(date_str[8:10]))
-            date_list = [date_obj.year, (date_obj.month-1)//3, date_obj.month, date_obj.weekday(), date_obj.day, date_obj.strftime('%j')]
-            date_list = [int(x) for x in date_list]
-        elif len(date_str) == 7:
-            # contains year-month
-            date_list = [int(date_str[0:4]), (int(date_str[5:7]) - 1)//3, int(date_str[5:7]), np.nan, np.nan, np.nan]
-        elif len(date_str) == 4:
+    df_copy = df if inplace else df.copy()
+    #create new columns in df  
+    for suffix, part in zip(DATE_COLUMN_SUFFIXES, date_parts):
+        df_copy[column_name + suffix] = part.take(codes, allow_fill=True)
+
+    df_copy.drop([column_name], inplace=True, axis=1)
+    return df_copy
+
+# suffixes of the columns handle_date creates, in order, and their dtypes
+DATE_COLUMN_SUFFIXES = ["_year", "_quarter", "_month", "_day_of_week", "_day_of_month", "_day_of_year"]
+DATE_COLUMN_DTYPES = ["Int16", "Int8", "Int8", "Int8", "Int8", "Int16"]
+# dates with only some of the parts
+YEAR_PATTERN = r"\d{4}"
+YEAR_MONTH_PATTERN = r"\d{4}-\d{2}"
+
+def get_date_parts(dates, date_format=None, tz=None):
+    """Split dates into the values of the columns handle_date creates
+    
+    Arguments:
+        dates {pandas series} -- the dates, as strings or datetimes, without missing values
+    
+    Keyword Arguments:
+        date_format {string} -- see handle_date (default: {None})
+        tz {string} -- see handle_date (default: {None})
+    
+    Raises:
+        ValueError: raises error if date values are not in correct format
+    
+    Returns:
+        list -- year, quarter, month, day of week, day of month and day of year as nullable integer arrays
+    """
+    num_dates = len(dates)
+    year, month, day_of_week, day_of_month, day_of_year = [np.full(num_dates, np.nan) for _ in range(5)]
+    if pd.api.types.is_datetime64_any_dtype(dates.dtype):
+        is_full = np.ones(num_dates, dtype=bool)
+        timestamps = dates
+        if tz is not None:
+            timestamps = timestamps.dt.tz_localize("UTC") if timestamps.dt.tz is None else timestamps
+    else:
+        strings = dates.astype(str).str.strip()
+        is_year = strings.str.fullmatch(YEAR_PATTERN).to_numpy(dtype=bool)
+        is_year_month = strings.str.fullmatch(YEAR_MONTH_PATTERN).to_numpy(dtype=bool)
+        is_full = ~(is_year | is_year_month)
+
+        year[is_year] = strings[is_year].astype(int)
+        year[is_year_month] = strings[is_year_month].str[0:4].astype(int)
+        month[is_year_month] = strings[is_year_month].str[5:7].astype(int)
+        if ((month[is_year_month] < 1) | (month[is_year_month] > 12)).any():
+            raise ValueError("Invalid Date Input on Date:" + strings[is_year_month][(month[is_year_month] < 1) | (month[is_year_month] > 12)].iloc[0])
+
+        timestamps = pd.to_datetime(strings[is_full], format=date_format or "ISO8601", utc=tz is not None)
+
+    if tz is not None:
+        timestamps = timestamps.dt.tz_convert(tz)
+    year[is_full] = timestamps.dt.year
+    month[is_full] = timestamps.dt.month
+    day_of_week[is_full] = timestamps.dt.dayofweek
+    day_of_month[is_full] = timestamps.dt.day
+    day_of_year[is_full] = timestamps.dt.dayofyear
+    quarter = (month - 1)//3
+
+    parts = [year, quarter, month, day_of_week, day_of_month, day_of_year]
+    return [pd.array(part, dtype=dtype) for part, dtype in zip(parts, DATE_COLUMN_DTYPES)]
+
+def convert_date_to_date_list(date_str, date_format=None, tz=None):
+    """Split one date into the values of the columns handle_date creates, without pandas. Follows get_date_parts, but
+    parses full dates with datetime.fromisoformat or datetime.strptime
+    
+    Arguments:
+        date_str {string} -- the date, as a string or datetime
+    
+    Keyword Arguments:
+        date_format {string} -- see handle_date, "mixed" is not supported (default: {None})
+        tz {string} -- see handle_date (default: {None})
+    
+    Raises:
+        ValueError: raises error if the date is not in the correct format
+    
+    Returns:
+        list -- year, quarter, month, day of week, day of month, day of year. pd.NA for the parts the date does not have
+    """
+    if not isinstance(date_str, datetime) and pd.isna(date_str):
+        return [pd.NA]*6
+    if isinstance(date_str, datetime):
+        date_obj = date_str
+    else:
+        date_str = str(date_str).strip()
+        if re.fullmatch(YEAR_PATTERN, date_str):
             # contains year
-            date_list = [int(date_str[0:4]), np.nan, np.nan, np.nan, np.nan, np.nan]
+            return [int(date_str), pd.NA, pd.NA, pd.NA, pd.NA, pd.NA]
+        elif re.fullmatch(YEAR_MONTH_PATTERN, date_str):
+            # contains year-month
+            month = int(date_str[5:7])
+            if not 1 <= month <= 12:
+                raise ValueError("Invalid Date Input on Date:" + date_str)
+            return [int(date_str[0:4]), (month - 1)//3, month, pd.NA, pd.NA, pd.NA]
+        elif date_format is None:
+            date_obj = datetime.fromisoformat(date_str)
         else:
-            raise ValueError("Invalid Date Input on Date:" + date_str)
+            date_obj = datetime.strptime(date_str, date_format)
 
-        return date_list
+    if tz is not None:
+        if date_obj.tzinfo is None:
+            date_obj = date_obj.replace(tzinfo=timezone.utc)
+        date_obj = date_obj.astimezone(tz if isinstance(tz, tzinfo) else ZoneInfo(tz))
+    return [date_obj.year, (date_obj.month-1)//3, date_obj.month, date_obj.weekday(), date_obj.day, date_obj.timetuple().tm_yday]
 
-    df_copy = df.copy()
-    #create new columns in df  
-    new_col_names = ["_year", "_quarter", "_month", "_day_of_week", "_day_of_month", "_day_of_year"]
-    new_col_names = [column_name + x for x in new_col_names]
-    new_col_values = [[] for _ in range(6)]
-    # for each row, get date and then get new date values and apply it to the df
-    date_col_index = df_copy.columns.get_loc(column_name)
-    for row in df_copy.iterrows():
-        date_str = row[1][date_col_index]
-        date_list = convert_date_to_date_list(date_str)
-        for j, val in enumerate(date_list):
-            new_col_values[j].append(val)
-
-    for i, new_col in enumerate(new_col_names):
-        df_copy[new_col] = new_col_values[i]
 
-    df_copy.drop([column_name], inplace=True, axis=1)
+# pred_column_type (see describe.profile) of the string columns reduce_memory makes categorical
+CATEGORICAL_COLUMN_TYPES = ["UNARY", "BINARY", "NONE"]
+
+def reduce_memory(df, column_names=None, categorical=True, arrow_strings=False, inplace=False, fitted=None):
+    """Shrink the memory of the dataframe so the manipulations after it copy less. Numeric columns are downcast to the
+    smallest dtype that holds all their values exactly, string columns with few distinct values (UNARY, BINARY or under
+    50% unique, see describe.profile) become categorical and the other string columns can be stored as arrow strings.
+    See get_memory_report for the bytes saved per column
+    
+    Arguments:
+        df {pandas dataframe} -- the dataframe to be manipulated
+    
+    Keyword Arguments:
+        column_names {list} -- the columns to be reduced. Every column if None (default: {None})
+        categorical {bool} -- make the low cardinality string columns categorical (default: {True})
+        arrow_strings {bool} -- store the other object columns of strings as arrow strings, needs pyarrow (default: {False})
+        inplace {bool} -- manipulate the passed in dataframe instead of a copy (default: {False})
+        fitted {dict} -- the state learned by fit_reduce_memory. Learned from df if None (default: {None})
+    
+    Returns:
+        pandas dataframe -- a manipulated copy of the dataframe
+    """
+    if fitted is None:
+        fitted = fit_reduce_memory(df, column_names, categorical, arrow_strings)
+
+    df_copy = df if inplace else df.copy()
+    for column_name, dtype in fitted["dtypes"].items():
+        column = df_copy[column_name]
+        reduced = _reduce_column(column, dtype, fitted["categories"].get(column_name))
+        if reduced is not column:
+            df_copy[column_name] = reduced
     return df_copy
 
+def fit_reduce_memory(df, column_names=None, categorical=True, arrow_strings=False):
+    """Learn the dtypes of reduce_memory
+    
+    Arguments:
+        df {pandas dataframe} -- the dataframe to learn from
+    
+    Keyword Arguments:
+        column_names {list} -- see reduce_memory (default: {None})
+        categorical {bool} -- see reduce_memory (default: {True})
+        arrow_strings {bool} -- see reduce_memory (default: {False})
+    
+    Returns:
+        dict -- "dtypes": column name --> the name of its new dtype, for the columns that change, and "categories":
+                column name --> the sorted categories of the categorical columns
+    """
+    column_names = list(df.columns) if column_names is None else list(column_names)
+    string_column_names = [column_name for column_name in column_names if _is_string_column(df[column_name])]
+    # only the string columns need their cardinality
+    column_profile = describe.profile(df[string_column_names]) if categorical and string_column_names else None
+
+    dtypes = {}
+    categories = {}
+    for column_name in column_names:
+        column = df[column_name]
+        if column_name in string_column_names:
+            if column_profile is not None and column_profile.loc[column_name, "pred_column_type"] in CATEGORICAL_COLUMN_TYPES:
+                dtypes[column_name] = "category"
+                categories[column_name] = sorted(pd.unique(column.dropna()))
+            elif arrow_strings and pd.api.types.is_object_dtype(column.dtype):
+                dtypes[column_name] = "string[pyarrow]"
+            continue
+        dtype = get_smallest_numeric_dtype(column)
+        if dtype is not None and dtype != column.dtype:
+            dtypes[column_name] = str(dtype)
+    return {"dtypes": dtypes, "categories": categories}
+
+def _is_string_column(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return False
+    if pd.api.types.is_string_dtype(column.dtype) and not pd.api.types.is_object_dtype(column.dtype):
+        return True
+    # object columns of strings only, mixed columns can not be sorted into categories
+    return pd.api.types.is_object_dtype(column.dtype) and pd.api.types.infer_dtype(column, skipna=True) == "string"
+
+def get_smallest_numeric_dtype(column):
+    """Smallest dtype of the same kind (signed, unsigned or float, numpy or nullable) that holds every value of a numeric
+    column exactly. Floats only go down to float32, and only when no value loses precision
+    
+    Arguments:
+        column {pandas series} -- the column
+    
+    Returns:
+        dtype -- the dtype, the dtype of the column if it can not be smaller, None for columns that are not numeric
+    """
+    dtype = column.dtype
+    if pd.api.types.is_bool_dtype(dtype) or not pd.api.types.is_numeric_dtype(dtype):
+        return None
+    numpy_dtype = getattr(dtype, "numpy_dtype", dtype)
+    if numpy_dtype.kind in "iu":
+        values = column.dropna()
+        low, high = (values.min(), values.max()) if len(values) else (0, 0)
+        candidates = [np.dtype(numpy_dtype.kind + str(size)) for size in (1, 2, 4, 8)]
+        smallest = next(candidate for candidate in candidates if np.iinfo(candidate).min <= low and high <= np.iinfo(candidate).max)
+    elif numpy_dtype == np.float64:
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        with np.errstate(over="ignore"):
+            is_exact = np.array_equal(values.astype(np.float32).astype(np.float64), values, equal_nan=True)
+        smallest = np.dtype(np.float32) if is_exact else numpy_dtype
+    else:
+        return dtype
+    return smallest if isinstance(dtype, np.dtype) else _get_nullable_dtype(smallest)
+
+def _get_nullable_dtype(numpy_dtype):
+    prefix = {"i": "Int", "u": "UInt", "f": "Float"}[numpy_dtype.kind]
+    return pd.api.types.pandas_dtype(prefix + str(numpy_dtype.itemsize*8))
+
+def _reduce_column(column, dtype, categories=None):
+    """Cast a column to a dtype learned by fit_reduce_memory. Values the dtype can not hold (ex. larger numbers or new
+    strings than in fit) widen the numeric dtype or are added to the categories instead of being lost
+    """
+    if dtype == "category":
+        reduced = pd.Categorical(column, categories=categories)
+        is_unseen = (reduced.codes == -1) & column.notna().to_numpy()
+        if is_unseen.any():
+            reduced = pd.Categorical(column, categories=list(categories) + list(pd.unique(column[is_unseen])))
+        return pd.Series(reduced, index=column.index, name=column.name)
+    if dtype == "string[pyarrow]":
+        return column.astype(dtype)
+
+    dtype = pd.api.types.pandas_dtype(dtype)
+    smallest = get_smallest_numeric_dtype(column)
+    if smallest is not None:
+        numpy_dtype = np.promote_types(getattr(dtype, "numpy_dtype", dtype), getattr(smallest, "numpy_dtype", smallest))
+        both_numpy = isinstance(dtype, np.dtype) and isinstance(smallest, np.dtype)
+        dtype = numpy_dtype if both_numpy else _get_nullable_dtype(numpy_dtype)
+    return column if column.dtype == dtype else column.astype(dtype)
+
+def get_memory_report(df_before, df_after):
+    """Compare the memory of each column before and after a manipulation (ex. reduce_memory)
+    
+    Arguments:
+        df_before {pandas dataframe} -- the dataframe before
+        df_after {pandas dataframe} -- the dataframe after
+    
+    Returns:
+        pandas dataframe -- one row per column of df_after that is in df_before, with "dtype_before", "dtype_after",
+                            "bytes_before", "bytes_after" and "bytes_saved"
+    """
+    column_names = [column_name for column_name in df_after.columns if column_name in df_before.columns]
+    report = pd.DataFrame({
+        "dtype_before": df_before.dtypes[column_names].astype(str),
+        "dtype_after": df_after.dtypes[column_names].astype(str),
+        "bytes_before": df_before[column_names].memory_usage(index=False, deep=True),
+        "bytes_after": df_after[column_names].memory_usage(index=False, deep=True),
+    })
+    report["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+    return report
+
+def _add_fill_categories(df, fill_values):
+    """Add the fill values that are not categories yet to the categories of the categorical columns, so that filling
+    the nans of a column reduce_memory made categorical does not raise
+    """
+    for column_name, fill_value in fill_values.items():
+        if column_name not in df.columns:
+            continue
+        column = df[column_name]
+        if isinstance(column.dtype, pd.CategoricalDtype) and not pd.isna(fill_value) and fill_value not in column.cat.categories:
+            df[column_name] = column.cat.add_categories([fill_value])
+
+
+# manipulation function --> function learning its state, for the manipulations that learn state (see manipulator.fit)
+FITTERS = {
+    encode_ordinal: fit_encode_ordinal,
+    encode_nominal: fit_encode_nominal,
+    encode_class_label: fit_encode_class_label,
+    impute_NaN_column: fit_impute_NaN_column,
+    fill_NaN_columns: fit_fill_NaN_columns,
+    impute_NaN_columns: fit_impute_NaN_columns,
+    reduce_memory: fit_reduce_memory,
+}
+
+# operation name --> manipulation function. The names pipeline specs refer to the functions by, see spec.py
+OPERATIONS = {function.__name__: function for function in [
+    drop_columns, drop_rows, encode_ordinal, encode_nominal, encode_regex, encode_class_label, fill_NaN_column,
+    impute_NaN_column, fill_NaN_columns, impute_NaN_columns, handle_date, reduce_memory,
+]}
+
+# manipulation function --> the name shown to users
+DISPLAY_NAMES = {
+    drop_columns: "Drop Columns",
+    drop_rows: "Drop Rows",
+    encode_ordinal: "Encode Ordinal Values",
+    encode_nominal: "Encode Nominal Values",
+    encode_regex: "Encode with Regular Expression",
+    encode_class_label: "Encode Class Label",
+    fill_NaN_column: "Fill NaNs of Column",
+    impute_NaN_column: "Impute NaN Column",
+    fill_NaN_columns: "Fill NaNs of Columns",
+    impute_NaN_columns: "Impute NaN Columns",
+    handle_date: "Handle Date Column",
+    reduce_memory: "Reduce Memory",
+}
 
 
 # df = pd.read_csv("Sample_Data/excited_tracks.csv", index_col=0)
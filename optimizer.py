@@ -0,0 +1,200 @@
+from manipulator import *
+"""
+Planning pass for the manipulations of a preprocessor. Uses the columns each manipulation reads and writes to:
+    - move drop_rows and drop_columns as early as they can go, so the manipulations before them do less work
+    - prune manipulations that only write columns a later drop_columns removes
+    - fuse consecutive fill_NaN_column and impute_NaN_column manipulations on different columns into one fill_NaN_columns
+The planned manipulations give the same dataframe as the original ones. Manipulations without a footprint (functions
+not in FOOTPRINTS) are barriers that nothing is moved across.
+"""
+
+class footprint:
+    """The columns a manipulation reads and writes, and whether it looks at other rows
+    """
+    def __init__(self, reads=(), writes=(), prefixes=(), row_wise=False, drops_rows=False):
+        """Intialize the footprint
+
+        Keyword Arguments:
+            reads {iterable} -- the columns read (default: {()})
+            writes {iterable} -- the columns changed, added or removed (default: {()})
+            prefixes {iterable} -- name prefixes of added columns whose names depend on the data (ex. one-hot columns) (default: {()})
+            row_wise {bool} -- each output row only depends on the same input row, so dropping rows first gives the same rows (default: {False})
+            drops_rows {bool} -- the manipulation removes rows (default: {False})
+        """
+        self.reads = set(reads)
+        self.writes = set(writes)
+        self.prefixes = tuple(prefixes)
+        self.row_wise = row_wise
+        self.drops_rows = drops_rows
+
+    def touches(self, column_names):
+        """Return whether the manipulation reads, writes or may add any of the columns
+        """
+        return any(column_name in self.reads or column_name in self.writes or
+                   any(str(column_name).startswith(prefix) for prefix in self.prefixes) for column_name in column_names)
+
+def _column_footprint(column_name, *args, **kwargs):
+    return footprint(reads=[column_name], writes=[column_name])
+
+# manipulation function --> function of its arguments returning its footprint
+FOOTPRINTS = {
+    drop_columns: lambda column_names: footprint(writes=column_names, row_wise=True),
+    drop_rows: lambda row_indices: footprint(row_wise=True, drops_rows=True),
+    # learn from the whole column, so they are not row wise
+    encode_ordinal: _column_footprint,
+    encode_class_label: _column_footprint,
+    impute_NaN_column: _column_footprint,
+    # the dtype of the output depends on which patterns the remaining values match
+    encode_regex: _column_footprint,
+    encode_nominal: lambda column_name, binary, *args: footprint(reads=[column_name], writes=[column_name],
+                                                                 prefixes=() if binary else [str(column_name) + "_"]),
+    fill_NaN_column: lambda column_name, fill_value: footprint(reads=[column_name], writes=[column_name], row_wise=True),
+    fill_NaN_columns: lambda fill_values, strategies=None: footprint(reads=list(fill_values) + list(strategies or {}),
+                                                                     writes=list(fill_values) + list(strategies or {}),
+                                                                     row_wise=not strategies),
+    impute_NaN_columns: lambda strategies, group_by=None: footprint(reads=list(strategies) + _as_list(group_by), writes=strategies),
+    # every column when column_names is None, which has no footprint
+    reduce_memory: lambda column_names=None, *args: None if column_names is None else footprint(reads=column_names, writes=column_names),
+    handle_date: lambda column_name, *args: footprint(reads=[column_name], row_wise=True,
+                                                      writes=[column_name] + [column_name + suffix for suffix in DATE_COLUMN_SUFFIXES]),
+}
+
+def _as_list(column_names):
+    if column_names is None:
+        return []
+    return list(column_names) if isinstance(column_names, list) else [column_names]
+
+def get_footprint(manipulation):
+    """Return the footprint of a manipulation
+
+    Arguments:
+        manipulation {manipulator} -- the manipulation
+
+    Returns:
+        footprint -- the footprint, or None if the function is not in FOOTPRINTS or its columns are not known
+    """
+    get = FOOTPRINTS.get(manipulation.get_function())
+    return get(*manipulation.get_args()) if get else None
+
+
+class plan_step:
+    """A manipulation of the plan and where it came from
+    """
+    def __init__(self, manipulation, origins, note=""):
+        self.manipulation = manipulation
+        self.footprint = get_footprint(manipulation)
+        # positions (from 1) in the original manipulations
+        self.origins = origins
+        self.note = note
+
+def optimize(manipulations):
+    """Plan the manipulations: move drops earlier, prune dead manipulations and fuse fills
+
+    Arguments:
+        manipulations {list} -- the manipulator objects, in order
+
+    Returns:
+        tuple -- (list of planned manipulator objects, list of plan_step with the explanation of the plan, list of
+                  (pruned plan_step, reason))
+    """
+    steps = [plan_step(manipulation, [i + 1]) for i, manipulation in enumerate(manipulations)]
+    pruned = []
+    # pruning can free the way for a drop that was placed before it, so repeat until nothing moves
+    while True:
+        planned, newly_pruned = _push_drops(steps)
+        pruned += newly_pruned
+        if [step.origins for step in planned] == [step.origins for step in steps]:
+            break
+        steps = planned
+    steps = _fuse_fills(steps)
+    return [step.manipulation for step in steps], steps, pruned
+
+def _push_drops(steps):
+    pruned = []
+    planned = []
+    for step in steps:
+        position = len(planned)
+        if _is_drop(step):
+            dropped_columns = step.footprint.writes
+            while position > 0:
+                before = planned[position - 1]
+                # column drops go before row drops and drops of a kind keep their order, so the planning terminates
+                if before.footprint is None or (_is_drop(before) and (step.footprint.drops_rows or not before.footprint.drops_rows)):
+                    break
+                if step.footprint.drops_rows:
+                    if not before.footprint.row_wise:
+                        break
+                elif _is_dead(before, dropped_columns):
+                    pruned.append((planned.pop(position - 1), "only writes columns dropped by step {}".format(step.origins[0])))
+                elif before.footprint.touches(dropped_columns):
+                    break
+                position -= 1
+            if position < len(planned):
+                step.note = "moved before step {}".format(planned[position].origins[0])
+        planned.insert(position, step)
+    return planned, pruned
+
+def _is_drop(step):
+    return step.manipulation.get_function() in (drop_columns, drop_rows)
+
+def _is_dead(step, dropped_columns):
+    # a manipulation whose every change is dropped afterwards. drops are kept, so that a missing column still raises
+    return not _is_drop(step) and not step.footprint.prefixes and step.footprint.writes <= set(dropped_columns)
+
+def _fuse_fills(steps):
+    fused = []
+    for step in steps:
+        if fused and _can_fuse(fused[-1], step):
+            fused[-1] = _fuse(fused[-1], step)
+        else:
+            fused.append(step)
+    return fused
+
+FUSABLE_FILLS = (fill_NaN_column, impute_NaN_column, fill_NaN_columns)
+
+def _can_fuse(a, b):
+    return (a.manipulation.get_function() in FUSABLE_FILLS and b.manipulation.get_function() in FUSABLE_FILLS and
+            not a.footprint.writes & b.footprint.writes)
+
+def _get_fills(manipulation):
+    """(fill values, strategies, fitted fill values or None) of a fill manipulation"""
+    function, args, fitted = manipulation.get_function(), manipulation.get_args(), manipulation.fitted
+    if function == fill_NaN_column:
+        return {args[0]: args[1]}, {}, {args[0]: args[1]}
+    if function == impute_NaN_column:
+        return {}, {args[0]: args[1]}, None if fitted is None else {args[0]: fitted["fill_value"]}
+    return dict(args[0]), dict(args[1] if len(args) > 1 and args[1] else {}), None if fitted is None else fitted["fill_values"]
+
+def _fuse(a, b):
+    fill_values, strategies, fitted = _get_fills(a.manipulation)
+    b_fill_values, b_strategies, b_fitted = _get_fills(b.manipulation)
+    fill_values.update(b_fill_values)
+    strategies.update(b_strategies)
+    manipulation = manipulator(fill_NaN_columns, fill_values, strategies)
+    # the fused manipulation is fitted when every manipulation it replaces is
+    if fitted is not None and b_fitted is not None:
+        manipulation.fitted = {"fill_values": {**fitted, **b_fitted}}
+    return plan_step(manipulation, a.origins + b.origins, "; ".join(note for note in (a.note, b.note) if note))
+
+def explain(manipulations):
+    """Describe the plan optimize chooses for the manipulations
+
+    Arguments:
+        manipulations {list} -- the manipulator objects, in order
+
+    Returns:
+        string -- the planned manipulations with where they came from, and the pruned manipulations
+    """
+    _, steps, pruned = optimize(manipulations)
+    out = "Plan ({} manipulations, from {}):".format(len(steps), len(manipulations))
+    for i, step in enumerate(steps):
+        notes = [step.note] if step.note else []
+        if len(step.origins) > 1:
+            notes.insert(0, "fused")
+        out += "\n\t{} -- {} (step {}){}".format(i + 1, step.manipulation.get_operation_name(), ", ".join(str(origin) for origin in step.origins),
+                                               "".join(" -- " + note for note in notes))
+    if pruned:
+        out += "\nPruned:"
+        for step, reason in pruned:
+            out += "\n\t{} (step {}) -- {}".format(step.manipulation.get_operation_name(), step.origins[0], reason)
+    return out
@@ -1,34 +1,407 @@
 from manipulator import *
 import describe as describe
+from compiled import compiled_preprocessor
+from cache import fingerprint_frame, get_step_key
+import optimizer
+import scheduler
+import engines
+import stream
+from instrument import format_record
+import spec
 import pandas as pd
+import pickle
+import time
 
 
 class preprocessor:
-    def __init__(self, df):
-        self.df = df.copy()
+    def __init__(self, df=None, copy=True, cache=None, instrument=None, reduce_memory=False):
+        """Intialize the preprocessor object
+        
+        Keyword Arguments:
+            df {pandas dataframe} -- the dataframe to be preprocessed. Not needed to only fit and transform other dataframes (default: {None})
+            copy {bool} -- store a copy of df. If false the preprocessor takes ownership of the passed in dataframe (default: {True})
+            cache {step_cache} -- cache of the output of each manipulation, used by preprocess. See cache.step_cache (default: {None})
+            instrument {instrumenter} -- records the cost of each manipulation run by preprocess and transform. See instrument.instrumenter (default: {None})
+            reduce_memory {bool} -- shrink the stored dataframe before any manipulation runs, see the reduce_memory method (default: {False})
+        """
+        self.df = df.copy() if copy and df is not None else df
         self.manipulations = []
+        self.cache = cache
+        self.instrument = instrument
+        # (dataframe, fingerprint) of the last stored dataframe fingerprinted for the cache
+        self._fingerprint = (None, None)
+        # column name --> dtype over the whole file, found by fit_stream
+        self.stream_dtypes = None
+        # the fitted reduce_memory run on every dataframe before the manipulations, and the bytes it saved
+        self.memory_manipulation = None
+        self.memory_report = None
+        if reduce_memory:
+            self.reduce_memory()
 
     def __str__(self):
         out = "Preprocessor Object:" 
         for i, manipulation in enumerate(self.manipulations):
             out+= "\n\t{} -- {}".format(i+1, manipulation)
         
+        if self.instrument is not None and self.instrument.last_run:
+            out += "\nLast run ({}):".format(self.instrument.last_run[0]["mode"])
+            for record in self.instrument.last_run:
+                out += "\n\t{} -- {} -- {}".format(record["step"], record["operation"], format_record(record))
         return out
 
     def describe(self):
         describe.describe(self.df)
 
-    def preprocess(self):
+    def reduce_memory(self, column_names=None, categorical=True, arrow_strings=False):
+        """Shrink the stored dataframe with manipulator.reduce_memory, so every copy made by the manipulations is smaller.
+        The learned dtypes are also applied first to the dataframes passed to fit and transform
+
+        Keyword Arguments:
+            column_names {list} -- the columns to be reduced. Every column if None (default: {None})
+            categorical {bool} -- make the low cardinality string columns categorical (default: {True})
+            arrow_strings {bool} -- store the other object columns of strings as arrow strings (default: {False})
+
+        Returns:
+            pandas dataframe -- the bytes saved per column, see manipulator.get_memory_report
+        """
+        self.memory_manipulation = manipulator(reduce_memory, column_names, categorical, arrow_strings).fit(self.df)
+        # the shallow copy keeps the columns as they were for the report, without copying their data
+        df_before = self.df.copy(deep=False)
+        self.df = self.memory_manipulation.transform(self.df, inplace=True)
+        self.memory_report = get_memory_report(df_before, self.df)
+        self._fingerprint = (None, None)
+        return self.memory_report
+
+    def _get_memory_manipulations(self):
+        return [] if self.memory_manipulation is None else [self.memory_manipulation]
+
+    def _reduce_memory(self, df):
+        if self.memory_manipulation is None:
+            return df
+        return self.memory_manipulation.transform(df, inplace=True)
+
+    def preprocess(self, copy_free=False, inplace=False, optimize=False, n_jobs=1, backend="thread", engine="pandas"):
         """Preprocess/Clean the dataframe by doing each of the manipulation operations. Returns a copy
+
+        By default every manipulation works on its own copy of the dataframe. With copy_free the dataframe is copied
+        once and that copy is handed from manipulation to manipulation, so peak memory does not grow with the number of
+        manipulations. With inplace not even that copy is made.
+
+        With a cache, the run resumes from the output of the longest prefix of the manipulations that is cached and the
+        output of every manipulation that is run is cached.
         
+        Keyword Arguments:
+            copy_free {bool} -- make a single defensive copy and run every manipulation in place on it (default: {False})
+            inplace {bool} -- run every manipulation in place on the stored dataframe, which is replaced by the result (default: {False})
+            optimize {bool} -- run the manipulations planned by optimizer.optimize instead, see explain (default: {False})
+            n_jobs {int} -- run consecutive manipulations on disjoint columns concurrently on this many workers, see scheduler. Not used with a cache (default: {1})
+            backend {string} -- "thread" or "process" (default: {"thread"})
+            engine {string} -- "pandas", or an engine of engines.ENGINES (ex. "polars") to run the manipulations on instead. Not used with a cache or an instrumenter (default: {"pandas"})
+
+        Raises:
+            ValueError: raises error if instrumented and n_jobs is not 1
+            ValueError: raises error if the engine is not valid, or is not pandas with a cache or an instrumenter
+
         Returns:
-            pandas dataframe -- a copy of the manipulated dataframe
+            pandas dataframe -- a copy of the manipulated dataframe, or the stored dataframe if inplace
+        """
+        manipulations = self._get_plan(optimize)
+        if engine != "pandas":
+            df_copy = self._run_engine(engine, self.df, manipulations)
+        elif self.cache is None and n_jobs != 1:
+            self._check_not_instrumented(n_jobs)
+            df_copy = scheduler.run_manipulations(self.df if inplace else self.df.copy(), manipulations, n_jobs, backend)
+        elif self.cache is None:
+            df_copy = self.df if inplace else self.df.copy()
+            if self.instrument is None:
+                for manipulation in manipulations:
+                    df_copy = manipulation.do(df_copy, inplace=copy_free or inplace)
+            else:
+                with self.instrument.recording("preprocess"):
+                    for i, manipulation in enumerate(manipulations):
+                        df_copy = self.instrument.run(i + 1, manipulation, df_copy, manipulation.do, inplace=copy_free or inplace)
+        else:
+            df_copy = self._preprocess_cached(manipulations, copy_free or inplace, inplace)
+
+        if inplace:
+            self.df = df_copy
+            # the manipulations may have changed the stored dataframe in place, keeping the object the same
+            self._fingerprint = (None, None)
+        return df_copy
+
+    def _preprocess_cached(self, manipulations, copy_free, inplace):
+        keys = self.get_step_keys(manipulations)
+        num_cached, df_copy, seconds = self.cache.get_longest_prefix(keys)
+        if df_copy is None:
+            df_copy = self.df if inplace else self.df.copy()
+        if self.instrument is None:
+            for manipulation, key in zip(manipulations[num_cached:], keys[num_cached:]):
+                start_time = time.perf_counter()
+                df_copy = manipulation.do(df_copy, inplace=copy_free)
+                seconds += time.perf_counter() - start_time
+                self.cache.put(key, df_copy, seconds)
+            return df_copy
+
+        # only the manipulations that are run are recorded, with their position in the full run
+        with self.instrument.recording("preprocess"):
+            for i, (manipulation, key) in enumerate(zip(manipulations[num_cached:], keys[num_cached:])):
+                df_copy = self.instrument.run(num_cached + i + 1, manipulation, df_copy, manipulation.do, inplace=copy_free)
+                seconds += self.instrument.last_run[-1]["wall_seconds"]
+                self.cache.put(key, df_copy, seconds)
+        return df_copy
+
+    def get_step_keys(self, manipulations=None):
+        """Return the cache key of the output of each manipulation of preprocess. The stored dataframe is owned by the
+        preprocessor, so its fingerprint is only computed again when it is replaced or preprocessed in place
+
+        Keyword Arguments:
+            manipulations {list} -- the manipulations to be run. The manipulations of the preprocessor if None (default: {None})
+
+        Returns:
+            list -- one key per manipulation, see cache.get_step_key
         """
-        df_copy = df.copy()
+        keys = []
+        if self._fingerprint[0] is not self.df:
+            self._fingerprint = (self.df, fingerprint_frame(self.df))
+        key = self._fingerprint[1]
+        for manipulation in (self.manipulations if manipulations is None else manipulations):
+            key = get_step_key(key, manipulation)
+            keys.append(key)
+        return keys
+
+    def fit(self, df=None):
+        """Learn the state of every manipulation. Each manipulation is fit on the output of the ones before it
+
+        Keyword Arguments:
+            df {pandas dataframe} -- the dataframe to learn from. The stored dataframe if None (default: {None})
+
+        Returns:
+            preprocessor -- the fitted preprocessor
+        """
+        df_copy = self.df.copy() if df is None else self._reduce_memory(df.copy())
         for manipulation in self.manipulations:
-            df_copy = manipulation.do(df_copy)
+            manipulation.fit(df_copy)
+            df_copy = manipulation.transform(df_copy, inplace=True)
+        return self
+
+    def transform(self, df, copy_free=False, optimize=False, n_jobs=1, backend="thread", engine="pandas"):
+        """Apply the fitted manipulations to a dataframe without learning anything from it. Returns a copy
+
+        Arguments:
+            df {pandas dataframe} -- the dataframe to be manipulated. A pyarrow table also works with the polars engine
+
+        Keyword Arguments:
+            copy_free {bool} -- make a single defensive copy and run every manipulation in place on it (default: {False})
+            optimize {bool} -- run the manipulations planned by optimizer.optimize instead, see explain (default: {False})
+            n_jobs {int} -- run consecutive manipulations on disjoint columns concurrently on this many workers, see scheduler (default: {1})
+            backend {string} -- "thread" or "process" (default: {"thread"})
+            engine {string} -- "pandas", or an engine of engines.ENGINES (ex. "polars") to run the manipulations on instead. Not used with an instrumenter (default: {"pandas"})
+
+        Raises:
+            ValueError: raises error if instrumented and n_jobs is not 1
+            ValueError: raises error if the engine is not valid, or is not pandas with an instrumenter
+
+        Returns:
+            pandas dataframe -- a copy of the manipulated dataframe
+        """
+        if engine != "pandas":
+            return self._run_engine(engine, df, self._get_memory_manipulations() + self._get_plan(optimize), transform=True)
+        df_copy = self._reduce_memory(df.copy())
+        if n_jobs != 1:
+            self._check_not_instrumented(n_jobs)
+            return scheduler.run_manipulations(df_copy, self._get_plan(optimize), n_jobs, backend, transform=True)
+        if self.instrument is None:
+            for manipulation in self._get_plan(optimize):
+                df_copy = manipulation.transform(df_copy, inplace=copy_free)
+            return df_copy
+
+        with self.instrument.recording("transform"):
+            for i, manipulation in enumerate(self._get_plan(optimize)):
+                df_copy = self.instrument.run(i + 1, manipulation, df_copy, manipulation.transform, inplace=copy_free)
         return df_copy
+
+    def _run_engine(self, engine, df, manipulations, transform=False):
+        if engine not in engines.ENGINES:
+            raise ValueError("Engine \'" + engine + "\' is not a valid engine.")
+        # the engines run every manipulation in one go, there is no per manipulation output to cache or measure
+        if self.instrument is not None or (self.cache is not None and not transform):
+            raise ValueError("The {} engine does not run with a cache or an instrumenter".format(engine))
+        return engines.ENGINES[engine](df, manipulations, transform=transform)
+
+    def _check_not_instrumented(self, n_jobs):
+        # the cpu time and traced memory are process wide, so concurrent manipulations can not be told apart
+        if self.instrument is not None:
+            raise ValueError("Instrumented runs need n_jobs=1, got {}".format(n_jobs))
+
+    def get_report(self, last_run=False):
+        """Return the cost of each manipulation of the instrumented runs. See instrument.instrumenter.get_report
+
+        Keyword Arguments:
+            last_run {bool} -- only the manipulations of the last run (default: {False})
+
+        Raises:
+            ValueError: raises error if the preprocessor has no instrumenter
+
+        Returns:
+            pandas dataframe -- one row per manipulation run
+        """
+        if self.instrument is None:
+            raise ValueError("The preprocessor is not instrumented, pass instrument=instrumenter()")
+        return self.instrument.get_report(last_run)
+
+    def fit_stream(self, source, chunksize=100000, file_format=None, **read_kwargs):
+        """Learn the state of every manipulation from a csv or parquet file read chunksize rows at a time, for files that do
+        not fit in memory. Like fit, each chunk is first shrunk by the learned reduce_memory, if any. See stream.fit_stream
+
+        Arguments:
+            source {string} -- the path of the file
+
+        Keyword Arguments:
+            chunksize {int} -- the number of rows read at a time (default: {100000})
+            file_format {string} -- "csv" or "parquet". From the file extension if None (default: {None})
+            read_kwargs -- passed on to pd.read_csv (ex. index_col=0)
+
+        Returns:
+            preprocessor -- the fitted preprocessor
+        """
+        self.stream_dtypes = stream.fit_stream(self.manipulations, source, chunksize, file_format,
+                                               self._get_memory_manipulations(), **read_kwargs)
+        return self
+
+    def preprocess_stream(self, source, sink, chunksize=100000, fit=True, file_format=None, sink_format=None,
+                          write_kwargs=None, **read_kwargs):
+        """Preprocess a csv or parquet file that does not fit in memory: read it, manipulate it and write the result a
+        chunk at a time. Gives the same rows as reading the whole file and running fit and transform, and with a parquet
+        sink the same dtypes. Like transform, each chunk is first shrunk by the learned reduce_memory, if any
+
+        Arguments:
+            source {string} -- the path of the file to be read
+            sink {string} -- the path of the csv or parquet file to be written
+
+        Keyword Arguments:
+            chunksize {int} -- the number of rows read at a time (default: {100000})
+            fit {bool} -- fit the manipulations on the file first, see fit_stream. Otherwise they need to be fitted (default: {True})
+            file_format {string} -- "csv" or "parquet" for the source. From the file extension if None (default: {None})
+            sink_format {string} -- "csv" or "parquet" for the sink. From the file extension if None (default: {None})
+            write_kwargs {dict} -- passed on to DataFrame.to_csv or pyarrow's ParquetWriter (default: {None})
+            read_kwargs -- passed on to pd.read_csv (ex. index_col=0)
+
+        Returns:
+            int -- the number of rows written
+        """
+        if fit:
+            self.fit_stream(source, chunksize, file_format, **read_kwargs)
+        return stream.transform_stream(self.manipulations, source, sink, chunksize, self.stream_dtypes, file_format,
+                                       sink_format, write_kwargs, self._get_memory_manipulations(), **read_kwargs)
+
+    def explain(self):
+        """Return the plan preprocess and transform run with optimize: which manipulations were moved, fused or pruned
+
+        Returns:
+            string -- the explanation of the plan
+        """
+        return optimizer.explain(self.manipulations)
+
+    def _get_plan(self, optimize):
+        return optimizer.optimize(self.manipulations)[0] if optimize else self.manipulations
+
+    def is_fitted(self):
+        return all(manipulation.is_fitted() for manipulation in self.manipulations)
+
+    def compile(self):
+        """Turn the fitted manipulations into plain python functions over records (dicts of column name --> value) for
+        low latency scoring of single records or small batches. See compiled.compiled_preprocessor
+
+        Raises:
+            ValueError: raises error if a manipulation is not fitted or can not be compiled (ex. drop_rows)
+
+        Returns:
+            compiled_preprocessor -- the compiled manipulations
+        """
+        return compiled_preprocessor(self.manipulations)
+
+    def save(self, path):
+        """Save the manipulations and their fitted state (not the stored dataframe) to disk
+
+        Arguments:
+            path {string} -- the file to be written
+        """
+        with open(path, "wb") as f:
+            pickle.dump({"manipulations": self.manipulations, "memory_manipulation": self.memory_manipulation}, f)
+
+    @staticmethod
+    def load(path):
+        """Load a preprocessor saved with save
+
+        Arguments:
+            path {string} -- the file to be read
+
+        Returns:
+            preprocessor -- a preprocessor without a stored dataframe, ready to transform
+        """
+        with open(path, "rb") as f:
+            saved = pickle.load(f)
+        proc = preprocessor()
+        proc.manipulations = saved["manipulations"]
+        proc.memory_manipulation = saved.get("memory_manipulation")
+        return proc
     
+    def to_spec(self):
+        """Describe the manipulations, their arguments and their fitted state as plain data. See spec
+
+        Raises:
+            ValueError: raises error if a manipulation is not in manipulator.OPERATIONS
+            TypeError: raises error if an argument or a fitted state holds a value that can not be written
+
+        Returns:
+            dict -- "version", "manipulations" and "reduce_memory" if the preprocessor reduces memory
+        """
+        out = {"version": spec.SPEC_VERSION, "manipulations": [spec.manipulation_to_spec(manipulation) for manipulation in self.manipulations]}
+        if self.memory_manipulation is not None:
+            out["reduce_memory"] = spec.manipulation_to_spec(self.memory_manipulation)
+        return out
+
+    @staticmethod
+    def from_spec(pipeline_spec):
+        """Build a preprocessor from to_spec
+
+        Arguments:
+            pipeline_spec {dict} -- the spec
+
+        Raises:
+            ValueError: raises error if the spec has a newer version or an operation is unknown
+
+        Returns:
+            preprocessor -- a preprocessor without a stored dataframe, ready to transform if the spec was fitted
+        """
+        if pipeline_spec.get("version", spec.SPEC_VERSION) > spec.SPEC_VERSION:
+            raise ValueError("Spec version {} is newer than {}".format(pipeline_spec["version"], spec.SPEC_VERSION))
+        proc = preprocessor()
+        proc.manipulations = [spec.manipulation_from_spec(manipulation_spec) for manipulation_spec in pipeline_spec["manipulations"]]
+        if pipeline_spec.get("reduce_memory") is not None:
+            proc.memory_manipulation = spec.manipulation_from_spec(pipeline_spec["reduce_memory"])
+        return proc
+
+    def save_spec(self, path):
+        """Save the spec of the preprocessor (see to_spec) as JSON, or as YAML if path ends with .yaml or .yml
+
+        Arguments:
+            path {string} -- the file to be written
+        """
+        spec.write_spec(self.to_spec(), path)
+
+    @staticmethod
+    def load_spec(path):
+        """Load a preprocessor saved with save_spec
+
+        Arguments:
+            path {string} -- the file to be read
+
+        Returns:
+            preprocessor -- a preprocessor without a stored dataframe
+        """
+        return preprocessor.from_spec(spec.read_spec(path))
+
     def get_manipulations(self):
         return self.manipulations 
     
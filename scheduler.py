@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from optimizer import get_footprint
+import pandas as pd
+"""
+Runs the manipulations of a preprocessor concurrently where their column footprints (see optimizer.FOOTPRINTS) allow it.
+Consecutive manipulations that touch disjoint columns form a stage. Each manipulation of a stage runs on a dataframe of
+only the columns it touches, and the resulting columns are merged back in manipulation order, so the result is the
+same dataframe, with the same column order, as running the manipulations one after another.
+"""
+
+def get_stages(manipulations):
+    """Group consecutive independent manipulations into stages. Manipulations without a footprint and manipulations
+    that drop rows are stages of their own
+
+    Arguments:
+        manipulations {list} -- the manipulator objects, in order
+
+    Returns:
+        list -- the stages, lists of (manipulator, footprint)
+    """
+    stages = []
+    for manipulation in manipulations:
+        footprint = get_footprint(manipulation)
+        if (stages and _is_parallel(footprint) and _is_parallel(stages[-1][-1][1]) and
+                all(are_independent(footprint, other) for _, other in stages[-1])):
+            stages[-1].append((manipulation, footprint))
+        else:
+            stages.append([(manipulation, footprint)])
+    return stages
+
+def _is_parallel(footprint):
+    return footprint is not None and not footprint.drops_rows
+
+def are_independent(a, b):
+    """Return whether two footprints touch disjoint columns, so the manipulations can run in any order
+    """
+    if a.touches(b.reads | b.writes) or b.touches(a.reads | a.writes):
+        return False
+    return not any(prefix.startswith(other) or other.startswith(prefix) for prefix in a.prefixes for other in b.prefixes)
+
+def run_manipulations(df, manipulations, n_jobs=1, backend="thread", transform=False):
+    """Run manipulations on a dataframe, running the manipulations of each stage concurrently. See get_stages
+
+    Arguments:
+        df {pandas dataframe} -- the dataframe to be manipulated. It is manipulated in place
+        manipulations {list} -- the manipulator objects, in order
+
+    Keyword Arguments:
+        n_jobs {int} -- the number of workers, -1 for one per cpu (default: {1})
+        backend {string} -- "thread" or "process" (default: {"thread"})
+        transform {bool} -- run the manipulations with their fitted state (manipulator.transform) instead of manipulator.do (default: {False})
+
+    Raises:
+        ValueError: raises error if the backend is not valid
+
+    Returns:
+        pandas dataframe -- the manipulated dataframe
+    """
+    if backend not in ("thread", "process"):
+        raise ValueError("Backend \'" + backend + "\' is not a valid backend.")
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+
+    executor = None
+    try:
+        for stage in get_stages(manipulations):
+            if len(stage) == 1 or n_jobs == 1:
+                for manipulation, _ in stage:
+                    df = _run_manipulation(manipulation, df, transform)
+                continue
+
+            if executor is None:
+                executor = (ThreadPoolExecutor if backend == "thread" else ProcessPoolExecutor)(max_workers=n_jobs)
+            touched = [[column_name for column_name in df.columns if column_name in footprint.reads | footprint.writes]
+                       for _, footprint in stage]
+            # the manipulations run in place on their own dataframe of the columns they touch
+            futures = [executor.submit(_run_manipulation, manipulation, df[column_names], transform)
+                       for (manipulation, _), column_names in zip(stage, touched)]
+            for column_names, future in zip(touched, futures):
+                df = _merge_columns(df, column_names, future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return df
+
+def _run_manipulation(manipulation, df, transform):
+    if transform:
+        return manipulation.transform(df, inplace=True)
+    return manipulation.do(df, inplace=True)
+
+def _merge_columns(df, touched, after):
+    """Apply the changes a manipulation made to the columns it touched to the full dataframe: removed columns are
+    dropped, changed columns are replaced where they are and new columns are appended
+    """
+    removed = [column_name for column_name in touched if column_name not in after.columns]
+    if removed:
+        df = df.drop(columns=removed)
+    added = [column_name for column_name in after.columns if column_name not in df.columns]
+    for column_name in after.columns:
+        if column_name not in added:
+            df[column_name] = after[column_name]
+    if added:
+        df = pd.concat([df, after[added]], axis=1)
+    return df
@@ -0,0 +1,183 @@
+import pandas as pd
+import numpy as np
+from constants import *
+"""
+Mergeable sketches for describing columns without holding all of their values in memory.
+"""
+
+def hash_column(column):
+    """Hash every value of a column to a 64 bit integer. Integers are hashed as int64 so that distinct IDs above 2**53
+    do not collide, and floats holding a whole number hash like that integer, so the same number hashes the same
+    whether it was read as an int or a float
+
+    Arguments:
+        column {pandas series} -- the column to be hashed
+
+    Returns:
+        numpy array -- uint64 hash per value
+    """
+    if pd.api.types.is_numeric_dtype(column.dtype) and not pd.api.types.is_bool_dtype(column.dtype):
+        return _hash_numbers(column)
+    # categorize would factorize the column first, which is the full unique pass the sketch is meant to avoid
+    return pd.util.hash_pandas_object(column, index=False, categorize=False).to_numpy(dtype=np.uint64)
+
+def _hash_numbers(column):
+    missing = column.isna().to_numpy()
+    if pd.api.types.is_integer_dtype(column.dtype):
+        hashes = pd.util.hash_array(column.to_numpy(dtype=np.int64, na_value=0))
+    else:
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        hashes = pd.util.hash_array(values)
+        whole = np.isfinite(values) & (values == np.floor(values)) & (np.abs(values) < 2.0**63)
+        hashes[whole] = pd.util.hash_array(values[whole].astype(np.int64))
+    hashes[missing] = pd.util.hash_array(np.array([np.nan]))[0]
+    return hashes
+
+def _bit_length(values):
+    """Exact number of significant bits of each uint64 value (0 for 0)
+    """
+    values = values.copy()
+    bit_length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        is_wide = values >= (np.uint64(1) << np.uint64(shift))
+        bit_length[is_wide] += shift
+        values[is_wide] >>= np.uint64(shift)
+    return bit_length + (values > 0)
+
+
+class hyperloglog:
+    """HyperLogLog cardinality estimator. Uses 2^precision one byte registers and has a relative standard error of
+    1.04/sqrt(2^precision) (0.81% at the default precision of 14). Small counts are estimated with linear counting and
+    are practically exact, see standard_error. Sketches with the same precision can be merged.
+    """
+    def __init__(self, precision=14):
+        """Intialize an empty sketch
+
+        Keyword Arguments:
+            precision {int} -- number of hash bits used to pick a register, between 4 and 18 (default: {14})
+        """
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog precision needs to be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, column, slice_size=1 << 18):
+        """Add the values of a column to the sketch. The column is hashed a slice at a time to bound memory
+
+        Arguments:
+            column {pandas series} -- the values to be added
+
+        Keyword Arguments:
+            slice_size {int} -- the number of values hashed at a time (default: {1 << 18})
+        """
+        for start in range(0, len(column), slice_size):
+            self.update_hashes(hash_column(column.iloc[start:start + slice_size]))
+
+    def update_hashes(self, hashes):
+        """Add already hashed values to the sketch
+
+        Arguments:
+            hashes {numpy array} -- uint64 hashes from hash_column
+        """
+        suffix_bits = 64 - self.precision
+        register_index = (hashes >> np.uint64(suffix_bits)).astype(np.intp)
+        suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+        # position of the leftmost 1 bit in the suffix
+        rank = (suffix_bits + 1 - _bit_length(suffix)).astype(np.uint8)
+        np.maximum.at(self.registers, register_index, rank)
+
+    def merge(self, other):
+        """Merge another sketch into this one. The result estimates the cardinality of the union of both inputs
+
+        Arguments:
+            other {hyperloglog} -- a sketch with the same precision
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """Estimate the number of distinct values added to the sketch
+
+        Returns:
+            float -- the cardinality estimate
+        """
+        num_registers = len(self.registers)
+        alpha = 0.7213/(1 + 1.079/num_registers)
+        estimate = alpha*num_registers*num_registers/np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        num_zero_registers = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5*num_registers and num_zero_registers:
+            # small range correction: linear counting
+            estimate = num_registers*np.log(num_registers/num_zero_registers)
+        return float(estimate)
+
+    def relative_error(self):
+        """Relative standard error of count() for large cardinalities
+
+        Returns:
+            float -- 1.04/sqrt(number of registers)
+        """
+        return 1.04/np.sqrt(len(self.registers))
+
+    def standard_error(self):
+        """Standard error of the current count(), in number of values. Uses the error of linear counting for small
+        cardinalities, which is much tighter than relative_error
+
+        Returns:
+            float -- the standard error of the estimate
+        """
+        num_registers = len(self.registers)
+        estimate = self.count()
+        if estimate <= 2.5*num_registers and np.count_nonzero(self.registers == 0):
+            load = estimate/num_registers
+            return float(np.sqrt(num_registers*(np.exp(load) - load - 1)))
+        return float(self.relative_error()*estimate)
+
+
+class unique_reservoir:
+    """Keeps the first few distinct values of a column, in order of appearance, for previews. Only a bounded slice of
+    the column is hashed at a time, so the work stops as soon as the reservoir is full.
+    """
+    def __init__(self, size=print_pref.MAX_NUMBER_UNIQUE_PREVIEW_SHOWN, slice_size=1024):
+        """Intialize an empty reservoir
+
+        Keyword Arguments:
+            size {int} -- the max number of values kept (default: {print_pref.MAX_NUMBER_UNIQUE_PREVIEW_SHOWN})
+            slice_size {int} -- the number of rows scanned at a time (default: {1024})
+        """
+        self.size = size
+        self.slice_size = slice_size
+        self.values = []
+
+    def update(self, column):
+        """Add the values of a column to the reservoir until it is full
+
+        Arguments:
+            column {pandas series} -- the values to be added
+        """
+        start = 0
+        while len(self.values) < self.size and start < len(column):
+            for elem in pd.unique(column.iloc[start:start + self.slice_size]):
+                if len(self.values) >= self.size:
+                    break
+                if not any(_same_value(elem, kept) for kept in self.values):
+                    self.values.append(elem)
+            start += self.slice_size
+
+    def merge(self, other):
+        """Merge another reservoir into this one, keeping this reservoir's values first
+
+        Arguments:
+            other {unique_reservoir} -- the reservoir to be merged
+        """
+        self.update(pd.Series(other.values, dtype=object))
+
+
+def _same_value(a, b):
+    # nan != nan, but a reservoir should only keep one of them
+    if pd.isna(a) is True and pd.isna(b) is True:
+        return True
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return a is b
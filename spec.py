@@ -0,0 +1,171 @@
+import json
+import math
+import inspect
+import numpy as np
+import pandas as pd
+from manipulator import manipulator, OPERATIONS
+"""
+Pipeline specs: the manipulations of a preprocessor, with their arguments by name and their fitted state, as plain
+data that can be written to JSON or YAML, diffed and rebuilt without pickling code. Functions are referred to by
+their name in manipulator.OPERATIONS. Values JSON has no type for are written as tagged objects:
+    {"__tuple__": [...]}, {"__float__": "nan"}, {"__na__": "<NA>"}, {"__timestamp__": "2019-08-01T00:00:00"}, and
+    {"__dict__": [[key, value], ...]} for dicts with keys that are not strings
+"""
+
+SPEC_VERSION = 1
+YAML_EXTENSIONS = (".yaml", ".yml")
+# the parameters of a manipulation function that are not arguments of the manipulation
+RUNTIME_PARAMETERS = ("df", "inplace", "fitted")
+
+def manipulation_to_spec(manipulation):
+    """Describe a manipulation as plain data
+
+    Arguments:
+        manipulation {manipulator} -- the manipulation
+
+    Raises:
+        ValueError: raises error if the function is not in manipulator.OPERATIONS
+        TypeError: raises error if an argument or the fitted state holds a value that can not be written
+
+    Returns:
+        dict -- "operation", "args" (parameter name --> value) and "fitted" if the manipulation is fitted
+    """
+    function = manipulation.get_function()
+    if OPERATIONS.get(function.__name__) is not function:
+        raise ValueError("Manipulation \'" + manipulation.get_operation_name() + "\' is not in OPERATIONS and can not be written to a spec")
+    parameter_names = [name for name in inspect.signature(function).parameters if name not in RUNTIME_PARAMETERS]
+    spec = {"operation": function.__name__, "args": to_json_value(dict(zip(parameter_names, manipulation.get_args())))}
+    if manipulation.fitted is not None:
+        spec["fitted"] = to_json_value(manipulation.fitted)
+    return spec
+
+def manipulation_from_spec(spec):
+    """Rebuild a manipulation from manipulation_to_spec
+
+    Arguments:
+        spec {dict} -- the description of the manipulation
+
+    Raises:
+        ValueError: raises error if the operation is unknown, an argument is unknown or a required argument is missing
+
+    Returns:
+        manipulator -- the manipulation, fitted if the spec has a fitted state
+    """
+    function = OPERATIONS.get(spec["operation"])
+    if function is None:
+        raise ValueError("Operation \'" + spec["operation"] + "\' is not in OPERATIONS")
+    args = from_json_value(spec.get("args", {}))
+    parameters = [parameter for name, parameter in inspect.signature(function).parameters.items() if name not in RUNTIME_PARAMETERS]
+    unknown = set(args) - {parameter.name for parameter in parameters}
+    if unknown:
+        raise ValueError("Unknown arguments {} for operation \'{}\'".format(sorted(unknown), spec["operation"]))
+
+    # manipulators take their arguments by position, up to the last one given
+    num_args = max([i + 1 for i, parameter in enumerate(parameters) if parameter.name in args], default=0)
+    positional = []
+    for parameter in parameters[:num_args]:
+        if parameter.name in args:
+            positional.append(args[parameter.name])
+        elif parameter.default is not inspect.Parameter.empty:
+            positional.append(parameter.default)
+        else:
+            raise ValueError("Missing argument \'{}\' for operation \'{}\'".format(parameter.name, spec["operation"]))
+    for parameter in parameters[num_args:]:
+        if parameter.default is inspect.Parameter.empty:
+            raise ValueError("Missing argument \'{}\' for operation \'{}\'".format(parameter.name, spec["operation"]))
+
+    manipulation = manipulator(function, *positional)
+    if spec.get("fitted") is not None:
+        manipulation.fitted = from_json_value(spec["fitted"])
+    return manipulation
+
+def to_json_value(value):
+    """Turn a value into one made of JSON types only, tagging the values JSON has no type for (see the module docstring)
+
+    Arguments:
+        value {obj} -- the value
+
+    Raises:
+        TypeError: raises error if the value can not be written
+
+    Returns:
+        obj -- the JSON value
+    """
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, np.generic):
+        return to_json_value(value.item())
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else {"__float__": str(value)}
+    if value is pd.NA or value is pd.NaT:
+        return {"__na__": str(value)}
+    if isinstance(value, pd.Timestamp):
+        return {"__timestamp__": value.isoformat()}
+    if isinstance(value, list):
+        return [to_json_value(item) for item in value]
+    if isinstance(value, tuple):
+        return {"__tuple__": [to_json_value(item) for item in value]}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) and not key.startswith("__") for key in value):
+            return {key: to_json_value(item) for key, item in value.items()}
+        return {"__dict__": [[to_json_value(key), to_json_value(item)] for key, item in value.items()]}
+    raise TypeError("Value {!r} of type {} can not be written to a spec".format(value, type(value).__name__))
+
+def from_json_value(value):
+    """Inverse of to_json_value
+
+    Arguments:
+        value {obj} -- the JSON value
+
+    Returns:
+        obj -- the value
+    """
+    if isinstance(value, list):
+        return [from_json_value(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) == 1:
+        tag, tagged = next(iter(value.items()))
+        if tag == "__tuple__":
+            return tuple(from_json_value(item) for item in tagged)
+        if tag == "__float__":
+            return float(tagged)
+        if tag == "__na__":
+            return pd.NA if tagged == "<NA>" else pd.NaT
+        if tag == "__timestamp__":
+            return pd.Timestamp(tagged)
+        if tag == "__dict__":
+            return {from_json_value(key): from_json_value(item) for key, item in tagged}
+    return {key: from_json_value(item) for key, item in value.items()}
+
+def write_spec(spec, path):
+    """Write a spec to a JSON file, or to a YAML file (needs pyyaml) if the extension is .yaml or .yml
+
+    Arguments:
+        spec {dict} -- the spec
+        path {string} -- the file to be written
+    """
+    with open(path, "w") as f:
+        if path.lower().endswith(YAML_EXTENSIONS):
+            import yaml
+            # the C dumper and loader need libyaml, the pure python ones are an order of magnitude slower
+            yaml.dump(spec, f, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper), sort_keys=False)
+        else:
+            json.dump(spec, f, indent=2)
+
+def read_spec(path):
+    """Read a spec written by write_spec
+
+    Arguments:
+        path {string} -- the file to be read
+
+    Returns:
+        dict -- the spec
+    """
+    with open(path) as f:
+        if path.lower().endswith(YAML_EXTENSIONS):
+            import yaml
+            return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+        return json.load(f)
@@ -0,0 +1,411 @@
+import pandas as pd
+import numpy as np
+from manipulator import *
+from describe import reconcile_dtypes
+from optimizer import get_footprint
+from scheduler import are_independent
+"""
+Out of core preprocessing: fit and apply the manipulations of a preprocessor to a csv or parquet file a chunk at a
+time, and write the result a chunk at a time, so memory is bounded by the chunk size and not by the file.
+
+Fitting needs the statistics of the whole file (ex. the classes of encode_class_label or the median of
+impute_NaN_column), which are accumulated across chunks with mergeable statistics (STREAM_FITTERS). A manipulation is fit
+on the output of the manipulations before it, so fitting takes a pass over the file per group of manipulations that
+depend on each other. The first pass also finds the dtype each column would have if the whole file were read at once,
+and every later pass casts the chunks to it.
+"""
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+
+def get_file_format(path, file_format=None):
+    """Return "csv" or "parquet", from file_format or else the file extension
+    """
+    if file_format is not None:
+        if file_format not in ("csv", "parquet"):
+            raise ValueError("file_format needs to be \'csv\' or \'parquet\'")
+        return file_format
+    return "parquet" if str(path).lower().endswith(PARQUET_EXTENSIONS) else "csv"
+
+def read_chunks(source, chunksize=100000, file_format=None, **read_kwargs):
+    """Read a csv or parquet file chunksize rows at a time
+
+    Arguments:
+        source {string} -- the path of the file
+
+    Keyword Arguments:
+        chunksize {int} -- the number of rows read at a time (default: {100000})
+        file_format {string} -- "csv" or "parquet". From the file extension if None (default: {None})
+        read_kwargs -- passed on to pd.read_csv (ex. index_col=0), or as columns to pyarrow's ParquetFile.iter_batches
+
+    Yields:
+        pandas dataframe -- the next chunk
+    """
+    if get_file_format(source, file_format) == "csv":
+        yield from pd.read_csv(source, chunksize=chunksize, **read_kwargs)
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(source)
+    index_columns = (parquet_file.schema_arrow.pandas_metadata or {}).get("index_columns", [])
+    range_index = index_columns[0] if len(index_columns) == 1 and isinstance(index_columns[0], dict) else None
+    num_rows = 0
+    for batch in parquet_file.iter_batches(batch_size=chunksize, **read_kwargs):
+        chunk = pa.Table.from_batches([batch]).to_pandas()
+        if range_index is not None:
+            # a range index is only stored as metadata, and every batch would restart it at 0
+            start = range_index["start"] + num_rows*range_index["step"]
+            chunk.index = pd.RangeIndex(start, start + len(chunk)*range_index["step"], range_index["step"], name=range_index["name"])
+        num_rows += len(chunk)
+        yield chunk
+
+
+class chunk_writer:
+    """Writes dataframes a chunk at a time to one csv or parquet file
+    """
+    def __init__(self, sink, file_format=None, **write_kwargs):
+        """Intialize the writer. The file is created by the first chunk
+
+        Arguments:
+            sink {string} -- the path of the file to be written
+
+        Keyword Arguments:
+            file_format {string} -- "csv" or "parquet". From the file extension if None (default: {None})
+            write_kwargs -- passed on to DataFrame.to_csv or pyarrow's ParquetWriter
+        """
+        self.sink = sink
+        self.file_format = get_file_format(sink, file_format)
+        self.write_kwargs = write_kwargs
+        self.num_rows = 0
+        self.writer = None
+        self.schema = None
+
+    def write(self, chunk):
+        """Append a chunk to the file
+
+        Arguments:
+            chunk {pandas dataframe} -- the chunk, with the same columns as the first one
+
+        Raises:
+            ValueError: raises error if the chunk can not be written with the parquet schema of the first chunk
+        """
+        if self.file_format == "csv":
+            chunk.to_csv(self.sink, mode="w" if self.num_rows == 0 else "a", header=self.num_rows == 0, **self.write_kwargs)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=True)
+            if self.writer is None:
+                self.schema = table.schema
+                self.writer = pq.ParquetWriter(self.sink, self.schema, **self.write_kwargs)
+            elif not table.schema.equals(self.schema):
+                # ex. a column that is int in the first chunk and has missing values in this one
+                try:
+                    table = table.cast(self.schema)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError, ValueError) as error:
+                    raise ValueError("Chunk does not match the parquet schema of the first chunk: {}".format(error))
+            self.writer.write_table(table)
+        self.num_rows += len(chunk)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class value_counter:
+    """Mergeable counts of the distinct values of a column, missing values included
+    """
+    def __init__(self):
+        self.counts = None
+        self.dtype = None
+
+    def update(self, column):
+        counts = column.value_counts(dropna=False, sort=False)
+        if self.counts is None:
+            self.counts = counts
+        else:
+            self.counts = pd.concat([self.counts, counts]).groupby(level=0, dropna=False, sort=False).sum()
+        if column.notna().any():
+            self.dtype = reconcile_dtypes(self.dtype, column.dtype)
+
+    def get_counts(self, dropna=True):
+        """Return value --> count, without missing values if dropna
+        """
+        counts = self.counts if self.counts is not None else pd.Series(dtype=np.int64)
+        return counts[counts.index.notna()] if dropna else counts
+
+    def get_values(self):
+        """Return a column holding every distinct value once, missing values included
+        """
+        values = self.get_counts(dropna=False).index
+        return pd.Series(values, dtype=self.dtype if self.dtype is not None else values.dtype)
+
+
+class distinct_values_fitter:
+    """Fits a manipulation whose fitted state only depends on the distinct values of its column, by running its fitter
+    on the distinct values of the whole file
+    """
+    def __init__(self, fitter, column_name, *args):
+        self.fitter = fitter
+        self.column_name = column_name
+        self.args = args
+        self.values = value_counter()
+
+    def update(self, df):
+        self.values.update(df[self.column_name])
+
+    def get_fitted(self):
+        return self.fitter(pd.DataFrame({self.column_name: self.values.get_values()}), self.column_name, *self.args)
+
+
+class impute_fitter:
+    """Fits impute_NaN_column: running sum and count for the mean, value counts for the exact median and most frequent value
+    """
+    def __init__(self, column_name, strategy):
+        if strategy not in ("mean", "median", "most_frequent"):
+            raise ValueError("Strategy \'" + strategy + "\' is not a valid strategy.")
+        self.column_name = column_name
+        self.strategy = strategy
+        self.total = 0
+        self.count = 0
+        self.values = value_counter()
+
+    def update(self, df):
+        column = df[self.column_name]
+        if self.strategy != "most_frequent" and not pd.api.types.is_numeric_dtype(column.dtype):
+            raise ValueError("Cannot compute {} of a non-numeric column".format(self.strategy))
+        if self.strategy == "mean":
+            self.total += column.sum()
+            self.count += column.count()
+        else:
+            self.values.update(column)
+
+    def get_fitted(self):
+        return {"fill_value": self.get_fill_value()}
+
+    def get_fill_value(self):
+        if self.strategy == "mean":
+            return self.total/self.count if self.count else np.nan
+        counts = self.values.get_counts().sort_index()
+        if len(counts) == 0:
+            return np.nan
+        if self.strategy == "most_frequent":
+            # the smallest of the most frequent values, like Series.mode().iloc[0]
+            return counts.index[np.argmax(counts.to_numpy())]
+        # exact median: the middle value, or the mean of the two middle values
+        cumulative = counts.to_numpy().cumsum()
+        total = cumulative[-1]
+        low = counts.index[np.searchsorted(cumulative, (total - 1)//2, side="right")]
+        high = counts.index[np.searchsorted(cumulative, total//2, side="right")]
+        return np.mean([low, high])
+
+
+class nominal_fitter:
+    def __init__(self, column_name, binary, output="dense", top_k=None, other_label="other"):
+        self.args = (column_name, binary, output, top_k, other_label)
+        self.values = distinct_values_fitter(fit_encode_nominal, *self.args)
+
+    def update(self, df):
+        self.values.update(df)
+
+    def get_fitted(self):
+        column_name, binary, _, top_k, other_label = self.args
+        if binary or top_k is None:
+            return self.values.get_fitted()
+        return get_top_k_categories(self.values.values.get_counts(), top_k, other_label, column_name)
+
+
+class fill_NaN_columns_fitter:
+    def __init__(self, fill_values, strategies=None):
+        self.fill_values = fill_values
+        self.imputers = {column_name: impute_fitter(column_name, strategy) for column_name, strategy in (strategies or {}).items()}
+
+    def update(self, df):
+        for imputer in self.imputers.values():
+            imputer.update(df)
+
+    def get_fitted(self):
+        fill_values = dict(self.fill_values)
+        fill_values.update({column_name: imputer.get_fill_value() for column_name, imputer in self.imputers.items()})
+        return {"fill_values": fill_values}
+
+class impute_NaN_columns_fitter(fill_NaN_columns_fitter):
+    def __init__(self, strategies, group_by=None):
+        # the statistics of each group would need the value counts of every group kept across chunks
+        if group_by is not None:
+            raise ValueError("impute_NaN_columns with group_by can not be fit on a stream")
+        super().__init__({}, strategies)
+
+    def get_fitted(self):
+        fitted = super().get_fitted()
+        fitted["group_by"] = None
+        return fitted
+
+
+
+# manipulation function --> function of its arguments returning an object with update(chunk) and get_fitted()
+STREAM_FITTERS = {
+    encode_ordinal: lambda *args: distinct_values_fitter(fit_encode_ordinal, *args),
+    encode_class_label: lambda *args: distinct_values_fitter(fit_encode_class_label, *args),
+    encode_nominal: nominal_fitter,
+    impute_NaN_column: impute_fitter,
+    fill_NaN_columns: fill_NaN_columns_fitter,
+    impute_NaN_columns: impute_NaN_columns_fitter,
+}
+
+
+def fit_stream(manipulations, source, chunksize=100000, file_format=None, prepare=None, **read_kwargs):
+    """Fit manipulations on a file a chunk at a time. See the module docstring
+
+    Arguments:
+        manipulations {list} -- the manipulator objects, in order. Fitted in place
+        source {string} -- the path of the csv or parquet file
+
+    Keyword Arguments:
+        chunksize {int} -- the number of rows read at a time (default: {100000})
+        file_format {string} -- "csv" or "parquet". From the file extension if None (default: {None})
+        prepare {list} -- fitted manipulator objects run on each chunk as it is read, before anything else. They are not fit (default: {None})
+        read_kwargs -- passed on to read_chunks
+
+    Raises:
+        ValueError: raises error if a manipulation learns state and has no streaming fitter
+
+    Returns:
+        dict -- column name --> the dtype of the column over the whole file, to be passed to transform_stream
+    """
+    for manipulation in manipulations:
+        if manipulation.get_function() in FITTERS and manipulation.get_function() not in STREAM_FITTERS:
+            raise ValueError("Manipulation \'" + manipulation.get_operation_name() + "\' can not be fit on a stream")
+
+    dtypes = None
+    num_done = 0
+    while dtypes is None or num_done < len(manipulations):
+        # the first pass reads raw chunks whose dtypes are not reconciled yet, so it only collects statistics
+        group = _get_fit_group(manipulations, num_done, apply=dtypes is not None)
+        fitters = {i: STREAM_FITTERS[manipulations[i].get_function()](*manipulations[i].get_args())
+                   for i in group if manipulations[i].get_function() in FITTERS}
+        chunk_dtypes = {}
+        for chunk in read_chunks(source, chunksize, file_format, **read_kwargs):
+            chunk = _run_chunk(prepare or [], chunk, transform=True)
+            if dtypes is None:
+                _update_dtypes(chunk_dtypes, chunk)
+            else:
+                chunk = _run_chunk(manipulations[:num_done], cast_chunk(chunk, dtypes), transform=True)
+            for i in group:
+                if i in fitters:
+                    fitters[i].update(chunk)
+                else:
+                    chunk = _run_chunk([manipulations[i]], chunk, transform=False)
+        for i, fitter in fitters.items():
+            manipulations[i].fitted = fitter.get_fitted()
+        if dtypes is None:
+            dtypes = {column_name: dtype for column_name, (dtype, _) in chunk_dtypes.items()}
+        num_done = max(group, default=num_done - 1) + 1
+    return dtypes
+
+def _get_fit_group(manipulations, start, apply=True):
+    """The manipulations from start that one pass can handle: the statistics of the manipulations that learn state are
+    collected, the others are run, until a manipulation depends on one whose statistics are being collected
+    """
+    group = []
+    collecting = []
+    for i in range(start, len(manipulations)):
+        function = manipulations[i].get_function()
+        footprint = get_footprint(manipulations[i])
+        if collecting and (footprint is None or not all(are_independent(footprint, other) for other in collecting)):
+            break
+        if function in FITTERS:
+            collecting.append(footprint)
+        elif not apply:
+            break
+        group.append(i)
+    return group
+
+def _update_dtypes(chunk_dtypes, chunk):
+    # column name --> (dtype, whether a non missing value was seen). A chunk where a column is all missing says nothing
+    # about its dtype (ex. float64 for a string column)
+    for column_name in chunk.columns:
+        column = chunk[column_name]
+        dtype, seen = chunk_dtypes.get(column_name, (None, False))
+        if column.notna().any():
+            chunk_dtypes[column_name] = (reconcile_dtypes(dtype if seen else None, column.dtype), True)
+        elif not seen:
+            chunk_dtypes[column_name] = (reconcile_dtypes(dtype, column.dtype), False)
+
+def cast_chunk(chunk, dtypes):
+    """Cast the columns of a chunk to the dtypes of the whole file
+
+    Arguments:
+        chunk {pandas dataframe} -- the chunk
+        dtypes {dict} -- column name --> dtype, from fit_stream
+
+    Returns:
+        pandas dataframe -- the cast chunk
+    """
+    mismatched = {column_name: dtypes[column_name] for column_name in chunk.columns
+                  if column_name in dtypes and chunk[column_name].dtype != dtypes[column_name]}
+    return chunk.astype(mismatched) if mismatched else chunk
+
+def _run_chunk(manipulations, chunk, transform):
+    for manipulation in manipulations:
+        if manipulation.get_function() == drop_rows:
+            # a chunk only holds some of the rows to be dropped
+            chunk = drop_rows(chunk, list(chunk.index.intersection(manipulation.get_args()[0])), inplace=True)
+        elif transform:
+            chunk = manipulation.transform(chunk, inplace=True)
+        else:
+            chunk = manipulation.do(chunk, inplace=True)
+    return chunk
+
+def transform_stream(manipulations, source, sink, chunksize=100000, dtypes=None, file_format=None, sink_format=None,
+                     write_kwargs=None, prepare=None, **read_kwargs):
+    """Apply fitted manipulations to a file a chunk at a time, writing the result a chunk at a time
+
+    Arguments:
+        manipulations {list} -- the fitted manipulator objects, in order
+        source {string} -- the path of the csv or parquet file to be read
+        sink {string} -- the path of the csv or parquet file to be written
+
+    Keyword Arguments:
+        chunksize {int} -- the number of rows read at a time (default: {100000})
+        dtypes {dict} -- the dtypes from fit_stream. The chunks are not cast if None (default: {None})
+        file_format {string} -- "csv" or "parquet" for the source. From the file extension if None (default: {None})
+        sink_format {string} -- "csv" or "parquet" for the sink. From the file extension if None (default: {None})
+        write_kwargs {dict} -- passed on to chunk_writer (default: {None})
+        prepare {list} -- fitted manipulator objects run on each chunk as it is read, see fit_stream (default: {None})
+        read_kwargs -- passed on to read_chunks
+
+    Raises:
+        ValueError: raises error if a manipulation learns state and has not been fit
+        KeyError: raises error after writing if rows to be dropped by drop_rows were not in the file
+
+    Returns:
+        int -- the number of rows written
+    """
+    for manipulation in (prepare or []) + list(manipulations):
+        if not manipulation.is_fitted():
+            raise ValueError("Manipulation \'" + manipulation.get_operation_name() + "\' needs to be fit before transform")
+
+    seen_rows = set()
+    dropped_rows = pd.Index([row_index for manipulation in manipulations if manipulation.get_function() == drop_rows
+                             for row_index in manipulation.get_args()[0]]).unique()
+    with chunk_writer(sink, sink_format, **(write_kwargs or {})) as writer:
+        for chunk in read_chunks(source, chunksize, file_format, **read_kwargs):
+            chunk = _run_chunk(prepare or [], chunk, transform=True)
+            if len(dropped_rows):
+                seen_rows.update(chunk.index.intersection(dropped_rows))
+            if dtypes is not None:
+                chunk = cast_chunk(chunk, dtypes)
+            writer.write(_run_chunk(manipulations, chunk, transform=True))
+
+    missing_rows = [row_index for row_index in dropped_rows if row_index not in seen_rows]
+    if missing_rows:
+        raise KeyError("{} not found in axis".format(missing_rows))
+    return writer.num_rows
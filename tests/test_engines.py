@@ -0,0 +1,18 @@
+import pandas as pd
+import pytest
+from manipulator import *
+from preprocessor import preprocessor
+
+pytest.importorskip("polars")
+
+
+def test_polars_engine_keeps_none_of_object_columns():
+    df = pd.DataFrame({"t": ["x", "y", None], "u": ["a", None, "b"], "v": [None, "p", "q"]}, dtype=object)
+    proc = preprocessor(df)
+    proc.append_manipulation(manipulator(encode_regex, "t", {"zzz": 1}))
+    proc.append_manipulation(manipulator(encode_regex, "u", {"a": "A"}))
+    expected = proc.preprocess()
+    result = proc.preprocess(engine="polars")
+    pd.testing.assert_frame_equal(result, expected)
+    assert result["t"].tolist() == [None, None, None]
+    assert result["v"].tolist() == [None, "p", "q"]
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from manipulator import *
+
+
+def test_impute_NaN_columns_group_by_keeps_other_columns():
+    df = pd.DataFrame({
+        "group": ["a", "a", "b", "b"],
+        "value": [1.0, np.nan, 3.0, np.nan],
+        "text": pd.Series(["x", None, "y", None], dtype="str"),
+        "other": [np.nan, 1.0, 2.0, 3.0],
+    })
+    result = impute_NaN_columns(df, {"value": "mean"}, "group")
+    assert result["value"].tolist() == [1.0, 1.0, 3.0, 3.0]
+    for column_name in ["group", "text", "other"]:
+        assert result[column_name].dtype == df[column_name].dtype
+        assert result[column_name].equals(df[column_name])
+
+
+def test_regex_encoder_memo_size():
+    encoder = regex_encoder(["a"], memo_size=2)
+    assert list(encoder.match(["a", "b", "c", "a"])) == [0, 1, 1, 0]
+    assert list(encoder.memo) == ["a", "b"]
+    assert list(encoder.match(["ca", "b"])) == [0, 1]
+    assert list(encoder.memo) == ["b", "ca"]
+    assert encoder.match_one("zz") == 1
+
+
+def test_regex_encoder_shared_by_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    encoder = regex_encoder(["1$", "^v2"], memo_size=1000)
+    chunks = [["v{}".format(i) for i in range(start, start + 5000)] for start in range(0, 40000, 2500)]
+
+    def check(strings):
+        expected = [0 if string.endswith("1") else 1 if string.startswith("v2") else 2 for string in strings]
+        assert list(encoder.match(strings)) == expected
+        assert all(encoder.match_one(string) == index for string, index in zip(strings[:200], expected))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(check, chunks * 4))
+    assert len(encoder.memo) <= 1000
+
+
+def test_encode_ordinal_category_order_forms():
+    df = pd.DataFrame({"size": ["m", "s", None, "l"]})
+    flat = encode_ordinal(df, "size", ["s", "m", "l"])
+    nested = encode_ordinal(df, "size", [["s", "m", "l"]])
+    assert flat.equals(nested)
+    assert flat["size"].tolist()[:2] == [1.0, 0.0] and np.isnan(flat["size"].iloc[2]) and flat["size"].iloc[3] == 2.0
+
+
+def test_encode_ordinal_legacy_missing_values():
+    df = pd.DataFrame({"a": pd.Series(["b", None, "a"], dtype=object)})
+    result = encode_ordinal(df, "a")["a"]
+    assert result.dtype == np.float64
+    assert result.iloc[0] == 1.0 and np.isnan(result.iloc[1]) and result.iloc[2] == 0.0
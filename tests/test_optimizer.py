@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from manipulator import *
+from preprocessor import preprocessor
+
+
+def make_frame():
+    return pd.DataFrame({
+        "a": [1.0, np.nan, 3.0],
+        "b": ["x", None, "x"],
+        "empty": [np.nan, np.nan, np.nan],
+    })
+
+
+def run(df, manipulations, optimize, fit_df=None):
+    """preprocess, or fit on fit_df and transform df, and return the result or the type of the error"""
+    proc = preprocessor(df if fit_df is None else fit_df)
+    for manipulation in manipulations:
+        proc.append_manipulation(manipulation)
+    try:
+        if fit_df is None:
+            return proc.preprocess(optimize=optimize)
+        return proc.fit().transform(df, optimize=optimize)
+    except Exception as error:
+        return type(error)
+
+
+PIPELINES = [
+    [manipulator(fill_NaN_column, "b", "y"), manipulator(impute_NaN_column, "a", "mean")],
+    [manipulator(fill_NaN_column, "b", "y"), manipulator(impute_NaN_column, "empty", "most_frequent")],
+    [manipulator(impute_NaN_column, "a", "median"), manipulator(fill_NaN_column, "missing", 0)],
+    [manipulator(fill_NaN_column, "missing", 0), manipulator(impute_NaN_column, "b", "most_frequent")],
+]
+
+
+@pytest.mark.parametrize("manipulations", PIPELINES)
+def test_fused_fills_match_unfused(manipulations):
+    expected = run(make_frame(), manipulations, optimize=False)
+    got = run(make_frame(), manipulations, optimize=True)
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(got, expected)
+    else:
+        assert got is expected
+
+
+def test_fused_fills_transform_missing_column():
+    manipulations = [manipulator(fill_NaN_column, "b", "y"), manipulator(impute_NaN_column, "a", "mean")]
+    df = make_frame().drop(columns=["b"])
+    expected = run(df, manipulations, optimize=False, fit_df=make_frame())
+    assert expected is KeyError
+    assert run(df, manipulations, optimize=True, fit_df=make_frame()) is KeyError
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from manipulator import *
+from preprocessor import preprocessor
+
+
+def make_preprocessor(df, manipulations, **kwargs):
+    proc = preprocessor(df, **kwargs)
+    for manipulation in manipulations:
+        proc.append_manipulation(manipulation)
+    return proc
+
+
+def test_grouped_impute_concurrent_matches_sequential():
+    df = pd.DataFrame({
+        "group": ["a", "a", "b", "b"],
+        "value": [1.0, np.nan, 3.0, np.nan],
+        "text": pd.Series(["x", None, "y", None], dtype="str"),
+    })
+    proc = make_preprocessor(df, [manipulator(impute_NaN_columns, {"value": "median"}, "group"),
+                                  manipulator(fill_NaN_column, "text", "z")])
+    pd.testing.assert_frame_equal(proc.preprocess(n_jobs=2), proc.preprocess())
+
+
+def test_cache_misses_after_inplace_preprocess():
+    from cache import step_cache
+    cache = step_cache()
+    proc = make_preprocessor(pd.DataFrame({"b": ["x", None, "x"]}), [manipulator(encode_regex, "b", {"x": "hit"})], cache=cache)
+    proc.preprocess(inplace=True)
+    rerun = proc.preprocess()
+    assert rerun["b"].isna().all()
+    assert cache.hits == 0
+
+
+def test_preprocess_stream_applies_reduce_memory(tmp_path):
+    df = pd.DataFrame({
+        "label": ["a", "b", None, "a"] * 25,
+        "value": np.arange(100, dtype="int64"),
+        "score": [0.5, np.nan, 1.5, 2.5] * 25,
+    })
+    source, sink = str(tmp_path / "frame.csv"), str(tmp_path / "out.parquet")
+    df.to_csv(source)
+    df = pd.read_csv(source, index_col=0)
+    proc = make_preprocessor(df, [manipulator(impute_NaN_column, "score", "median"),
+                                  manipulator(fill_NaN_column, "label", "a")], reduce_memory=True)
+    expected = proc.fit(df).transform(df)
+    for chunksize in (7, 30, 1000):
+        proc.preprocess_stream(source, sink, chunksize=chunksize, index_col=0)
+        pd.testing.assert_frame_equal(pd.read_parquet(sink), expected)
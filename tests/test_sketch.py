@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+from sketch import hash_column, hyperloglog
+
+
+def test_hyperloglog_counts_int64_ids_above_2_53():
+    ids = pd.Series(np.arange(2**60, 2**60 + 50000, dtype=np.int64))
+    sketch = hyperloglog()
+    sketch.update(ids)
+    assert abs(sketch.count() - len(ids)) <= 4*sketch.standard_error()
+
+
+def test_hash_column_same_number_as_int_or_float():
+    ints = hash_column(pd.Series([3, -5, 2**60, None], dtype="Int64"))
+    floats = hash_column(pd.Series([3.0, -5.0, float(2**60), np.nan]))
+    assert (ints == floats).all()